@@ -1,3 +1,6 @@
+# 启动耗时分析（--profile-startup），需最先导入以便统计其他模块的导入时间
+import startup_profiler
+
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 import platform
@@ -11,6 +14,19 @@ import webbrowser
 import shutil
 from datetime import datetime
 import urllib.parse
+startup_profiler.checkpoint("导入tkinter和标准库")
+
+# 导入费用计算引擎（不依赖tkinter）
+import fee_engine
+# 导入网络连接检测（结果在本次运行中缓存）
+import connectivity
+# 导入断点续传下载（更新安装包下载中断后从断点继续）
+import resumable_download
+# 导入计算历史记录（内存定长队列 + SQLite日志）
+import history_store
+# 导入界面定时任务调度（窗口最小化时暂停）
+import ui_scheduler
+startup_profiler.checkpoint("导入计算模块")
 
 class FBAShippingCalculatorJP:
     # 程序版本信息
@@ -20,8 +36,14 @@ class FBAShippingCalculatorJP:
     UPDATE_INFO_FILE = "update_info_jp.json"  # 更新信息文件路径
     UPLOAD_SERVER_URL = "https://tomarens.xyz"  # 上传服务器地址
     FEEDBACK_FILE = "feedback_jp.json"  # 反馈文件路径
+    CLOCK_INTERVAL_MS = 60 * 1000  # 状态栏时钟刷新间隔（毫秒），时钟精确到分钟
     
     def __init__(self, root):
+        # 启用启动耗时分析时为字体、设置、样式、界面构建方法和网络检测计时
+        startup_profiler.instrument(
+            self, ("setup_fonts", "load_settings", "_create_styles", "apply_theme", "check_internet_connection")
+        )
+        
         # 设置中文字体支持
         self.setup_fonts()
         
@@ -31,8 +53,16 @@ class FBAShippingCalculatorJP:
         self.root = root
         self.root.title(f"日本站FBA配送费计算器 v{self.VERSION}")
         
-        # 初始化计算历史记录
-        self.calculation_history = []
+        # 周期任务调度器：所有周期任务共用一个定时器，窗口最小化时暂停
+        self.scheduler = ui_scheduler.UIScheduler(
+            root, self.settings.get("ui_scheduler_granularity_ms", ui_scheduler.DEFAULT_GRANULARITY_MS)
+        )
+        
+        # 初始化计算历史记录：最近的记录保存在内存中，全部记录写入程序目录下的数据库
+        self.calculation_history = history_store.CalculationHistory(
+            history_store.app_data_path("calculation_history_jp.db"),
+            maxlen=self.settings.get("history_size", history_store.DEFAULT_HISTORY_SIZE)
+        )
         
         # 根据用户设置决定窗口大小
         window_size = self.settings.get("window_size", "maximized")
@@ -207,25 +237,21 @@ class FBAShippingCalculatorJP:
             logging.error(f"保存设置失败: {str(e)}")
     
     def check_internet_connection(self, url=None):
-        """检查网络连接状态"""
-        try:
-            import urllib.request
-            
-            if url:
-                # 使用指定的URL进行连接测试
-                urllib.request.urlopen(url, timeout=5)
-            else:
-                # 尝试连接到一个可靠的网站
-                urllib.request.urlopen("https://www.baidu.com", timeout=5)
-                return True
-        except:
-            # 检查是否能连接到本地服务器
-            try:
-                import urllib.request
-                urllib.request.urlopen("https://tomarens.xyz", timeout=5)
-                return True
-            except:
-                return False
+        """
+        检查网络连接状态（未指定URL时使用本次运行中缓存的检测结果）
+        
+        在界面线程中调用时只读取缓存结果，不等待网络检测（尚未检测或检测失败时在后台重新检测，
+        本次返回False）；在后台线程中调用时等待检测完成
+        """
+        if url:
+            # 使用指定的URL进行连接测试
+            return connectivity.probe_internet_connection((url,))
+        if threading.current_thread() is threading.main_thread():
+            connected = connectivity.connection_status()
+            if not connected:
+                connectivity.check_connection_async()
+            return bool(connected)
+        return connectivity.ensure_internet_connection()
     
     def show_bug_feedback(self):
         """显示BUG反馈对话框"""
@@ -469,6 +495,12 @@ class FBAShippingCalculatorJP:
     def check_for_updates(self, show_no_update_msg=True):
         """检查程序更新"""
         try:
+            # 在界面线程中（菜单“检查更新”）不等待网络检测：尚未检测时先在后台检测，完成后回到界面线程继续
+            if threading.current_thread() is threading.main_thread() and connectivity.connection_status() is None:
+                connectivity.check_connection_async(
+                    lambda connected: self.root.after(0, lambda: self.check_for_updates(show_no_update_msg)))
+                return
+            
             # 检查网络连接
             if not self.check_internet_connection():
                 if show_no_update_msg:
@@ -697,7 +729,6 @@ class FBAShippingCalculatorJP:
             # 在单独的线程中下载文件
             def download_thread():
                 try:
-                    import urllib.request
                     import urllib.error
                     import tempfile
                     
@@ -710,16 +741,18 @@ class FBAShippingCalculatorJP:
                     status_var.set(f"正在下载更新文件...")
                     
                     # 定义进度回调函数
-                    def report_progress(count, block_size, total_size):
-                        percent = int(count * block_size * 100 / total_size)
+                    def report_progress(downloaded, total_size):
+                        if not total_size:
+                            return
+                        percent = min(int(downloaded * 100 / total_size), 100)
                         progress_var.set(percent)
                         status_var.set(f"正在下载更新文件... {percent}%")
                     
-                    # 下载文件
-                    urllib.request.urlretrieve(
+                    # 下载文件（连接中断时从断点继续，重新打开程序后再次下载也会接着上次的进度）
+                    resumable_download.download_file(
                         download_url,
                         temp_file_path,
-                        reporthook=report_progress
+                        progress_callback=report_progress
                     )
                     
                     # 下载完成
@@ -1142,9 +1175,15 @@ except Exception as e:
     
     def on_closing(self):
         """窗口关闭时的处理"""
-        # 保存设置
-        self.save_settings()
-        self.root.destroy()
+        # 先停止周期任务，避免关闭过程中再触发时钟刷新
+        self.scheduler.stop()
+        try:
+            # 保存设置
+            self.save_settings()
+            # 关闭历史记录数据库
+            self.calculation_history.close()
+        finally:
+            self.root.destroy()
     
     def create_title(self):
         """创建标题"""
@@ -1331,15 +1370,15 @@ except Exception as e:
         status_label = ttk.Label(status_frame, textvariable=self.status_var, anchor=tk.W)
         status_label.pack(fill=tk.X, padx=10, pady=5)
         
-        # 更新时间
+        # 更新时间，之后每到整分钟刷新一次
         self.update_time()
+        self.scheduler.add("clock", self.update_time, self.CLOCK_INTERVAL_MS,
+                           first_delay_ms=ui_scheduler.ms_until_next_minute())
     
     def update_time(self):
-        """更新状态栏时间"""
-        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        """更新状态栏时间（由调度器每分钟调用）"""
+        current_time = datetime.now().strftime("%Y-%m-%d %H:%M")
         self.status_var.set(f"版本 {self.VERSION}  |  {current_time}")
-        # 每秒更新一次
-        self.root.after(1000, self.update_time)
     
     def clear_inputs(self):
         """清空所有输入"""
@@ -1378,10 +1417,9 @@ except Exception as e:
             # 检查是否为冷冻商品
             is_frozen = self.is_frozen_var.get()
             
-            # 计算费用并获取详细计算过程
-            fee, calculation_steps = self.calculate_fee_with_steps_jp(
-                size_segment, weight, price_over_1000, is_frozen
-            )
+            # 计算费用（结构化结果，计算过程在显示时生成）
+            quote = fee_engine.quote_fee_jp(size_segment, max_len, weight, price_over_1000, is_frozen)
+            fee = quote.fee
             
             # 计算总尺寸
             total_size = max_len + mid_len + min_len
@@ -1396,7 +1434,7 @@ except Exception as e:
             result_text += f"   最短边：{min_len} 厘米\n"
             result_text += f"   总尺寸：{total_size} 厘米\n\n"
             result_text += f"💰 配送费：{fee} 日元\n\n"
-            result_text += f"===== 计算过程 =====\n\n{calculation_steps}"
+            result_text += f"===== 计算过程 =====\n\n{fee_engine.render_steps(quote)}"
             
             # 保存到历史记录
             calculation_record = {
@@ -1408,274 +1446,27 @@ except Exception as e:
                 'weight': weight,
                 'size_segment': size_segment,
                 'shipping_fee': fee,
+                'rule_id': quote.rule_id,
+                'price_over_1000': price_over_1000,
+                'is_frozen': is_frozen,
                 'total_size': total_size
             }
             
             # 更新结果
             self.update_result(result_text)
             
-            # 添加到历史记录
+            # 添加到历史记录（内存中只保留最近的记录，超出时自动丢弃最早的记录）
             self.calculation_history.append(calculation_record)
             
-            # 限制历史记录数量，最多保存100条
-            if len(self.calculation_history) > 100:
-                self.calculation_history.pop(0)
-            
         except ValueError:
             messagebox.showerror("输入错误", "请输入有效的数字！")
         except Exception as e:
             messagebox.showerror("计算错误", f"计算过程中出现错误：\n{str(e)}")
     
     def determine_size_segment_jp(self, max_len_cm):
-        """
-        判断日本站的尺寸分段（基于最新FBA配送费计算标准）
-        参数:
-        - max_len_cm: 最长边(厘米)
-        返回:
-        - 尺寸分段描述
-        """
-        # 小号：不超过35厘米（对应23厘米×35厘米×10厘米的规格）
-        if max_len_cm <= 35:
-            return "小号"
-        # 标准尺寸：超过35厘米但不超过80厘米
-        elif max_len_cm <= 80:
-            return "标准"
-        # 大件：超过80厘米但不超过120厘米
-        elif max_len_cm <= 120:
-            return "大件"
-        # 超大件：超过120厘米但不超过200厘米
-        elif max_len_cm <= 200:
-            return "超大件"
-        # 超大件（超出200厘米）：超过200厘米的特殊情况
-        else:
-            return "超大件（超出200厘米）"
-    
-    def calculate_fee_with_steps_jp(self, size_segment, weight_g, price_over_1000, is_frozen=False):
-        """
-        计算日本站FBA配送费用并返回详细计算过程
-        参数:
-        - size_segment: 尺寸分段
-        - weight_g: 重量(克)
-        - price_over_1000: 价格是否超过1000日元
-        - is_frozen: 是否为冷冻商品
-        返回:
-        - (费用, 计算步骤)
-        """
-        steps = []
-        
-        # 获取最大长度
-        max_len_cm = 0
-        if hasattr(self, 'max_len_var') and self.max_len_var.get():
-            try:
-                max_len_cm = float(self.max_len_var.get())
-            except ValueError:
-                pass
-        
-        # 转换重量为千克
-        weight_kg = weight_g / 1000
-        
-        # 记录基本信息
-        steps.append("===== 日本站FBA配送费计算 =====")
-        steps.append(f"1. 根据尺寸分段 '{size_segment}' 计算费用")
-        steps.append(f"2. 商品价格{'超过' if price_over_1000 else '不超过'}1000日元")
-        steps.append(f"3. 商品重量: {weight_g} 克 ({weight_kg:.2f} 千克)")
-        steps.append(f"4. 商品最长边: {max_len_cm} 厘米")
-        steps.append(f"5. 商品类型: {'冷冻商品' if is_frozen else '非冷冻商品'}")
-        
-        # 根据表格定义的费用标准
-        if price_over_1000:
-            steps.append("6. 使用价格超过1000日元的费用标准")
-        else:
-            steps.append("6. 使用价格不超过1000日元的费用标准")
-        
-        # 根据尺寸分段和重量计算费用
-        fee = 0
-        
-        # 如果是冷冻商品，使用冷冻商品的费用标准
-        if is_frozen:
-            # 冷冻商品 - 小号尺寸费用
-            if size_segment == "小号":
-                if weight_g <= 250:
-                    fee = 695 if price_over_1000 else 647
-                    steps.append(f"7. 冷冻商品-小号（≤250克）: {fee} 日元")
-            
-            # 冷冻商品 - 标准尺寸费用
-            elif size_segment == "标准":
-                if max_len_cm <= 26:
-                    fee = 867 if price_over_1000 else 697
-                    steps.append(f"7. 冷冻商品-标准尺寸-1（≤26厘米）: {fee} 日元")
-                elif max_len_cm <= 32:
-                    fee = 788 if price_over_1000 else 723
-                    steps.append(f"7. 冷冻商品-标准尺寸-2（≤32厘米）: {fee} 日元")
-                elif max_len_cm <= 45:
-                    fee = 830 if price_over_1000 else 754
-                    steps.append(f"7. 冷冻商品-标准尺寸-3（≤45厘米）: {fee} 日元")
-                elif max_len_cm <= 60:
-                    fee = 960 if price_over_1000 else 874
-                    steps.append(f"7. 冷冻商品-标准尺寸-4（≤60厘米）: {fee} 日元")
-                elif max_len_cm <= 80:
-                    if weight_kg <= 2:
-                        fee = 898 if price_over_1000 else 804
-                        steps.append(f"7. 冷冻商品-标准尺寸-5（≤80厘米，≤2千克）: {fee} 日元")
-                    elif weight_kg <= 2.5:
-                        fee = 987 if price_over_1000 else 917
-                        steps.append(f"7. 冷冻商品-标准尺寸-6（≤80厘米，≤2.5千克）: {fee} 日元")
-                    elif weight_kg <= 3.5:
-                        fee = 1027 if price_over_1000 else 941
-                        steps.append(f"7. 冷冻商品-标准尺寸-7（≤80厘米，≤3.5千克）: {fee} 日元")
-                    else:
-                        fee = 1071 if price_over_1000 else 941
-                        steps.append(f"7. 冷冻商品-标准尺寸-8（≤80厘米，>3.5千克）: {fee} 日元")
-            
-            # 冷冻商品 - 大件费用
-            elif size_segment == "大件":
-                if max_len_cm <= 60:
-                    if weight_kg <= 2:
-                        fee = 984 if price_over_1000 else 898
-                        steps.append(f"7. 冷冻商品-大件-1（≤60厘米，≤2千克）: {fee} 日元")
-                elif max_len_cm <= 80:
-                    if weight_kg <= 2:
-                        fee = 990 if price_over_1000 else 900
-                        steps.append(f"7. 冷冻商品-大件-2（≤80厘米，≤2千克）: {fee} 日元")
-                    elif weight_kg <= 5:
-                        fee = 1080 if price_over_1000 else 983
-                        steps.append(f"7. 冷冻商品-大件-3（≤80厘米，≤5千克）: {fee} 日元")
-                elif max_len_cm <= 100:
-                    fee = 1153 if price_over_1000 else 1041
-                    steps.append(f"7. 冷冻商品-大件-4（≤100厘米）: {fee} 日元")
-            
-            # 冷冻商品 - 超大件费用
-            elif size_segment == "超大件":
-                if max_len_cm <= 120:
-                    fee = 1559 if price_over_1000 else 1434
-                    steps.append(f"7. 冷冻商品-超大件-1（≤120厘米）: {fee} 日元")
-                elif max_len_cm <= 140:
-                    fee = 1925 if price_over_1000 else 1760
-                    steps.append(f"7. 冷冻商品-超大件-2（≤140厘米）: {fee} 日元")
-                elif max_len_cm <= 170:
-                    fee = 2760 if price_over_1000 else 2600
-                    steps.append(f"7. 冷冻商品-超大件-3（≤170厘米）: {fee} 日元")
-                elif max_len_cm <= 200:
-                    fee = 3720 if price_over_1000 else 3500
-                    steps.append(f"7. 冷冻商品-超大件-4（≤200厘米）: {fee} 日元")
-            
-            # 冷冻商品 - 超大件（超出200厘米）
-            elif size_segment == "超大件（超出200厘米）":
-                fee = 4820 if price_over_1000 else 4620
-                steps.append(f"7. 冷冻商品-超大件（超出200厘米）: {fee} 日元")
-                steps.append("注意：超过200厘米或超过40千克的商品可能需要支付额外的尺寸费用")
-        else:
-            # 非冷冻商品 - 小号尺寸费用
-            if size_segment == "小号":
-                if weight_g <= 250:
-                    fee = 630 if price_over_1000 else 589
-                    steps.append(f"7. 非冷冻商品-小号（≤250克）: {fee} 日元")
-            
-            # 非冷冻商品 - 标准尺寸费用
-            elif size_segment == "标准":
-                if max_len_cm <= 26:
-                    fee = 807 if price_over_1000 else 677
-                    steps.append(f"7. 非冷冻商品-标准尺寸-1（≤26厘米）: {fee} 日元")
-                elif max_len_cm <= 32:
-                    fee = 781 if price_over_1000 else 723
-                    steps.append(f"7. 非冷冻商品-标准尺寸-2（≤32厘米）: {fee} 日元")
-                elif max_len_cm <= 45:
-                    fee = 860 if price_over_1000 else 784
-                    steps.append(f"7. 非冷冻商品-标准尺寸-3（≤45厘米）: {fee} 日元")
-                elif max_len_cm <= 60:
-                    fee = 994 if price_over_1000 else 914
-                    steps.append(f"7. 非冷冻商品-标准尺寸-4（≤60厘米）: {fee} 日元")
-                elif max_len_cm <= 80:
-                    fee = 896 if price_over_1000 else 801
-                    steps.append(f"7. 非冷冻商品-标准尺寸-5（≤80厘米，≤2千克）: {fee} 日元")
-            
-            # 非冷冻商品 - 大件费用
-            elif size_segment == "大件":
-                if max_len_cm <= 60:
-                    fee = 946 if price_over_1000 else 886
-                    steps.append(f"7. 非冷冻商品-大件-1（≤60厘米，≤2千克）: {fee} 日元")
-                elif max_len_cm <= 80:
-                    if weight_kg <= 2:
-                        fee = 963 if price_over_1000 else 893
-                        steps.append(f"7. 非冷冻商品-大件-2（≤80厘米，≤2千克）: {fee} 日元")
-                    elif weight_kg <= 5:
-                        fee = 1032 if price_over_1000 else 933
-                        steps.append(f"7. 非冷冻商品-大件-3（≤80厘米，≤5千克）: {fee} 日元")
-                elif max_len_cm <= 100:
-                    fee = 1052 if price_over_1000 else 944
-                    steps.append(f"7. 非冷冻商品-大件-4（≤100厘米）: {fee} 日元")
-                elif max_len_cm <= 120:
-                    if weight_kg <= 10:
-                        fee = 1285 if price_over_1000 else 1101
-                        steps.append(f"7. 非冷冻商品-大件-5（≤120厘米，≤10千克）: {fee} 日元")
-            
-            # 非冷冻商品 - 超大件费用
-            elif size_segment == "超大件":
-                if max_len_cm <= 140:
-                    fee = 1756 if price_over_1000 else 1680
-                    steps.append(f"7. 非冷冻商品-超大件-1（≤140厘米）: {fee} 日元")
-                elif max_len_cm <= 170:
-                    fee = 2675 if price_over_1000 else 2555
-                    steps.append(f"7. 非冷冻商品-超大件-2（≤170厘米）: {fee} 日元")
-                elif max_len_cm <= 200:
-                    if weight_kg <= 30:
-                        fee = 3691 if price_over_1000 else 3491
-                        steps.append(f"7. 非冷冻商品-超大件-3（≤200厘米，≤30千克）: {fee} 日元")
-                    elif weight_kg <= 40:
-                        fee = 4650 if price_over_1000 else 4450
-                        steps.append(f"7. 非冷冻商品-超大件-4（≤200厘米，≤40千克）: {fee} 日元")
-            
-            # 非冷冻商品 - 超大件（超出200厘米）
-            elif size_segment == "超大件（超出200厘米）":
-                fee = 4820 if price_over_1000 else 4620
-                steps.append(f"7. 非冷冻商品-超大件（超出200厘米）: {fee} 日元")
-                steps.append("注意：超过200厘米或超过40千克的商品可能需要支付额外的尺寸费用")
-        
-        # 特殊情况处理：如果没有匹配到费用规则
-        if fee == 0:
-            # 尝试根据重量进行兜底计算
-            if is_frozen:
-                # 冷冻商品兜底计算
-                if weight_kg <= 2:
-                    fee = 984 if price_over_1000 else 898
-                    steps.append(f"7. 冷冻商品默认费用（≤2千克）: {fee} 日元")
-                elif weight_kg <= 5:
-                    fee = 1080 if price_over_1000 else 983
-                    steps.append(f"7. 冷冻商品默认费用（≤5千克）: {fee} 日元")
-                elif weight_kg <= 10:
-                    fee = 1285 if price_over_1000 else 1101
-                    steps.append(f"7. 冷冻商品默认费用（≤10千克）: {fee} 日元")
-                else:
-                    fee = 1756 if price_over_1000 else 1680
-                    steps.append(f"7. 冷冻商品默认费用（>10千克）: {fee} 日元")
-            else:
-                # 非冷冻商品兜底计算
-                if weight_kg <= 2:
-                    fee = 946 if price_over_1000 else 886
-                    steps.append(f"7. 非冷冻商品默认费用（≤2千克）: {fee} 日元")
-                elif weight_kg <= 5:
-                    fee = 1032 if price_over_1000 else 933
-                    steps.append(f"7. 非冷冻商品默认费用（≤5千克）: {fee} 日元")
-                elif weight_kg <= 10:
-                    fee = 1285 if price_over_1000 else 1101
-                    steps.append(f"7. 非冷冻商品默认费用（≤10千克）: {fee} 日元")
-                else:
-                    fee = 1756 if price_over_1000 else 1680
-                    steps.append(f"7. 非冷冻商品默认费用（>10千克）: {fee} 日元")
-        
-        # 添加最终计算结果
-        steps.append(f"8. 最终配送费: {fee} 日元")
-        
-        # 添加燃油附加费说明
-        steps.append("\n注：所有费用包含10%的燃油附加费")
-        
-        # 添加冷冻商品特殊说明
-        if is_frozen:
-            steps.append("\n冷冻商品特别说明：")
-            steps.append("- 冷冻商品需使用温控包装，可能产生额外费用")
-            steps.append("- 部分冷冻食品可能受特殊处理费影响")
-        
-        return fee, "\n".join(steps)
+        """判断日本站的尺寸分段（基于最新FBA配送费计算标准）"""
+        return fee_engine.determine_size_segment_jp(max_len_cm)
+
 
 def load_feedbacks(feedback_file="feedback_jp.json"):
     """加载本地保存的反馈数据"""
@@ -1720,12 +1511,18 @@ def run_app():
     )
     
     logging.info("日本站FBA配送费计算器启动")
+    startup_profiler.checkpoint("配置日志")
     
     # 创建主窗口
     root = tk.Tk()
+    startup_profiler.checkpoint("创建主窗口")
     
     # 创建应用实例
     app = FBAShippingCalculatorJP(root)
+    startup_profiler.checkpoint("创建主界面")
+    
+    # 启用启动耗时分析时，首次绘制后将报告写入日志
+    startup_profiler.report_on_first_paint(root)
     
     # 启动主循环
     root.mainloop()
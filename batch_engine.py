@@ -0,0 +1,663 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+FBA批量计算流水线
+不依赖tkinter，按块读取CSV/XLSX、计算配送费并立即写入结果文件（CSV或XLSX），内存占用与文件大小无关
+美国站每块使用fee_engine.calculate_fba_fees向量化计算（需要numpy，未安装时逐行计算）
+可选多进程模式：按块分发给进程池并行计算，结果按原始行顺序写回
+"""
+
+import codecs
+import csv
+import json
+import os
+from collections import deque
+from contextlib import contextmanager
+from itertools import islice
+
+import fee_engine
+import lazy_imports
+
+# 批量文件必须包含的列
+REQUIRED_COLUMNS = ['重量(g)', '最长边(cm)', '次长边(cm)', '最短边(cm)']
+
+# 支持的站点
+SITES = ('us', 'jp')
+
+# 计算结果追加的列（美国站）
+RESULT_COLUMNS = ['尺寸分段', '重量', '长度+围长', '配送费']
+
+# 计算结果追加的列（日本站）
+JP_RESULT_COLUMNS = ['尺寸分段', '配送费']
+
+# 必要列的映射，支持多种可能的列名变体
+COLUMN_MAPPINGS = {
+    '重量(g)': ['重量(g)', '重量', 'weight'],
+    '最长边(cm)': ['最长边(cm)', '最长边', 'length', '长'],
+    '次长边(cm)': ['次长边(cm)', '次长边', 'width', '宽'],
+    '最短边(cm)': ['最短边(cm)', '最短边', 'height', '高']
+}
+
+# 日本站的可选列：缺少时与日本站界面默认值一致（价格超过1000日元、非冷冻商品）
+JP_OPTIONAL_COLUMN_MAPPINGS = {
+    '售价(日元)': ['售价(日元)', '售价', '价格', 'price'],
+    '冷冻商品': ['冷冻商品', '冷冻', 'frozen']
+}
+
+# 冷冻商品列中表示“是”的取值
+TRUE_VALUES = ('1', 'true', 'yes', 'y', '是')
+
+# 结果文件的编码（带BOM，方便Excel直接打开）
+OUTPUT_ENCODING = 'utf-8-sig'
+
+# 每块的行数：美国站每块进行一次向量化计算，多进程模式下每块为一个任务
+DEFAULT_CHUNK_SIZE = 5000
+
+# XLSX结果文件：用于估算列宽的样本行数，以及列宽上限
+XLSX_WIDTH_SAMPLE_ROWS = 1000
+XLSX_MAX_COLUMN_WIDTH = 50
+
+# 编码检测：字节顺序标记（BOM）及对应编码
+ENCODING_BOMS = (
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+
+# 无BOM时按优先级尝试解码的编码（cp936与gbk相同；latin-1可解码任意字节，作为兜底）
+ENCODING_CANDIDATES = ('utf-8-sig', 'gbk', 'cp1252', 'latin-1')
+
+# 编码检测每次读取的块大小（也是从第一个非ASCII字节开始用于试解码的样本大小）
+ENCODING_SAMPLE_SIZE = 64 * 1024
+
+# 编码检测最多跳过的纯ASCII字节数，超过后按UTF-8处理（ASCII是UTF-8的子集）
+ENCODING_MAX_SCAN_BYTES = 8 * 1024 * 1024
+
+
+def detect_encoding(path, sample_size=ENCODING_SAMPLE_SIZE, max_scan_bytes=ENCODING_MAX_SCAN_BYTES):
+    """
+    从文件中的有限字节检测文本编码，避免用每种编码完整解析一遍文件
+
+    先检查BOM；没有BOM时跳过开头的纯ASCII部分（任何候选编码都能解码，无法区分），
+    从第一个非ASCII字节开始取样，再按ENCODING_CANDIDATES的顺序试解码，返回第一个成功的编码。
+    跳过的ASCII数据不保留在内存中；最多跳过max_scan_bytes字节，开头这部分仍全是ASCII时返回utf-8，
+    纯ASCII的大文件因此不会在正式解析前被完整读一遍
+
+    参数:
+        path: 文件路径
+        sample_size: 每次读取的字节数
+        max_scan_bytes: 最多跳过的纯ASCII字节数
+
+    返回:
+        编码名称，可直接传给open()
+    """
+    with open(path, 'rb') as f:
+        sample = f.read(sample_size)
+        for bom, encoding in ENCODING_BOMS:
+            if sample.startswith(bom):
+                return encoding
+
+        # 纯ASCII的数据块直接跳过，直到出现非ASCII字节、到达文件末尾或达到跳过上限
+        scanned = len(sample)
+        while sample and sample.isascii():
+            if scanned >= max_scan_bytes:
+                return 'utf-8'
+            sample = f.read(sample_size)
+            scanned += len(sample)
+
+        if sample:
+            # 非ASCII字节前一个字节是ASCII，因此从这里开始一定是完整字符的开头
+            start = next(i for i, byte in enumerate(sample) if byte >= 0x80)
+            sample = sample[start:]
+            if len(sample) < sample_size:
+                sample += f.read(sample_size - len(sample))
+
+    for encoding in ENCODING_CANDIDATES:
+        # 使用增量解码器且final=False，样本末尾被截断的多字节字符不视为错误
+        try:
+            codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+
+    return ENCODING_CANDIDATES[-1]
+
+
+def _find_column(actual_columns, possible_names):
+    """在实际列名中查找与候选名称匹配的第一列，找不到时返回None"""
+    for actual_col in actual_columns:
+        # 不区分大小写进行匹配，并且考虑部分匹配
+        actual_lower = actual_col.lower()
+        for possible in possible_names:
+            possible_lower = possible.lower()
+            if possible_lower in actual_lower or actual_lower in possible_lower:
+                return actual_col
+    return None
+
+
+def match_columns(fieldnames, site='us'):
+    """
+    将CSV表头与必要列进行匹配
+
+    参数:
+        fieldnames: CSV表头列名列表
+        site: 站点，'us'或'jp'（日本站还会匹配售价和冷冻商品两个可选列）
+
+    返回:
+        必要列到实际列名的映射字典
+
+    异常:
+        ValueError: 文件缺少必要的列
+    """
+    # 获取实际的列名并进行清理（去除空格和其他可能的干扰字符）
+    actual_columns = [col.strip() for col in fieldnames if col]
+
+    column_map = {}
+    missing_columns = []
+    for req_col, possible_names in COLUMN_MAPPINGS.items():
+        actual_col = _find_column(actual_columns, possible_names)
+        if actual_col is None:
+            missing_columns.append(req_col)
+        else:
+            column_map[req_col] = actual_col
+
+    if missing_columns:
+        # 尝试使用原始逻辑再次检查，确保向后兼容性
+        original_missing = [col for col in REQUIRED_COLUMNS if col not in fieldnames]
+        if original_missing:
+            raise ValueError(f"文件缺少必要的列：{', '.join(original_missing)}")
+
+    if site == 'jp':
+        # 可选列只在找到时加入映射，且不能与必要列重复
+        used_columns = set(column_map.values())
+        for opt_col, possible_names in JP_OPTIONAL_COLUMN_MAPPINGS.items():
+            actual_col = _find_column([col for col in actual_columns if col not in used_columns], possible_names)
+            if actual_col is not None:
+                column_map[opt_col] = actual_col
+
+    return column_map
+
+
+def output_fieldnames(fieldnames, site='us'):
+    """结果文件的列顺序：必要列和计算结果在前，其他原始列在后"""
+    result_columns = JP_RESULT_COLUMNS if site == 'jp' else RESULT_COLUMNS
+    return REQUIRED_COLUMNS + result_columns + [col for col in fieldnames if col not in REQUIRED_COLUMNS]
+
+
+def _read_dimensions(row, column_map):
+    """读取一行中的重量和三边长度"""
+    return (
+        float(row[column_map.get('重量(g)', '重量(g)')]),
+        float(row[column_map.get('最长边(cm)', '最长边(cm)')]),
+        float(row[column_map.get('次长边(cm)', '次长边(cm)')]),
+        float(row[column_map.get('最短边(cm)', '最短边(cm)')]),
+    )
+
+
+def _with_other_columns(result_dict, row):
+    """添加原始数据中的其他列（忽略DictReader为多出字段生成的None键）"""
+    for col in row:
+        if col is not None and col not in REQUIRED_COLUMNS:
+            result_dict[col] = row[col]
+    return result_dict
+
+
+def process_row_jp(row, column_map):
+    """
+    计算单行数据的日本站配送费
+
+    参数:
+        row: 行字典
+        column_map: match_columns(..., site='jp')返回的列名映射
+
+    返回:
+        结果行字典
+    """
+    weight_g, length_cm, width_cm, height_cm = _read_dimensions(row, column_map)
+
+    price = row.get(column_map.get('售价(日元)'), '')
+    price_over_1000 = float(price) > 1000 if str(price).strip() else True
+    is_frozen = str(row.get(column_map.get('冷冻商品'), '')).strip().lower() in TRUE_VALUES
+
+    # 与日本站界面一致，以三边中的最大值判断尺寸分段；相同规格直接使用缓存结果
+    size_segment, fee = fee_engine.calculate_fee_jp_cached(
+        weight_g, length_cm, width_cm, height_cm, price_over_1000, is_frozen
+    )
+
+    return _with_other_columns({
+        '重量(g)': weight_g,
+        '最长边(cm)': length_cm,
+        '次长边(cm)': width_cm,
+        '最短边(cm)': height_cm,
+        '尺寸分段': size_segment,
+        '配送费': fee
+    }, row)
+
+
+def process_row(row, column_map, site='us'):
+    """
+    计算单行数据的配送费
+
+    参数:
+        row: csv.DictReader读出的一行
+        column_map: match_columns返回的列名映射
+        site: 站点，'us'或'jp'
+
+    返回:
+        结果行字典
+    """
+    if site == 'jp':
+        return process_row_jp(row, column_map)
+
+    dimensions = _read_dimensions(row, column_map)
+
+    # 相同规格直接使用缓存结果
+    return _us_result(row, dimensions, fee_engine.calculate_fba_fee_cached(*dimensions))
+
+
+def _us_result(row, dimensions, calc_result):
+    """组装美国站结果行"""
+    weight_g, length_cm, width_cm, height_cm = dimensions
+    return _with_other_columns({
+        '重量(g)': weight_g,
+        '最长边(cm)': length_cm,
+        '次长边(cm)': width_cm,
+        '最短边(cm)': height_cm,
+        '尺寸分段': calc_result['size_tier'],
+        '重量': calc_result['weight_display'],
+        '长度+围长': calc_result['girth_display'],
+        '配送费': calc_result['fee']
+    }, row)
+
+
+def _process_rows(first_row_number, rows, column_map, site):
+    """逐行计算一块数据"""
+    results = []
+    for row_number, row in enumerate(rows, first_row_number):
+        try:
+            results.append((row_number, process_row(row, column_map, site), None))
+        except Exception as e:
+            results.append((row_number, None, str(e)))
+    return results
+
+
+def _process_rows_vectorized(first_row_number, rows, column_map):
+    """
+    美国站：先逐行解析数字（无法解析的行单独报错），再对整块调用calculate_fba_fees一次计算；
+    向量化结果中无法计算的费用（NaN，如超出重量范围）按逐行方式计算，得到相同的错误说明
+    """
+    results = []
+    parsed = []  # (结果列表中的位置, 行, 重量和三边)
+    for row_number, row in enumerate(rows, first_row_number):
+        try:
+            parsed.append((len(results), row, _read_dimensions(row, column_map)))
+            results.append(None)
+        except Exception as e:
+            results.append((row_number, None, str(e)))
+
+    if parsed:
+        batch = fee_engine.calculate_fba_fees(*zip(*(dimensions for _, _, dimensions in parsed)))
+        for i, (position, row, dimensions) in enumerate(parsed):
+            row_number = first_row_number + position
+            fee = float(batch['fee'][i])
+            if fee != fee:
+                results[position] = (row_number, process_row(row, column_map), None)
+                continue
+            results[position] = (row_number, _us_result(row, dimensions, {
+                'size_tier': str(batch['size_tier'][i]),
+                'weight_display': f"{batch['weight_lb'][i]:.2f} 磅 / {batch['weight_oz'][i]:.2f} 盎司",
+                'girth_display': f"{batch['len_girth'][i]:.2f} 英寸",
+                'fee': fee,
+            }), None)
+    return results
+
+
+class XlsxDictWriter:
+    """
+    以openpyxl只写模式流式写入XLSX文件，接口与csv.DictWriter一致
+
+    只写模式要求在写入第一行之前设置列宽，因此先缓存前sample_rows行，
+    根据表头和样本行估算列宽后再统一写出，之后的行直接写入，不再参与列宽计算
+    """
+
+    def __init__(self, path, fieldnames, sample_rows=XLSX_WIDTH_SAMPLE_ROWS):
+        from openpyxl import Workbook
+
+        self.path = path
+        self.fieldnames = list(fieldnames)
+        self.sample_rows = sample_rows
+        self._workbook = Workbook(write_only=True)
+        self._sheet = self._workbook.create_sheet("Sheet1")
+        self._pending = []
+
+    def _flush_pending(self):
+        """根据缓存的样本行设置列宽，然后写出缓存的行"""
+        if self._pending is None:
+            return
+
+        from openpyxl.utils import get_column_letter
+
+        for index in range(len(self.fieldnames)):
+            max_length = max(len(str(values[index])) for values in self._pending)
+            self._sheet.column_dimensions[get_column_letter(index + 1)].width = min(max_length + 2, XLSX_MAX_COLUMN_WIDTH)
+
+        for values in self._pending:
+            self._sheet.append(values)
+        self._pending = None
+
+    def _append(self, values):
+        if self._pending is None:
+            self._sheet.append(values)
+            return
+        self._pending.append(values)
+        if len(self._pending) > self.sample_rows:
+            self._flush_pending()
+
+    def writeheader(self):
+        self._append(self.fieldnames)
+
+    def writerow(self, row):
+        # 缺少的列写为空值，与csv.DictWriter的restval一致
+        self._append([row.get(name, '') for name in self.fieldnames])
+
+    def close(self):
+        if self._pending:
+            self._flush_pending()
+        self._workbook.save(self.path)
+
+
+class JsonLinesWriter:
+    """逐行写入JSON Lines文件（每行一个JSON对象），接口与csv.DictWriter一致"""
+
+    def __init__(self, stream, fieldnames):
+        self._stream = stream
+        self.fieldnames = list(fieldnames)
+
+    def writeheader(self):
+        # JSON Lines没有表头，列名在每个对象的键中
+        pass
+
+    def writerow(self, row):
+        values = {name: row.get(name, '') for name in self.fieldnames}
+        self._stream.write(json.dumps(values, ensure_ascii=False) + '\n')
+
+
+@contextmanager
+def open_result_writer(output_path, fieldnames):
+    """
+    根据扩展名打开结果文件写入器：.xlsx使用XlsxDictWriter，.jsonl使用JsonLinesWriter，其他使用带BOM的CSV
+
+    参数:
+        output_path: 结果文件路径
+        fieldnames: 列名列表
+
+    返回:
+        上下文管理器，产生具有writeheader()/writerow()方法的写入器
+    """
+    if output_path.lower().endswith('.xlsx'):
+        writer = XlsxDictWriter(output_path, fieldnames)
+        yield writer
+        writer.close()
+    elif output_path.lower().endswith('.jsonl'):
+        with open(output_path, 'w', encoding='utf-8') as dst:
+            yield JsonLinesWriter(dst, fieldnames)
+    else:
+        with open(output_path, 'w', encoding=OUTPUT_ENCODING, newline='') as dst:
+            yield csv.DictWriter(dst, fieldnames=fieldnames)
+
+
+def process_chunk(first_row_number, rows, column_map, site='us'):
+    """
+    计算一块数据（多进程模式下在子进程中运行，因此只使用可序列化的参数和模块级函数）
+
+    美国站在安装了numpy时整块向量化计算，否则与日本站一样逐行计算（相同规格使用缓存结果）
+
+    参数:
+        first_row_number: 块中第一行的行号
+        rows: 行字典列表
+        column_map: match_columns返回的列名映射
+        site: 站点，'us'或'jp'
+
+    返回:
+        ([(行号, 结果行字典或None, 错误信息或None), ...], 缓存命中次数, 缓存未命中次数, 向量化计算的行数)
+    """
+    before = fee_engine.fee_cache_info()
+    if site == 'us' and lazy_imports.is_available('numpy'):
+        results = _process_rows_vectorized(first_row_number, rows, column_map)
+        vectorized_rows = len(rows)
+    else:
+        results = _process_rows(first_row_number, rows, column_map, site)
+        vectorized_rows = 0
+    after = fee_engine.fee_cache_info()
+    return results, after.hits - before.hits, after.misses - before.misses, vectorized_rows
+
+
+class CacheStats:
+    """批量计算的费用缓存命中统计（多进程模式下汇总各子进程的统计）"""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.vectorized_rows = 0
+
+    def add(self, hits, misses, vectorized_rows=0):
+        self.hits += hits
+        self.misses += misses
+        self.vectorized_rows += vectorized_rows
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def summary(self):
+        text = f"费用缓存：命中 {self.hits} 次，未命中 {self.misses} 次，命中率 {self.hit_rate:.1%}"
+        if self.vectorized_rows:
+            text = f"向量化批量计算 {self.vectorized_rows} 行；{text}"
+        return text
+
+
+def map_records(records, column_map, workers=1, chunk_size=DEFAULT_CHUNK_SIZE, site='us',
+                cache_stats=None):
+    """
+    按原始顺序分块计算配送费
+
+    数据按chunk_size分块，每块调用一次process_chunk；workers大于1时将各块提交给进程池，
+    最多同时有workers×2个块在处理，按提交顺序取回结果，因此输出顺序与输入一致，内存占用也不随文件大小增长
+
+    参数:
+        records: 行字典的可迭代对象
+        column_map: match_columns返回的列名映射
+        workers: 进程数，1表示在当前进程中计算
+        chunk_size: 每块的行数
+        site: 站点，'us'或'jp'
+        cache_stats: 可选的CacheStats，累加本次计算的缓存命中统计
+
+    返回:
+        生成器，依次产生(行号, 结果行字典或None, 错误信息或None)
+    """
+    def take_results(outcome):
+        results, hits, misses, vectorized_rows = outcome
+        if cache_stats is not None:
+            cache_stats.add(hits, misses, vectorized_rows)
+        return results
+
+    def chunks():
+        iterator = iter(records)
+        first_row_number = 1
+        while True:
+            chunk = list(islice(iterator, chunk_size))
+            if not chunk:
+                return
+            yield first_row_number, chunk
+            first_row_number += len(chunk)
+
+    if workers <= 1:
+        for first_row_number, chunk in chunks():
+            yield from take_results(process_chunk(first_row_number, chunk, column_map, site))
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for first_row_number, chunk in chunks():
+            pending.append(pool.submit(process_chunk, first_row_number, chunk, column_map, site))
+
+            # 限制在途任务数量，先完成最早提交的块以保持行顺序
+            if len(pending) >= workers * 2:
+                yield from take_results(pending.popleft().result())
+
+        while pending:
+            yield from take_results(pending.popleft().result())
+
+
+def write_fees(fieldnames, records, output_path, on_row=None, on_error=None,
+               workers=1, chunk_size=DEFAULT_CHUNK_SIZE, site='us', cache_stats=None):
+    """
+    计算所有行并逐行写入结果文件（CSV或XLSX，按扩展名判断）
+
+    参数:
+        fieldnames: 输入表头
+        records: 行字典的可迭代对象
+        output_path: 结果文件路径（覆盖写入）
+        on_row: 可选回调，每处理完一行调用一次，参数为行号
+        on_error: 可选回调，参数为(行号, 错误信息)，无法计算的行会被跳过
+        workers: 进程数，1表示在当前进程中计算
+        chunk_size: 每块的行数
+        site: 站点，'us'或'jp'
+        cache_stats: 可选的CacheStats，累加本次计算的缓存命中统计
+
+    返回:
+        (成功行数, 总行数)
+
+    异常:
+        ValueError: 缺少必要的列
+    """
+    column_map = match_columns(fieldnames, site)
+    success_rows = 0
+    total_rows = 0
+
+    with open_result_writer(output_path, output_fieldnames(fieldnames, site)) as writer:
+        writer.writeheader()
+
+        for total_rows, result, error in map_records(records, column_map, workers, chunk_size, site, cache_stats):
+            if error is None:
+                writer.writerow(result)
+                success_rows += 1
+            elif on_error is not None:
+                on_error(total_rows, error)
+
+            if on_row is not None:
+                on_row(total_rows)
+
+    return success_rows, total_rows
+
+
+def stream_csv_fees(input_path, output_path, encoding, on_progress=None, on_error=None,
+                    workers=1, chunk_size=DEFAULT_CHUNK_SIZE, site='us', cache_stats=None):
+    """
+    流式处理CSV文件：逐行读取、计算并写入结果文件，不在内存中保留全部数据
+
+    参数:
+        input_path: 输入CSV文件路径
+        output_path: 结果文件路径（.xlsx或.csv，覆盖写入）
+        encoding: 输入文件编码
+        on_progress: 可选回调，参数为已读取字节占文件大小的比例（0~1）
+        on_error: 可选回调，参数为(行号, 错误信息)，无法计算的行会被跳过
+        workers: 进程数，1表示在当前进程中计算
+        chunk_size: 每块的行数
+        site: 站点，'us'或'jp'
+        cache_stats: 可选的CacheStats，累加本次计算的缓存命中统计
+
+    返回:
+        (成功行数, 总行数)
+
+    异常:
+        ValueError: 文件为空或缺少必要的列
+        UnicodeDecodeError: 文件编码与encoding不符（已写入的部分结果文件会被删除）
+    """
+    file_size = os.path.getsize(input_path) or 1
+
+    with open(input_path, 'r', encoding=encoding, newline='') as src:
+        reader = csv.DictReader(src)
+        if reader.fieldnames is None:
+            raise ValueError("CSV文件为空")
+
+        on_row = None
+        if on_progress is not None:
+            # 文本迭代时无法调用tell()，用底层缓冲区的位置估算进度
+            on_row = lambda row_number: on_progress(min(src.buffer.tell() / file_size, 1.0))
+
+        try:
+            counts = write_fees(reader.fieldnames, reader, output_path, on_row, on_error,
+                                workers, chunk_size, site, cache_stats)
+        except UnicodeDecodeError:
+            # 处理到一半才发现编码不符，不保留不完整的结果文件
+            try:
+                os.remove(output_path)
+            except OSError:
+                pass
+            raise
+
+    if on_progress is not None:
+        on_progress(1.0)
+
+    return counts
+
+
+def iter_xlsx_records(workbook):
+    """
+    逐行读取只读模式打开的工作簿的第一个工作表
+
+    参数:
+        workbook: openpyxl以read_only=True打开的工作簿
+
+    返回:
+        (表头列表, 行字典生成器, 数据行数估计值或None)
+    """
+    sheet = workbook.worksheets[0]
+    rows = sheet.iter_rows(values_only=True)
+
+    header = next(rows, None)
+    if header is None:
+        raise ValueError("Excel文件为空")
+    fieldnames = ['' if value is None else str(value).strip() for value in header]
+    estimated_rows = sheet.max_row - 1 if sheet.max_row else None
+
+    def records():
+        for values in rows:
+            # 跳过完全空白的行
+            if all(value is None for value in values):
+                continue
+            yield {name: ('' if value is None else value) for name, value in zip(fieldnames, values)}
+
+    return fieldnames, records(), estimated_rows
+
+
+def stream_xlsx_fees(input_path, output_path, on_progress=None, on_error=None,
+                     workers=1, chunk_size=DEFAULT_CHUNK_SIZE, site='us', cache_stats=None):
+    """
+    流式处理XLSX文件：以只读模式逐行读取，计算结果逐行写入结果文件
+
+    参数与返回值同stream_csv_fees（无需编码参数）
+    """
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(input_path, read_only=True, data_only=True)
+    try:
+        fieldnames, records, estimated_rows = iter_xlsx_records(workbook)
+
+        on_row = None
+        if on_progress is not None and estimated_rows:
+            on_row = lambda row_number: on_progress(min(row_number / estimated_rows, 1.0))
+
+        counts = write_fees(fieldnames, records, output_path, on_row, on_error,
+                            workers, chunk_size, site, cache_stats)
+    finally:
+        workbook.close()
+
+    if on_progress is not None:
+        on_progress(1.0)
+
+    return counts
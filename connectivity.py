@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+网络连接检测
+检测结果在本次运行中缓存，界面、更新检查和反馈发送共用同一次检测，不重复等待超时
+检测可以在后台线程中进行，不阻塞窗口显示
+"""
+
+import logging
+import threading
+import time
+import urllib.request
+
+# 检测连接时依次尝试的URL，包括常用的稳定网站和更新服务器
+CONNECTIVITY_TEST_URLS = (
+    "https://www.baidu.com",  # 国内常用网站
+    "https://tomarens.xyz",  # 上传服务器地址
+    "https://example.com",  # 默认更新检查地址的域名
+)
+
+CONNECT_TIMEOUT = 3  # 每次请求的超时时间（秒）
+MAX_RETRIES = 2  # 每个URL的最大重试次数
+RETRY_DELAY = 0.5  # 重试前的等待时间（秒）
+
+# 检测失败的结果在这段时间内直接复用，之后再次调用时重新检测（秒）
+FAILURE_CACHE_SECONDS = 10
+
+_lock = threading.Lock()
+_connected = None  # None表示尚未检测
+_checked_at = 0.0
+_probe_done = None  # 正在进行的检测完成时设置的Event，没有进行中的检测时为None
+
+
+def probe_internet_connection(urls=CONNECTIVITY_TEST_URLS):
+    """
+    实际检测网络连接：依次向各URL发送HEAD请求，任意一个成功即认为网络可用
+
+    参数:
+        urls: 要尝试的URL列表
+
+    返回:
+        网络可用时返回True，否则返回False
+    """
+    logging.info("正在检查网络连接...")
+
+    for url in urls:
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                # 发送HEAD请求，只获取响应头，不下载内容
+                req = urllib.request.Request(url, method='HEAD')
+                with urllib.request.urlopen(req, timeout=CONNECT_TIMEOUT) as response:
+                    if response.status == 200:
+                        logging.info(f"成功连接到 {url}")
+                        return True
+            except Exception as e:
+                logging.warning(f"连接到 {url} 失败（尝试 {attempt+1}/{MAX_RETRIES+1}）: {str(e)}")
+                if attempt < MAX_RETRIES:
+                    time.sleep(RETRY_DELAY)  # 短暂延迟后重试
+
+    logging.error("所有网络连接尝试都失败了")
+    return False
+
+
+def connection_status():
+    """返回最近一次检测的结果（尚未检测时为None），不发起网络请求"""
+    return _connected
+
+
+def ensure_internet_connection(refresh=False):
+    """
+    确保网络连接可用，支持自动更新功能
+
+    检测成功后本次运行中不再重复检测；检测失败的结果在FAILURE_CACHE_SECONDS内复用。
+    多个线程同时调用时只进行一次检测，其余线程等待并共用结果；检测期间不持有锁，
+    读取缓存结果的调用（如界面线程中的connection_status）不会被阻塞。
+    会等待网络检测完成，不要在界面线程中调用
+
+    参数:
+        refresh: 为True时忽略缓存重新检测（已有进行中的检测时等待其结果）
+
+    返回:
+        网络可用时返回True，否则返回False
+    """
+    global _connected, _checked_at, _probe_done
+
+    with _lock:
+        if not refresh and _connected is not None:
+            if _connected or time.monotonic() - _checked_at < FAILURE_CACHE_SECONDS:
+                return _connected
+        done = _probe_done
+        if done is None:
+            # 由当前线程进行检测
+            done = _probe_done = threading.Event()
+            probing = True
+        else:
+            probing = False
+
+    if not probing:
+        done.wait()
+        return bool(_connected)
+
+    connected = False
+    try:
+        connected = probe_internet_connection()
+    finally:
+        with _lock:
+            _connected = connected
+            _checked_at = time.monotonic()
+            _probe_done = None
+        done.set()
+    return connected
+
+
+def check_connection_async(callback=None):
+    """
+    在后台线程中检测网络连接，不阻塞调用方
+
+    参数:
+        callback: 检测完成后在后台线程中调用，参数为检测结果；
+                  在界面中使用时需通过root.after切回主线程更新控件
+
+    返回:
+        后台线程对象
+    """
+    def worker():
+        connected = ensure_internet_connection()
+        if callback is not None:
+            callback(connected)
+
+    thread = threading.Thread(target=worker, daemon=True)
+    thread.start()
+    return thread
@@ -17,6 +17,7 @@ import time
 import json
 import urllib.request
 import hashlib
+import resumable_download
 from datetime import datetime
 
 class EnhancedFBAInstaller:
@@ -329,12 +330,13 @@ class EnhancedFBAInstaller:
             # 方式1: 直接从URL下载
             if download_url and download_url.startswith(('http://', 'https://')):
                 try:
-                    def report_progress(count, block_size, total_size):
-                        percent = int(count * block_size * 100 / total_size)
-                        if percent <= 100:
+                    def report_progress(downloaded, total_size):
+                        if total_size:
+                            percent = min(int(downloaded * 100 / total_size), 100)
                             self.root.after(0, lambda: self.progress_var.set(20 + percent * 0.5))
                     
-                    urllib.request.urlretrieve(download_url, self.update_exe_path, reporthook=report_progress)
+                    # 连接中断时从断点继续；未完成的部分保存在downloads目录中，重新运行更新时接着下载
+                    resumable_download.download_file(download_url, self.update_exe_path, progress_callback=report_progress)
                     download_success = True
                 except Exception as e:
                     self.update_status(f"直接下载失败，尝试备用方式: {str(e)}")
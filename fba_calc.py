@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+FBA配送费计算器命令行入口
+不创建tkinter窗口、不加载主题、不检查网络，适合定时任务批量重新计算配送费
+
+用法:
+    python -m fba_calc batch in.csv out.csv --site us
+    python -m fba_calc batch in.xlsx out.xlsx --site jp --workers 8
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import batch_engine
+
+# 失败行逐条输出的上限，其余只输出数量
+MAX_PRINTED_ERRORS = 20
+
+
+def run_batch(args):
+    """执行batch子命令，返回进程退出码"""
+    failed_rows = [0]
+
+    def print_row_error(row_number, error):
+        failed_rows[0] += 1
+        if failed_rows[0] <= MAX_PRINTED_ERRORS:
+            print(f"处理行 {row_number}: 失败 - {error}", file=sys.stderr)
+
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+    cache_stats = batch_engine.CacheStats()
+    start_time = time.monotonic()
+
+    try:
+        if args.input.lower().endswith('.xlsx'):
+            success_rows, total_rows = batch_engine.stream_xlsx_fees(
+                args.input, args.output, on_error=print_row_error,
+                workers=workers, chunk_size=args.chunk_size, site=args.site, cache_stats=cache_stats
+            )
+        else:
+            # 未指定编码时根据文件开头的字节检测
+            encoding = args.encoding or batch_engine.detect_encoding(args.input)
+            success_rows, total_rows = batch_engine.stream_csv_fees(
+                args.input, args.output, encoding, on_error=print_row_error,
+                workers=workers, chunk_size=args.chunk_size, site=args.site, cache_stats=cache_stats
+            )
+    except ImportError:
+        print("错误：处理Excel文件需要安装openpyxl库", file=sys.stderr)
+        return 1
+    except (OSError, ValueError) as e:
+        # 文件不存在、编码不符、文件为空或缺少必要的列
+        print(f"错误：{e}", file=sys.stderr)
+        return 1
+
+    if failed_rows[0] > MAX_PRINTED_ERRORS:
+        print(f"另有 {failed_rows[0] - MAX_PRINTED_ERRORS} 行处理失败，未逐条显示", file=sys.stderr)
+
+    elapsed = time.monotonic() - start_time
+    print(f"处理完成：成功 {success_rows}/{total_rows} 行，失败 {total_rows - success_rows} 行，"
+          f"耗时 {elapsed:.2f} 秒")
+    print(cache_stats.summary())
+    print(f"结果已保存到 {args.output}")
+
+    # 有失败行时返回2，便于定时任务区分部分失败
+    return 2 if success_rows < total_rows else 0
+
+
+def build_parser():
+    """创建命令行参数解析器"""
+    parser = argparse.ArgumentParser(prog="fba_calc", description="FBA配送费计算器（命令行版）")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+
+    batch_parser = subparsers.add_parser("batch", help="批量计算CSV/XLSX文件中的配送费")
+    batch_parser.add_argument("input", help="输入文件（.csv或.xlsx），需包含重量(g)、最长边(cm)、次长边(cm)、最短边(cm)列")
+    batch_parser.add_argument("output", help="结果文件（.xlsx或.csv）")
+    batch_parser.add_argument("--site", choices=batch_engine.SITES, default="us", help="站点（默认us）")
+    batch_parser.add_argument("--workers", type=int, default=1,
+                              help="并行计算的进程数，0表示使用全部CPU核心（默认1）")
+    batch_parser.add_argument("--chunk-size", type=int, default=batch_engine.DEFAULT_CHUNK_SIZE,
+                              help="每块的行数（美国站每块向量化计算一次，多进程模式下每块为一个任务）")
+    batch_parser.add_argument("--encoding", help="输入CSV文件编码（默认自动检测）")
+    batch_parser.set_defaults(func=run_batch)
+
+    return parser
+
+
+def main(argv=None):
+    """命令行入口，返回进程退出码"""
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    # 打包后的程序在Windows上使用多进程批量计算时需要
+    import multiprocessing
+    multiprocessing.freeze_support()
+
+    # 修复在某些环境下的编码问题
+    try:
+        if hasattr(sys.stdout, 'encoding') and sys.stdout.encoding != 'utf-8' and hasattr(sys.stdout, 'reconfigure'):
+            sys.stdout.reconfigure(encoding='utf-8')
+            sys.stderr.reconfigure(encoding='utf-8')
+    except Exception:
+        pass
+
+    sys.exit(main())
@@ -1,3 +1,6 @@
+# 启动耗时分析（--profile-startup），需最先导入以便统计其他模块的导入时间
+import startup_profiler
+
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 import platform
@@ -7,12 +10,33 @@ import os
 import sys
 import json
 import threading
+import queue
+import time
 import shutil
-from datetime import datetime
+from datetime import datetime, timedelta
 import urllib.parse
+startup_profiler.checkpoint("导入tkinter和标准库")
 
 # 导入更新器模块
-from updater import Updater, ensure_internet_connection
+from updater import Updater
+
+# 导入网络连接检测（结果在本次运行中缓存，后台检测）
+import connectivity
+# 导入断点续传下载（更新安装包下载中断后从断点继续）
+import resumable_download
+startup_profiler.checkpoint("导入更新器和网络检测模块")
+
+# 导入费用计算引擎（不依赖tkinter）
+import fee_engine
+# 导入计算历史记录（内存定长队列 + SQLite日志）
+import history_store
+# 导入批量计算流水线（流式CSV处理）
+import batch_engine
+# 导入可选依赖的延迟导入（openpyxl在第一次使用或界面空闲后才加载）
+import lazy_imports
+# 导入界面定时任务调度（时钟、定期检查更新共用一个定时器）
+import ui_scheduler
+startup_profiler.checkpoint("导入计算模块")
 
 class FBAShippingCalculator:
     # 程序版本信息
@@ -21,9 +45,19 @@ class FBAShippingCalculator:
     SETTINGS_FILE = "settings.json"  # 设置文件路径
     UPDATE_INFO_FILE = "update_info.json"  # 更新信息文件路径
     UPLOAD_SERVER_URL = "http://47.98.248.238"  # 上传服务器地址
+    BATCH_PROGRESS_INTERVAL = 0.25  # 批量处理进度消息的最小间隔（秒）
+    BATCH_DRAIN_INTERVAL_MS = 200  # 批量处理界面刷新间隔（毫秒）
+    BATCH_MAX_LOGGED_ERRORS = 200  # 批量处理日志中逐条显示的失败行上限
+    SEGMENT_PREVIEW_DELAY_MS = 150  # 停止输入多久后更新尺寸分段预览（毫秒）
+    EXCEL_PRELOAD_DELAY_MS = 3000  # 启动后多久在后台预加载Excel相关库（毫秒）
+    CLOCK_INTERVAL_MS = 60 * 1000  # 状态栏时钟刷新间隔（毫秒），时钟精确到分钟
+    UPDATE_CHECK_INTERVAL_MS = 6 * 60 * 60 * 1000  # 程序长时间运行时定期检查更新的间隔（毫秒）
     # 注意：DOWNLOAD_SERVER_URL在updater模块中定义，这里仅作为参考
     
     def __init__(self, root):
+        # 启用启动耗时分析时为字体、设置、样式和各界面构建方法计时
+        startup_profiler.instrument(self, ("setup_fonts", "load_settings", "_create_styles", "apply_theme"))
+        
         # 设置中文字体支持
         self.setup_fonts()
         
@@ -33,16 +67,25 @@ class FBAShippingCalculator:
         # 初始化更新器
         self.updater = Updater(self.VERSION, self.settings)
         
-        # 在初始化时检查网络连接，确保能够支持自动更新
-        if not ensure_internet_connection():
-            # 启动后台线程持续尝试连接
-            threading.Thread(target=self._retry_connection, daemon=True).start()
-        
         self.root = root
         self.root.title(f"FBA配送费计算器 v{self.VERSION}")
         
-        # 初始化计算历史记录
-        self.calculation_history = []
+        # 周期任务调度器：所有周期任务共用一个定时器，窗口最小化时暂停
+        self.scheduler = ui_scheduler.UIScheduler(
+            root, self.settings.get("ui_scheduler_granularity_ms", ui_scheduler.DEFAULT_GRANULARITY_MS)
+        )
+        
+        # 初始化计算历史记录：最近的记录保存在内存中，全部记录写入程序目录下的数据库
+        self.calculation_history = history_store.CalculationHistory(
+            history_store.app_data_path(history_store.HISTORY_DB_FILE),
+            maxlen=self.settings.get("history_size", history_store.DEFAULT_HISTORY_SIZE)
+        )
+        # 最近一次计算的结构化记录（导出当前结果时使用）
+        self.last_calculation = None
+        
+        # 尺寸分段预览：等待中的延迟任务和上次计算时的输入
+        self._segment_preview_job = None
+        self._segment_preview_key = None
         
         # 根据用户设置决定窗口大小
         window_size = self.settings.get("window_size", "maximized")
@@ -134,11 +177,11 @@ class FBAShippingCalculator:
         self.create_buttons()
         self.create_result_area()
         
-        # 创建汇率计算器UI
-        self.create_currency_converter_ui()
-        
-        # 创建重量转换器UI
-        self.create_weight_converter_ui()
+        # 汇率计算器和重量转换器页面在第一次显示时才创建，启动时只创建FBA计算器页面
+        self._page_builders = {
+            "currency": self.create_currency_converter_ui,
+            "weight_converter": self.create_weight_converter_ui,
+        }
         
         # 显示默认页面
         self.show_page("fba")
@@ -146,8 +189,12 @@ class FBAShippingCalculator:
         # 添加底部状态栏
         self.create_status_bar()
         
-        # 启动后台检查更新
+        # 启动后台检查更新，程序长时间运行时定期重新检查
         self.check_for_updates_in_background()
+        self.scheduler.add("update_check", self.check_for_updates_in_background, self.UPDATE_CHECK_INTERVAL_MS)
+        
+        # 界面空闲后在后台预加载Excel相关库，第一次批量处理Excel时不必等待导入
+        self.root.after(self.EXCEL_PRELOAD_DELAY_MS, lazy_imports.preload_in_background)
         
     def _create_styles(self):
         """创建自定义样式，实现立体化效果"""
@@ -576,7 +623,14 @@ class FBAShippingCalculator:
         self.update_button.pack(side=tk.RIGHT, padx=10, pady=5)
     
     def show_page(self, page_name):
-        """显示指定页面，隐藏其他页面"""
+        """显示指定页面，隐藏其他页面（页面在第一次显示时创建）"""
+        # 未知页面名称显示汇率页面
+        if page_name not in ("fba", "currency", "weight_converter"):
+            page_name = "currency"
+        builder = self._page_builders.pop(page_name, None)
+        if builder is not None:
+            builder()
+        
         # 首先隐藏所有页面
         self.fba_frame.pack_forget()
         self.currency_frame.pack_forget()
@@ -598,12 +652,6 @@ class FBAShippingCalculator:
         elif page_name == "weight_converter":
             self.weight_converter_frame.pack(fill=tk.BOTH, expand=True)
             self.weight_converter_button.config(state=tk.DISABLED)  # 高亮当前页面按钮
-        else:
-            self.fba_frame.pack_forget()
-            self.currency_frame.pack(fill=tk.BOTH, expand=True)
-            self.currency_button.config(state=tk.DISABLED)
-            # 显示汇率页面时尝试获取实时汇率
-            self.fetch_exchange_rates()
         
         self.current_page = page_name
         
@@ -1058,6 +1106,7 @@ class FBAShippingCalculator:
         
         # 清空结果区域
         self.result_text.delete(1.0, tk.END)
+        self.last_calculation = None
         
         # 保存当前值以便单位转换
         current_values = {}
@@ -1155,8 +1204,7 @@ class FBAShippingCalculator:
                 self.segment_frame.config(text="商品尺寸分段 (最长边)")
             
             # 清空尺寸分段显示
-            if hasattr(self, 'segment_display_var'):
-                self.segment_display_var.set("请输入商品尺寸和重量")
+            self.reset_size_segment_preview()
             
             # 显示日本站特有的输入框
             if hasattr(self, 'price_over_1000_check'):
@@ -1168,7 +1216,8 @@ class FBAShippingCalculator:
                 self.price_over_1000_check = ttk.Checkbutton(
                     self.weight_frame,
                     text="价格超过1000日元",
-                    variable=self.price_over_1000_var
+                    variable=self.price_over_1000_var,
+                    command=self.schedule_size_segment_update
                 )
                 # 使用pack布局
                 self.price_over_1000_check.pack(pady=5, anchor=tk.W)
@@ -1181,7 +1230,8 @@ class FBAShippingCalculator:
                 self.is_frozen_check = ttk.Checkbutton(
                     self.weight_frame,
                     text="冷冻商品",
-                    variable=self.is_frozen_var
+                    variable=self.is_frozen_var,
+                    command=self.schedule_size_segment_update
                 )
                 self.is_frozen_check.pack(pady=5, anchor=tk.W)
             # 显示切换提示
@@ -1300,8 +1350,8 @@ class FBAShippingCalculator:
         entry.bind("<FocusIn>", on_focus)
         entry.bind("<FocusOut>", on_focusout)
         
-        # 绑定输入事件，实时更新尺寸分段
-        entry.bind("<KeyRelease>", lambda event: self.update_size_segment())
+        # 绑定输入事件，停止输入后更新尺寸分段
+        entry.bind("<KeyRelease>", lambda event: self.schedule_size_segment_update())
         
         # 直接使用传入的default_unit作为显示文本，不进行映射
         # 这样可以确保create_size_inputs和create_weight_inputs方法中设置的单位能直接显示
@@ -1357,19 +1407,26 @@ class FBAShippingCalculator:
         )
         time_label.pack(side=tk.RIGHT, padx=10, pady=5)
         
-        # 更新时间
+        # 更新时间，之后每到整分钟刷新一次
         self.update_time()
+        self.scheduler.add("clock", self.update_time, self.CLOCK_INTERVAL_MS,
+                           first_delay_ms=ui_scheduler.ms_until_next_minute())
         
     def update_time(self):
-        """更新状态栏时间"""
-        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        """更新状态栏时间（由调度器每分钟调用）"""
+        current_time = datetime.now().strftime("%Y-%m-%d %H:%M")
         self.time_var.set(current_time)
-        self.root.after(1000, self.update_time)  # 每秒更新一次
     
     def check_for_updates_in_background(self):
-        """在后台线程中检查更新，避免阻塞UI"""
+        """在后台线程中检查网络连接和更新，避免阻塞UI"""
         def update_check():
             try:
+                # 窗口显示后才检测网络；没有网络时持续在后台重试
+                with startup_profiler.phase("网络检测"):
+                    connected = connectivity.ensure_internet_connection()
+                if not connected:
+                    self._retry_connection()
+                    return
                 self.check_for_updates(show_no_update_msg=False)
             except Exception as e:
                 logging.error(f"后台检查更新失败: {str(e)}")
@@ -1927,19 +1984,19 @@ class FBAShippingCalculator:
     def _fallback_download(self, download_url, download_dir, installer_name):
         """回退到传统下载方式并提供自动安装选项"""
         try:
-            import urllib.request
             import os
             
             installer_path = os.path.join(download_dir, installer_name)
             
-            def report_progress(block_num, block_size, total_size):
-                if total_size > 0:
-                    progress = min(int(100 * block_num * block_size / total_size), 100)
+            def report_progress(downloaded, total_size):
+                if total_size:
+                    progress = min(int(100 * downloaded / total_size), 100)
                     self.root.after(0, lambda: self.status_var.set(f"正在下载安装程序（传统方式）... {progress}%"))
                 else:
                     self.root.after(0, lambda: self.status_var.set("正在下载安装程序（传统方式）..."))
             
-            urllib.request.urlretrieve(download_url, installer_path, reporthook=report_progress)
+            # 连接中断时自动从断点继续；再次下载同一文件时也会接着上次未完成的部分
+            resumable_download.download_file(download_url, installer_path, progress_callback=report_progress)
             
             # 定义处理下载完成的内部函数
             def handle_download_complete(installer_path, download_dir, installer_name):
@@ -2101,16 +2158,27 @@ if %ERRORLEVEL% equ 0 (
         max_retries = 30     # 最大重试次数
         
         for attempt in range(max_retries):
+            time.sleep(retry_interval)
             logging.info(f"后台尝试连接网络（尝试 {attempt+1}/{max_retries}）...")
-            if ensure_internet_connection():
+            if connectivity.ensure_internet_connection(refresh=True):
                 logging.info("后台网络连接成功！自动更新功能现已可用")
                 # 可以在这里触发更新检查
                 self.check_for_updates(show_no_update_msg=False)
                 break
-            
-            time.sleep(retry_interval)
     
-    # 注意：网络连接检查方法已被updater模块的ensure_internet_connection替代
+    def check_internet_connection(self):
+        """
+        检查网络连接状态（使用本次运行中缓存的检测结果）
+        
+        在界面线程中调用时只读取缓存结果，不等待网络检测（尚未检测或检测失败时在后台重新检测，
+        本次返回False）；在后台线程中调用时等待检测完成
+        """
+        if threading.current_thread() is threading.main_thread():
+            connected = connectivity.connection_status()
+            if not connected:
+                connectivity.check_connection_async()
+            return bool(connected)
+        return connectivity.ensure_internet_connection()
     
     def open_file_location(self, file_path):
         """打开文件所在位置"""
@@ -2510,46 +2578,56 @@ if %ERRORLEVEL% equ 0 (
                 except Exception as e:
                     logging.error(f"保存反馈到本地失败: {str(e)}")
                 
-                # 本地反馈存储已完成，现在尝试发送到服务器
-                server_success = False
-                try:
-                    if self.check_internet_connection():
-                        import urllib.request
-                        import urllib.error
-                        
-                        # 使用统一域名，尝试多个端点
-                        DOMAIN = "tomarens.xyz"
-                        endpoints = [
-                            f"http://{DOMAIN}:8081/submit_feedback",  # 本地服务器配置
-                            f"https://{DOMAIN}/submit_feedback",      # HTTPS
-                            f"http://{DOMAIN}/submit_feedback",       # HTTP
-                        ]
-                        
-                        for endpoint in endpoints:
-                            try:
-                                data = json.dumps(feedback_data).encode('utf-8')
-                                headers = {'Content-Type': 'application/json'}
-                                req = urllib.request.Request(endpoint, data=data, headers=headers)
-                                
-                                with urllib.request.urlopen(req, timeout=10) as response:
-                                    if response.status == 200:
-                                        logging.info(f"反馈成功发送到服务器: {endpoint}")
-                                        server_success = True
-                                        break  # 成功后退出循环
-                            except Exception as inner_e:
-                                logging.warning(f"向 {endpoint} 发送反馈失败: {str(inner_e)}")
-                                continue  # 尝试下一个端点
-                            else:
-                                logging.error(f"发送反馈到服务器失败，HTTP状态码: {response.status}")
-                except Exception as e:
-                    logging.error(f"发送反馈到服务器异常: {str(e)}")
+                # 本地反馈存储已完成，在后台线程中检测网络并发送到服务器，不阻塞界面
+                submit_button.config(state=tk.DISABLED)
                 
-                # 无论是否发送到服务器，都显示成功信息
-                if server_success:
-                    messagebox.showinfo("提交成功", f"感谢您的反馈！我们会尽快处理。\n\n反馈已保存到本地文件: {feedback_file}")
-                else:
-                    messagebox.showinfo("提交成功（本地）", f"反馈已成功保存到本地文件，将在网络恢复后尝试发送到服务器。\n\n本地文件路径: {feedback_file}")
-                window.destroy()
+                def send_to_server(connected):
+                    server_success = False
+                    try:
+                        if connected:
+                            import urllib.request
+                            import urllib.error
+                            
+                            # 使用统一域名，尝试多个端点
+                            DOMAIN = "tomarens.xyz"
+                            endpoints = [
+                                f"http://{DOMAIN}:8081/submit_feedback",  # 本地服务器配置
+                                f"https://{DOMAIN}/submit_feedback",      # HTTPS
+                                f"http://{DOMAIN}/submit_feedback",       # HTTP
+                            ]
+                            
+                            for endpoint in endpoints:
+                                try:
+                                    data = json.dumps(feedback_data).encode('utf-8')
+                                    headers = {'Content-Type': 'application/json'}
+                                    req = urllib.request.Request(endpoint, data=data, headers=headers)
+                                    
+                                    with urllib.request.urlopen(req, timeout=10) as response:
+                                        if response.status == 200:
+                                            logging.info(f"反馈成功发送到服务器: {endpoint}")
+                                            server_success = True
+                                            break  # 成功后退出循环
+                                except Exception as inner_e:
+                                    logging.warning(f"向 {endpoint} 发送反馈失败: {str(inner_e)}")
+                                    continue  # 尝试下一个端点
+                                else:
+                                    logging.error(f"发送反馈到服务器失败，HTTP状态码: {response.status}")
+                    except Exception as e:
+                        logging.error(f"发送反馈到服务器异常: {str(e)}")
+                    
+                    # 回到界面线程显示结果
+                    self.root.after(0, lambda: show_result(server_success))
+                
+                def show_result(server_success):
+                    # 无论是否发送到服务器，都显示成功信息
+                    if server_success:
+                        messagebox.showinfo("提交成功", f"感谢您的反馈！我们会尽快处理。\n\n反馈已保存到本地文件: {feedback_file}")
+                    else:
+                        messagebox.showinfo("提交成功（本地）", f"反馈已成功保存到本地文件，将在网络恢复后尝试发送到服务器。\n\n本地文件路径: {feedback_file}")
+                    if window.winfo_exists():
+                        window.destroy()
+                
+                connectivity.check_connection_async(send_to_server)
                 
             except Exception as e:
                 logging.error(f"保存反馈时出错: {str(e)}")
@@ -2606,10 +2684,16 @@ if %ERRORLEVEL% equ 0 (
     
     def on_closing(self):
         """程序关闭时执行的操作"""
-        # 保存用户设置
-        self.save_settings()
-        # 关闭程序
-        self.root.destroy()
+        # 先停止周期任务，避免关闭过程中再触发时钟刷新或更新检查
+        self.scheduler.stop()
+        try:
+            # 保存用户设置
+            self.save_settings()
+            # 关闭历史记录数据库
+            self.calculation_history.close()
+        finally:
+            # 关闭程序
+            self.root.destroy()
     
     def create_weight_inputs(self):
         # 重量输入框架
@@ -2638,7 +2722,7 @@ if %ERRORLEVEL% equ 0 (
             text="磅 (lb)", 
             variable=self.weight_unit_var, 
             value="磅",
-            command=lambda: [self.on_weight_unit_change(), self.update_size_segment()]
+            command=lambda: [self.on_weight_unit_change(), self.schedule_size_segment_update()]
         )
         lb_radio.pack(side=tk.LEFT, padx=(0, 20))
         
@@ -2648,7 +2732,7 @@ if %ERRORLEVEL% equ 0 (
             text="盎司 (oz)", 
             variable=self.weight_unit_var, 
             value="盎司",
-            command=lambda: [self.on_weight_unit_change(), self.update_size_segment()]
+            command=lambda: [self.on_weight_unit_change(), self.schedule_size_segment_update()]
         )
         oz_radio.pack(side=tk.LEFT, padx=(0, 20))
         
@@ -2726,6 +2810,16 @@ if %ERRORLEVEL% equ 0 (
             anchor=tk.W
         )
         self.segment_display.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        
+        # 配送费预览
+        self.fee_preview_var = tk.StringVar(value="")
+        ttk.Label(
+            self.segment_frame, 
+            textvariable=self.fee_preview_var, 
+            font=self.default_font, 
+            foreground="#1a5276",
+            anchor=tk.W
+        ).pack(fill=tk.X, pady=(0, 5))
     
     def create_buttons(self):
         # 创建带阴影效果的按钮框架
@@ -2735,7 +2829,7 @@ if %ERRORLEVEL% equ 0 (
         button_frame = ttk.Frame(shadow_frame)
         button_frame.pack(fill=tk.X, padx=2, pady=2)
         
-        # 创建六个按钮，使用立体感样式
+        # 创建七个按钮，使用立体感样式
         self.calc_button = ttk.Button(
             button_frame, 
             text="计算配送费", 
@@ -2772,6 +2866,15 @@ if %ERRORLEVEL% equ 0 (
         )
         self.batch_process_button.pack(side=tk.LEFT, padx=(0, 10), pady=5)
         
+        self.history_button = ttk.Button(
+            button_frame, 
+            text="历史记录", 
+            command=self.show_history_window,
+            style="Accent.TButton",
+            width=10
+        )
+        self.history_button.pack(side=tk.LEFT, padx=(0, 10), pady=5)
+        
         self.theme_button = ttk.Button(
             button_frame, 
             text="更改主题", 
@@ -2835,9 +2938,10 @@ if %ERRORLEVEL% equ 0 (
         self.result_text.config(state=tk.NORMAL)
         self.result_text.delete(1.0, tk.END)
         self.result_text.config(state=tk.DISABLED)
+        self.last_calculation = None
         
         # 重置尺寸分段显示
-        self.segment_display_var.set("请输入商品尺寸和重量")
+        self.reset_size_segment_preview()
         
         # 询问是否清空历史记录
         if hasattr(self, 'calculation_history') and self.calculation_history:
@@ -2905,52 +3009,81 @@ if %ERRORLEVEL% equ 0 (
         self.result_text.insert(tk.END, text)
         self.result_text.config(state=tk.DISABLED)
     
+    def schedule_size_segment_update(self):
+        """输入变化时延迟更新尺寸分段预览，连续输入时只在停顿后计算一次"""
+        if self._segment_preview_job is not None:
+            self.root.after_cancel(self._segment_preview_job)
+        self._segment_preview_job = self.root.after(self.SEGMENT_PREVIEW_DELAY_MS, self.update_size_segment)
+    
+    def reset_size_segment_preview(self):
+        """清空尺寸分段和配送费预览"""
+        self._segment_preview_key = None
+        if hasattr(self, 'segment_display_var'):
+            self.segment_display_var.set("请输入商品尺寸和重量")
+        if hasattr(self, 'fee_preview_var'):
+            self.fee_preview_var.set("")
+    
     def update_size_segment(self):
-        """实时更新尺寸分段显示"""
+        """实时更新尺寸分段和配送费预览（输入与上次相同时不重新计算）"""
+        self._segment_preview_job = None
+        site = self.current_site if hasattr(self, 'current_site') else "us"
+        preview_key = (
+            site,
+            self.max_len_var.get(), self.mid_len_var.get(), self.min_len_var.get(), self.weight_var.get(),
+            self.weight_unit_var.get(),
+            self.price_over_1000_var.get() if hasattr(self, 'price_over_1000_var') else True,
+            self.is_frozen_var.get() if hasattr(self, 'is_frozen_var') else False,
+        )
+        if preview_key == self._segment_preview_key:
+            return
+        self._segment_preview_key = preview_key
+        _, max_text, mid_text, min_text, weight_text, weight_unit, price_over_1000, is_frozen = preview_key
+        
         try:
             # 获取输入值
-            if not (self.max_len_var.get() and self.mid_len_var.get() and 
-                   self.min_len_var.get() and self.weight_var.get()):
+            if not (max_text and mid_text and min_text and weight_text):
                 # 输入不完整时显示提示信息
-                if hasattr(self, 'segment_display_var'):
-                    self.segment_display_var.set("请输入商品尺寸和重量")
+                self.segment_display_var.set("请输入商品尺寸和重量")
+                self.fee_preview_var.set("")
                 return
             
-            max_len = float(self.max_len_var.get())
-            mid_len = float(self.mid_len_var.get())
-            min_len = float(self.min_len_var.get())
-            weight = float(self.weight_var.get())
+            max_len = float(max_text)
+            mid_len = float(mid_text)
+            min_len = float(min_text)
+            weight = float(weight_text)
             
             # 验证输入
             if max_len <= 0 or mid_len <= 0 or min_len <= 0 or weight <= 0:
                 # 输入无效时显示提示信息
-                if hasattr(self, 'segment_display_var'):
-                    self.segment_display_var.set("请输入有效的数值")
+                self.segment_display_var.set("请输入有效的数值")
+                self.fee_preview_var.set("")
                 return
             
             # 根据当前站点使用不同的尺寸分段方法
-            if hasattr(self, 'current_site') and self.current_site == "jp":
+            if site == "jp":
                 # 日本站：使用最长边判断尺寸分段
                 size_segment = self.determine_size_segment_jp(max_len)
+                fee = fee_engine.quote_fee_jp(size_segment, max_len, weight, price_over_1000, is_frozen).fee
+                fee_text = f"{fee} 日元" if isinstance(fee, (int, float)) else fee
             else:
                 # 美国站：使用完整的尺寸分段逻辑
-                weight_unit = self.weight_unit_var.get()
                 len_girth = max_len + 2 * (mid_len + min_len)
                 weight_oz = weight if weight_unit == '盎司' else weight * 16
                 weight_lb = weight if weight_unit == '磅' else weight / 16
                 size_segment = self.determine_size_segment(
                     max_len, mid_len, min_len, len_girth, weight_lb, weight_oz
                 )
+                fee = fee_engine.quote_fee(size_segment, weight_lb).fee
+                fee_text = f"${fee}" if isinstance(fee, (int, float)) else fee
             
             # 更新显示
-            if hasattr(self, 'segment_display_var'):
-                self.segment_display_var.set(size_segment)
+            self.segment_display_var.set(size_segment)
+            self.fee_preview_var.set(f"预估配送费：{fee_text}")
             
         except (ValueError, TypeError):
             # 输入不完整或无效时显示提示信息
-            if hasattr(self, 'segment_display_var'):
-                self.segment_display_var.set("请输入有效的数值")
-            pass
+            self.segment_display_var.set("请输入有效的数值")
+            self.fee_preview_var.set("")
     
     def _apply_theme_to_widget(self, widget):
         """递归应用主题到所有控件"""
@@ -3283,10 +3416,9 @@ if %ERRORLEVEL% equ 0 (
                     max_len, mid_len, min_len, len_girth, weight_lb, weight_oz
                 )
                 
-                # 计算费用并获取详细计算过程
-                fee, calculation_steps = self.calculate_fee_with_steps(
-                    size_segment, weight_lb, weight_oz, weight_unit
-                )
+                # 计算费用（结构化结果，计算过程在显示时生成）
+                quote = fee_engine.quote_fee(size_segment, weight_lb)
+                fee = quote.fee
                 
                 # 生成结果文本
                 result_text = f"===== 计算结果 =====\n\n"
@@ -3299,7 +3431,7 @@ if %ERRORLEVEL% equ 0 (
                 result_text += f"   最短边：{min_len} 英寸\n"
                 result_text += f"   长度+围长：{len_girth:.2f} 英寸\n\n"
                 result_text += f"💰 配送费：${fee}\n\n"
-                result_text += f"===== 计算过程 =====\n\n{calculation_steps}"
+                result_text += f"===== 计算过程 =====\n\n{fee_engine.render_steps(quote)}"
                 
                 # 保存到历史记录
                 calculation_record = {
@@ -3312,6 +3444,7 @@ if %ERRORLEVEL% equ 0 (
                     'weight_unit': weight_unit,
                     'size_segment': size_segment,
                     'shipping_fee': fee,
+                    'rule_id': quote.rule_id,
                     'len_girth': len_girth
                 }
             else:
@@ -3329,10 +3462,9 @@ if %ERRORLEVEL% equ 0 (
                 # 检查是否为冷冻商品
                 is_frozen = self.is_frozen_var.get() if hasattr(self, 'is_frozen_var') else False
                 
-                # 计算费用并获取详细计算过程
-                fee, calculation_steps = self.calculate_fee_with_steps_jp(
-                    size_segment, weight, price_over_1000, is_frozen
-                )
+                # 计算费用（结构化结果，计算过程在显示时生成）
+                quote = fee_engine.quote_fee_jp(size_segment, max_len, weight, price_over_1000, is_frozen)
+                fee = quote.fee
                 
                 # 生成结果文本
                 result_text = f"===== 计算结果 =====\n\n"
@@ -3344,7 +3476,7 @@ if %ERRORLEVEL% equ 0 (
                 result_text += f"   最短边：{min_len} 厘米\n"
                 result_text += f"   总尺寸：{total_size} 厘米\n\n"
                 result_text += f"💰 配送费：{fee} 日元\n\n"
-                result_text += f"===== 计算过程 =====\n\n{calculation_steps}"
+                result_text += f"===== 计算过程 =====\n\n{fee_engine.render_steps(quote)}"
                 
                 # 保存到历史记录
                 calculation_record = {
@@ -3357,18 +3489,20 @@ if %ERRORLEVEL% equ 0 (
                     'weight_unit': weight_unit,
                     'size_segment': size_segment,
                     'shipping_fee': fee,
+                    'rule_id': quote.rule_id,
+                    'price_over_1000': price_over_1000,
+                    'is_frozen': is_frozen,
                     'total_size': total_size
                 }
             
             # 更新结果
             self.update_result(result_text)
             
-            # 添加到历史记录
-            self.calculation_history.append(calculation_record)
+            # 保留最近一次计算的结构化记录，导出当前结果时直接使用
+            self.last_calculation = calculation_record
             
-            # 限制历史记录数量，最多保存100条
-            if len(self.calculation_history) > 100:
-                self.calculation_history.pop(0)
+            # 添加到历史记录（内存中只保留最近的记录，超出时自动丢弃最早的记录）
+            self.calculation_history.append(calculation_record)
             
         except ValueError:
             messagebox.showerror("输入错误", "请输入有效的数字！")
@@ -3386,470 +3520,215 @@ if %ERRORLEVEL% equ 0 (
         返回:
         - 包含尺寸分段、重量显示、围长显示和费用的字典
         """
-        # 单位转换: 厘米转英寸 (1英寸 = 2.54厘米)
-        max_len_in = length_cm / 2.54
-        mid_len_in = width_cm / 2.54
-        min_len_in = height_cm / 2.54
-        
-        # 单位转换: 克转磅和盎司 (1磅 = 453.592克, 1盎司 = 28.3495克)
-        weight_lb = weight_g / 453.592
-        weight_oz = weight_g / 28.3495
-        
-        # 计算长度+围长
-        len_girth = max_len_in + 2 * (mid_len_in + min_len_in)
-        
-        # 判断尺寸分段
-        size_segment = self.determine_size_segment(
-            max_len_in, mid_len_in, min_len_in, len_girth, weight_lb, weight_oz
-        )
-        
-        # 计算费用
-        fee, _ = self.calculate_fee_with_steps(
-            size_segment, weight_lb, weight_oz, '磅'  # 使用磅作为单位
-        )
-        
-        # 准备返回结果
-        return {
-            'size_tier': size_segment,
-            'weight_display': f"{weight_lb:.2f} 磅 / {weight_oz:.2f} 盎司",
-            'girth_display': f"{len_girth:.2f} 英寸",
-            'fee': fee
-        }
+        return fee_engine.calculate_fba_fee(weight_g, length_cm, width_cm, height_cm)
     
     def determine_size_segment_jp(self, max_len_cm):
-        """
-        判断日本站的尺寸分段（6.1日本站FBA费用计算模块）
-        参数:
-        - max_len_cm: 最长边(厘米)
-        返回:
-        - 尺寸分段描述
-        """
-        # 根据新的日本站FBA配送费规则，区分不同尺寸分段
-        # 新规则包括：小号、标准、大件、超大件等类别
-        
-        # 小号：不超过23厘米×35厘米×10厘米
-        # 这里简化处理，主要根据最长边判断
-        if max_len_cm <= 35:
-            return "小号"
-        # 标准尺寸：不超过80厘米
-        elif max_len_cm <= 80:
-            return "标准"
-        # 大件：不超过120厘米
-        elif max_len_cm <= 120:
-            return "大件"
-        # 超大件：超过120厘米但不超过200厘米
-        elif max_len_cm <= 200:
-            return "超大件"
-        else:
-            return "超大件（超出200厘米）"
-    
-    def calculate_fee_with_steps_jp(self, size_segment, weight_g, price_over_1000, is_frozen=False):
-        """
-        计算日本站FBA配送费用并返回详细计算过程（6.1日本站FBA费用计算模块）
-        参数:
-        - size_segment: 尺寸分段
-        - weight_g: 重量(克)
-        - price_over_1000: 价格是否超过1000日元
-        - is_frozen: 是否为冷冻商品
-        返回:
-        - (费用, 计算步骤)
-        """
-        steps = []
-        
-        # 获取最大长度（从UI输入中获取）
-        max_len_cm = 0
-        if hasattr(self, 'max_len_var') and self.max_len_var.get():
-            try:
-                max_len_cm = float(self.max_len_var.get())
-            except ValueError:
-                pass
-        
-        # 转换重量为千克
-        weight_kg = weight_g / 1000
-        
-        # 记录基本信息
-        steps.append("===== 日本站FBA配送费计算 =====")
-        steps.append(f"1. 根据尺寸分段 '{size_segment}' 计算费用")
-        steps.append(f"2. 商品价格{'超过' if price_over_1000 else '不超过'}1000日元")
-        steps.append(f"3. 商品重量: {weight_g} 克 ({weight_kg:.2f} 千克)")
-        steps.append(f"4. 商品最长边: {max_len_cm} 厘米")
-        steps.append(f"5. 商品类型: {'冷冻商品' if is_frozen else '非冷冻商品'}")
-        
-        # 根据新表格定义的费用标准
-        # 选择正确的费用表（价格超过/不超过1000日元）
-        if price_over_1000:
-            steps.append("6. 使用价格超过1000日元的费用标准")
-        else:
-            steps.append("6. 使用价格不超过1000日元的费用标准")
-        
-        # 根据尺寸分段和重量计算费用
-        fee = 0
-        
-        # 如果是冷冻商品，使用冷冻商品的费用标准
-        if is_frozen:
-            # 冷冻商品 - 小号尺寸费用
-            if size_segment == "小号":
-                if weight_g <= 250:
-                    fee = 695 if price_over_1000 else 647
-                    steps.append(f"7. 冷冻商品-小号（≤250克）: {fee} 日元")
-            
-            # 冷冻商品 - 标准尺寸费用
-            elif size_segment == "标准":
-                if max_len_cm <= 26:
-                    fee = 867 if price_over_1000 else 697
-                    steps.append(f"7. 冷冻商品-标准尺寸-1（≤26厘米）: {fee} 日元")
-                elif max_len_cm <= 32:
-                    fee = 788 if price_over_1000 else 723
-                    steps.append(f"7. 冷冻商品-标准尺寸-2（≤32厘米）: {fee} 日元")
-                elif max_len_cm <= 45:
-                    fee = 830 if price_over_1000 else 754
-                    steps.append(f"7. 冷冻商品-标准尺寸-3（≤45厘米）: {fee} 日元")
-                elif max_len_cm <= 60:
-                    fee = 960 if price_over_1000 else 874
-                    steps.append(f"7. 冷冻商品-标准尺寸-4（≤60厘米）: {fee} 日元")
-                elif max_len_cm <= 80:
-                    if weight_kg <= 2:
-                        fee = 898 if price_over_1000 else 804
-                        steps.append(f"7. 冷冻商品-标准尺寸-5（≤80厘米，≤2千克）: {fee} 日元")
-                    elif weight_kg <= 2.5:
-                        fee = 987 if price_over_1000 else 917
-                        steps.append(f"7. 冷冻商品-标准尺寸-6（≤80厘米，≤2.5千克）: {fee} 日元")
-                    elif weight_kg <= 3.5:
-                        fee = 1027 if price_over_1000 else 941
-                        steps.append(f"7. 冷冻商品-标准尺寸-7（≤80厘米，≤3.5千克）: {fee} 日元")
-                    else:
-                        fee = 1071 if price_over_1000 else 941
-                        steps.append(f"7. 冷冻商品-标准尺寸-8（≤80厘米，>3.5千克）: {fee} 日元")
-            
-            # 冷冻商品 - 大件费用
-            elif size_segment == "大件":
-                if max_len_cm <= 60:
-                    if weight_kg <= 2:
-                        fee = 984 if price_over_1000 else 898
-                        steps.append(f"7. 冷冻商品-大件-1（≤60厘米，≤2千克）: {fee} 日元")
-                elif max_len_cm <= 80:
-                    if weight_kg <= 2:
-                        fee = 990 if price_over_1000 else 900
-                        steps.append(f"7. 冷冻商品-大件-2（≤80厘米，≤2千克）: {fee} 日元")
-                    elif weight_kg <= 5:
-                        fee = 1080 if price_over_1000 else 983
-                        steps.append(f"7. 冷冻商品-大件-3（≤80厘米，≤5千克）: {fee} 日元")
-                elif max_len_cm <= 100:
-                    fee = 1153 if price_over_1000 else 1041
-                    steps.append(f"7. 冷冻商品-大件-4（≤100厘米）: {fee} 日元")
-            
-            # 冷冻商品 - 超大件费用
-            elif size_segment == "超大件":
-                if max_len_cm <= 120:
-                    fee = 1559 if price_over_1000 else 1434
-                    steps.append(f"7. 冷冻商品-超大件-1（≤120厘米）: {fee} 日元")
-                elif max_len_cm <= 140:
-                    fee = 1925 if price_over_1000 else 1760
-                    steps.append(f"7. 冷冻商品-超大件-2（≤140厘米）: {fee} 日元")
-                elif max_len_cm <= 170:
-                    fee = 2760 if price_over_1000 else 2600
-                    steps.append(f"7. 冷冻商品-超大件-3（≤170厘米）: {fee} 日元")
-                elif max_len_cm <= 200:
-                    fee = 3720 if price_over_1000 else 3500
-                    steps.append(f"7. 冷冻商品-超大件-4（≤200厘米）: {fee} 日元")
-            
-            # 冷冻商品 - 超大件（超出200厘米）
-            elif size_segment == "超大件（超出200厘米）":
-                fee = 4820 if price_over_1000 else 4620
-                steps.append(f"7. 冷冻商品-超大件（超出200厘米）: {fee} 日元")
-                steps.append("注意：超过200厘米或超过40千克的商品可能需要支付额外的尺寸费用")
-        else:
-            # 非冷冻商品 - 小号尺寸费用
-            if size_segment == "小号":
-                if weight_g <= 250:
-                    fee = 630 if price_over_1000 else 589
-                    steps.append(f"7. 非冷冻商品-小号（≤250克）: {fee} 日元")
-            
-            # 非冷冻商品 - 标准尺寸费用
-            elif size_segment == "标准":
-                if max_len_cm <= 26:
-                    fee = 807 if price_over_1000 else 677
-                    steps.append(f"7. 非冷冻商品-标准尺寸-1（≤26厘米）: {fee} 日元")
-                elif max_len_cm <= 32:
-                    fee = 781 if price_over_1000 else 723
-                    steps.append(f"7. 非冷冻商品-标准尺寸-2（≤32厘米）: {fee} 日元")
-                elif max_len_cm <= 45:
-                    fee = 860 if price_over_1000 else 784
-                    steps.append(f"7. 非冷冻商品-标准尺寸-3（≤45厘米）: {fee} 日元")
-                elif max_len_cm <= 60:
-                    fee = 994 if price_over_1000 else 914
-                    steps.append(f"7. 非冷冻商品-标准尺寸-4（≤60厘米）: {fee} 日元")
-                elif max_len_cm <= 80:
-                    fee = 896 if price_over_1000 else 801
-                    steps.append(f"7. 非冷冻商品-标准尺寸-5（≤80厘米，≤2千克）: {fee} 日元")
-            
-            # 非冷冻商品 - 大件费用
-            elif size_segment == "大件":
-                if max_len_cm <= 60:
-                    fee = 946 if price_over_1000 else 886
-                    steps.append(f"7. 非冷冻商品-大件-1（≤60厘米，≤2千克）: {fee} 日元")
-                elif max_len_cm <= 80:
-                    if weight_kg <= 2:
-                        fee = 963 if price_over_1000 else 893
-                        steps.append(f"7. 非冷冻商品-大件-2（≤80厘米，≤2千克）: {fee} 日元")
-                    elif weight_kg <= 5:
-                        fee = 1032 if price_over_1000 else 933
-                        steps.append(f"7. 非冷冻商品-大件-3（≤80厘米，≤5千克）: {fee} 日元")
-                elif max_len_cm <= 100:
-                    fee = 1052 if price_over_1000 else 944
-                    steps.append(f"7. 非冷冻商品-大件-4（≤100厘米）: {fee} 日元")
-                elif max_len_cm <= 120:
-                    if weight_kg <= 10:
-                        fee = 1285 if price_over_1000 else 1101
-                        steps.append(f"7. 非冷冻商品-大件-5（≤120厘米，≤10千克）: {fee} 日元")
-            
-            # 非冷冻商品 - 超大件费用
-            elif size_segment == "超大件":
-                if max_len_cm <= 140:
-                    fee = 1756 if price_over_1000 else 1680
-                    steps.append(f"7. 非冷冻商品-超大件-1（≤140厘米）: {fee} 日元")
-                elif max_len_cm <= 170:
-                    fee = 2675 if price_over_1000 else 2555
-                    steps.append(f"7. 非冷冻商品-超大件-2（≤170厘米）: {fee} 日元")
-                elif max_len_cm <= 200:
-                    if weight_kg <= 30:
-                        fee = 3691 if price_over_1000 else 3491
-                        steps.append(f"7. 非冷冻商品-超大件-3（≤200厘米，≤30千克）: {fee} 日元")
-                    elif weight_kg <= 40:
-                        fee = 4650 if price_over_1000 else 4450
-                        steps.append(f"7. 非冷冻商品-超大件-4（≤200厘米，≤40千克）: {fee} 日元")
-            
-            # 非冷冻商品 - 超大件（超出200厘米）
-            elif size_segment == "超大件（超出200厘米）":
-                # 根据表格，超出200厘米或超过40千克的商品需要支付尺寸费用
-                fee = 4820 if price_over_1000 else 4620
-                steps.append(f"7. 非冷冻商品-超大件（超出200厘米）: {fee} 日元")
-                steps.append("注意：超过200厘米或超过40千克的商品可能需要支付额外的尺寸费用")
-        
-        # 特殊情况处理：如果没有匹配到费用规则
-        if fee == 0:
-            # 尝试根据重量进行兜底计算
-            if is_frozen:
-                # 冷冻商品兜底计算
-                if weight_kg <= 2:
-                    fee = 984 if price_over_1000 else 898
-                    steps.append(f"7. 冷冻商品默认费用（≤2千克）: {fee} 日元")
-                elif weight_kg <= 5:
-                    fee = 1080 if price_over_1000 else 983
-                    steps.append(f"7. 冷冻商品默认费用（≤5千克）: {fee} 日元")
-                elif weight_kg <= 10:
-                    fee = 1285 if price_over_1000 else 1101
-                    steps.append(f"7. 冷冻商品默认费用（≤10千克）: {fee} 日元")
-                else:
-                    fee = 1756 if price_over_1000 else 1680
-                    steps.append(f"7. 冷冻商品默认费用（>10千克）: {fee} 日元")
-            else:
-                # 非冷冻商品兜底计算
-                if weight_kg <= 2:
-                    fee = 946 if price_over_1000 else 886
-                    steps.append(f"7. 非冷冻商品默认费用（≤2千克）: {fee} 日元")
-                elif weight_kg <= 5:
-                    fee = 1032 if price_over_1000 else 933
-                    steps.append(f"7. 非冷冻商品默认费用（≤5千克）: {fee} 日元")
-                elif weight_kg <= 10:
-                    fee = 1285 if price_over_1000 else 1101
-                    steps.append(f"7. 非冷冻商品默认费用（≤10千克）: {fee} 日元")
-                else:
-                    fee = 1756 if price_over_1000 else 1680
-                    steps.append(f"7. 非冷冻商品默认费用（>10千克）: {fee} 日元")
-        
-        # 添加最终计算结果
-        steps.append(f"8. 最终配送费: {fee} 日元")
-        
-        # 添加燃油附加费说明
-        steps.append("\n注：所有费用包含10%的燃油附加费")
-        
-        # 添加冷冻商品特殊说明
-        if is_frozen:
-            steps.append("\n冷冻商品特别说明：")
-            steps.append("- 冷冻商品需使用温控包装，可能产生额外费用")
-            steps.append("- 部分冷冻食品可能受特殊处理费影响")
-            steps.append("- 对于需要温控包装的商品，如保温时间超过96小时，可能需支付额外费用")
-        
-        # 添加注释
-        steps.append("\n注：本计算基于2025年最新的亚马逊日本站FBA配送费标准（6.1日本站FBA费用计算模块）")
-        
-        # 添加特殊说明
-        steps.append("\n特别说明：")
-        steps.append("- 对于危险商品和需要特殊处理的商品，可能适用不同的费用标准")
-        steps.append("- 超过200厘米或超过40千克的商品可能需要支付额外的尺寸费用")
-        steps.append("- 实际费用可能因亚马逊政策调整而变化，请以亚马逊官网为准")
-        steps.append("- 冷冻商品可能产生额外的温控包装和处理费用")
-        
-        return fee, "\n".join(steps)
+        """判断日本站的尺寸分段（6.1日本站FBA费用计算模块）"""
+        return fee_engine.determine_size_segment_jp(max_len_cm)
     
     def determine_size_segment(self, max_len, mid_len, min_len, len_girth, weight_lb, weight_oz):
-        # 超大件判断（基于最新FBA配送费计算标准）
-        # 尺寸超限判断
-        size_oversized = (
-            max_len > 59 or 
-            mid_len > 33 or 
-            min_len > 33 or 
-            len_girth > 130
-        )
-        
-        # 重量超限判断
-        weight_oversized = weight_lb > 50
-        
-        # 先判断是否为超大件
-        if size_oversized or weight_oversized:
-            # 按重量细分超大件
-            if weight_lb < 50:
-                return "超大件：0至50磅"
-            elif weight_lb >= 50 and weight_lb < 70:
-                return "超大件：50至70磅（含50磅）"
-            elif weight_lb >= 70 and weight_lb < 150:
-                return "超大件：70至150磅（含70磅）"
-            else:
-                return "超大件：150磅以上（含150磅）"
-        else:
-            # 判断标准尺寸/大件
-            if (weight_oz <= 16) and (max_len <= 15) and (mid_len <= 12) and (min_len <= 0.75):
-                return "小号标准尺寸"
-            elif (weight_oz <= 320) and (max_len <= 18) and (mid_len <= 14) and (min_len <= 8):
-                return "大号标准尺寸"
-            elif (weight_lb <= 50) and (max_len <= 59) and (mid_len <= 33) and (min_len <= 33) and (len_girth <= 130):
-                return "大号大件"
-            else:
-                # 其他情况归为超大件
-                if weight_lb < 50:
-                    return "超大件：0至50磅"
-                elif weight_lb >= 50 and weight_lb < 70:
-                    return "超大件：50至70磅（含50磅）"
-                elif weight_lb >= 70 and weight_lb < 150:
-                    return "超大件：70至150磅（含70磅）"
-                else:
-                    return "超大件：150磅以上（含150磅）"
+        """判断美国站的尺寸分段（基于最新FBA配送费计算标准）"""
+        return fee_engine.determine_size_segment(max_len, mid_len, min_len, len_girth, weight_lb, weight_oz)
     
     def calculate_fee(self, size_segment, weight_lb, weight_oz, weight_unit):
-        # 小号标准尺寸（盎司）
-        if size_segment == "小号标准尺寸":
-            if weight_oz <= 2:
-                return 3.06
-            elif weight_oz <= 4:
-                return 3.15
-            elif weight_oz <= 6:
-                return 3.24
-            elif weight_oz <= 8:
-                return 3.33
-            elif weight_oz <= 10:
-                return 3.43
-            elif weight_oz <= 12:
-                return 3.53
-            elif weight_oz <= 14:
-                return 3.60
-            elif weight_oz <= 16:
-                return 3.65
-            else:
-                return "重量区间不匹配"
-        
-        # 大号标准尺寸（支持盎司和磅）
-        elif size_segment == "大号标准尺寸":
-            if weight_unit == '盎司':
-                if weight_oz <= 4:
-                    return 3.68
-                elif weight_oz <= 8:
-                    return 3.90
-                elif weight_oz <= 12:
-                    return 4.15
-                elif weight_oz <= 16:
-                    return 4.55
-                else:
-                    # 对于超过上述范围的盎司值，转换为磅计算
-                    return self.calculate_large_standard_fee_by_lb(weight_lb)
-            else:
-                return self.calculate_large_standard_fee_by_lb(weight_lb)
-        
-        # 大号大件（磅）
-        elif size_segment == "大号大件":
-            # 基础费用 + 超出部分的费用（每磅）
-            base_fee = 9.61
-            additional_fee = max(0, weight_lb) * 0.38  # 从0磅开始计算额外费用
-            return round(base_fee + additional_fee, 2)
-        
-        # 超大件：0至50磅
-        elif size_segment == "超大件：0至50磅":
-            # 基础费用 + 按重量计算的额外费用
-            base_fee = 26.33
-            additional_fee = max(0, weight_lb) * 0.38
-            return round(base_fee + additional_fee, 2)
-        
-        # 超大件：50至70磅
-        elif size_segment == "超大件：50至70磅（含50磅）":
-            # 基础费用 + 超出50磅部分的额外费用
-            base_fee = 40.12
-            additional_fee = max(0, weight_lb - 50) * 0.75  # 从50磅开始计算额外费用
-            return round(base_fee + additional_fee, 2)
-        
-        # 超大件：70至150磅
-        elif size_segment == "超大件：70至150磅（含70磅）":
-            # 基础费用 + 超出70磅部分的额外费用
-            base_fee = 54.81
-            additional_fee = max(0, weight_lb - 70) * 0.75  # 从70磅开始计算额外费用
-            return round(base_fee + additional_fee, 2)
-        
-        # 超大件：150磅以上
-        elif size_segment == "超大件：150磅以上（含150磅）":
-            # 基础费用 + 超出150磅部分的额外费用
-            base_fee = 194.95
-            additional_fee = max(0, weight_lb - 150) * 0.19  # 从150磅开始计算额外费用
-            return round(base_fee + additional_fee, 2)
-        
-        else:
-            return "无法计算配送费"
+        """计算美国站配送费，盎司和磅输入按同一费率表换算"""
+        return fee_engine.calculate_fee(size_segment, weight_lb)
     
     def calculate_large_standard_fee_by_lb(self, weight_lb):
-        # 大号标准尺寸按磅计算的逻辑
-        # 首先转换为盎司进行更精确的计算
-        weight_oz = weight_lb * 16
-        
-        # 根据重量区间返回对应费用
-        if weight_oz <= 4:
-            return 3.68
-        elif weight_oz <= 8:
-            return 3.90
-        elif weight_oz <= 12:
-            return 4.15
-        elif weight_oz <= 16:  # 1磅
-            return 4.55
-        elif weight_lb <= 1.25:
-            return 4.99
-        elif weight_lb <= 1.5:
-            return 5.37
-        elif weight_lb <= 1.75:
-            return 5.52
-        elif weight_lb <= 2:
-            return 5.77
-        elif weight_lb <= 2.25:
-            return 5.87
-        elif weight_lb <= 2.5:
-            return 6.05
-        elif weight_lb <= 2.75:
-            return 6.21
-        elif weight_lb <= 3:
-            return 6.62
-        elif weight_lb <= 20:
-            return round(6.92 + max(0, weight_lb - 3) * 4 * 0.08, 2)
-        else:
-            return "超出重量范围"
+        """大号标准尺寸按磅计算费用"""
+        return fee_engine.calculate_large_standard_fee_by_lb(weight_lb)
+    
+    def show_history_window(self):
+        """查询计算历史记录：按站点、尺寸分段、日期和费用筛选，分页浏览，可将记录填入计算器重新计算"""
+        try:
+            history_window = tk.Toplevel(self.root)
+            history_window.title("计算历史记录")
+            history_window.geometry("900x550")
+            history_window.transient(self.root)
+            
+            site_names = {"全部": None, "美国站": "us", "日本站": "jp"}
+            site_labels = {"us": "美国站", "jp": "日本站"}
+            
+            # 筛选条件
+            filter_frame = ttk.Frame(history_window)
+            filter_frame.pack(fill=tk.X, padx=10, pady=10)
+            
+            ttk.Label(filter_frame, text="站点:").grid(row=0, column=0, sticky=tk.W, padx=5, pady=3)
+            site_filter_var = tk.StringVar(value="全部")
+            ttk.Combobox(filter_frame, textvariable=site_filter_var, values=list(site_names),
+                         state="readonly", width=10).grid(row=0, column=1, sticky=tk.W, padx=5, pady=3)
+            
+            ttk.Label(filter_frame, text="尺寸分段:").grid(row=0, column=2, sticky=tk.W, padx=5, pady=3)
+            segment_filter_var = tk.StringVar(value="全部")
+            ttk.Combobox(filter_frame, textvariable=segment_filter_var,
+                         values=["全部"] + self.calculation_history.size_segments(),
+                         state="readonly", width=28).grid(row=0, column=3, columnspan=3, sticky=tk.W, padx=5, pady=3)
+            
+            ttk.Label(filter_frame, text="日期(YYYY-MM-DD):").grid(row=1, column=0, sticky=tk.W, padx=5, pady=3)
+            start_date_var = tk.StringVar()
+            end_date_var = tk.StringVar()
+            ttk.Entry(filter_frame, textvariable=start_date_var, width=12).grid(row=1, column=1, sticky=tk.W, padx=5, pady=3)
+            ttk.Label(filter_frame, text="至").grid(row=1, column=2, sticky=tk.W, padx=5, pady=3)
+            ttk.Entry(filter_frame, textvariable=end_date_var, width=12).grid(row=1, column=3, sticky=tk.W, padx=5, pady=3)
+            
+            ttk.Label(filter_frame, text="配送费:").grid(row=1, column=4, sticky=tk.W, padx=5, pady=3)
+            min_fee_var = tk.StringVar()
+            max_fee_var = tk.StringVar()
+            ttk.Entry(filter_frame, textvariable=min_fee_var, width=8).grid(row=1, column=5, sticky=tk.W, padx=5, pady=3)
+            ttk.Label(filter_frame, text="至").grid(row=1, column=6, sticky=tk.W, padx=5, pady=3)
+            ttk.Entry(filter_frame, textvariable=max_fee_var, width=8).grid(row=1, column=7, sticky=tk.W, padx=5, pady=3)
+            
+            # 结果列表
+            columns = ("timestamp", "site", "size_segment", "max_len", "mid_len", "min_len", "weight", "shipping_fee")
+            headings = ("时间", "站点", "尺寸分段", "最长边", "次长边", "最短边", "重量", "配送费")
+            widths = (140, 60, 180, 70, 70, 70, 90, 80)
+            
+            tree_frame = ttk.Frame(history_window)
+            tree_frame.pack(fill=tk.BOTH, expand=True, padx=10)
+            tree = ttk.Treeview(tree_frame, columns=columns, show="headings", selectmode="browse")
+            for column, heading, width in zip(columns, headings, widths):
+                tree.heading(column, text=heading)
+                tree.column(column, width=width, anchor=tk.CENTER)
+            tree_scrollbar = ttk.Scrollbar(tree_frame, command=tree.yview)
+            tree.config(yscrollcommand=tree_scrollbar.set)
+            tree_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+            tree.pack(fill=tk.BOTH, expand=True)
+            
+            # 分页状态：每页第一条之前的id（第一页为None），以及当前页的记录
+            page_starts = [None]
+            page_records = {}
+            
+            status_var = tk.StringVar()
+            
+            def parse_filters():
+                """读取筛选条件，日期和费用格式错误时提示并返回None"""
+                try:
+                    start_text = start_date_var.get().strip()
+                    end_text = end_date_var.get().strip()
+                    min_text = min_fee_var.get().strip()
+                    max_text = max_fee_var.get().strip()
+                    segment = segment_filter_var.get()
+                    return {
+                        'site': site_names.get(site_filter_var.get()),
+                        'size_segment': None if segment == "全部" else segment,
+                        'start': datetime.strptime(start_text, "%Y-%m-%d") if start_text else None,
+                        # 结束日期包含当天
+                        'end': datetime.strptime(end_text, "%Y-%m-%d") + timedelta(days=1) if end_text else None,
+                        'min_fee': float(min_text) if min_text else None,
+                        'max_fee': float(max_text) if max_text else None,
+                    }
+                except ValueError:
+                    messagebox.showerror("输入错误", "日期格式应为YYYY-MM-DD，费用应为数字", parent=history_window)
+                    return None
+            
+            def load_page():
+                filters = parse_filters()
+                if filters is None:
+                    return
+                # 多查询一条，用于判断是否还有下一页（记录数恰好是整页时最后一页不再显示“下一页”）
+                page_size = history_store.DEFAULT_PAGE_SIZE
+                rows = self.calculation_history.query(before_id=page_starts[-1], limit=page_size + 1, **filters)
+                has_next = len(rows) > page_size
+                rows = rows[:page_size]
+                
+                tree.delete(*tree.get_children())
+                page_records.clear()
+                for row_id, record in rows:
+                    timestamp = record.get('timestamp')
+                    weight = record.get('weight', '')
+                    tree.insert("", tk.END, iid=str(row_id), values=(
+                        timestamp.strftime("%Y-%m-%d %H:%M:%S") if isinstance(timestamp, datetime) else timestamp,
+                        site_labels.get(record.get('site'), record.get('site')),
+                        record.get('size_segment', ''),
+                        record.get('max_len', ''),
+                        record.get('mid_len', ''),
+                        record.get('min_len', ''),
+                        f"{weight} {record.get('weight_unit', '')}" if record.get('site') == 'us' else f"{weight} 克",
+                        record.get('shipping_fee', ''),
+                    ))
+                    page_records[str(row_id)] = (row_id, record)
+                
+                total = self.calculation_history.count(**filters)
+                status_var.set(f"共 {total} 条记录，第 {len(page_starts)} 页")
+                prev_btn.config(state=tk.NORMAL if len(page_starts) > 1 else tk.DISABLED)
+                next_btn.config(state=tk.NORMAL if has_next else tk.DISABLED)
+            
+            def search():
+                del page_starts[1:]
+                load_page()
+            
+            def next_page():
+                ids = [page_records[iid][0] for iid in tree.get_children()]
+                if ids:
+                    page_starts.append(min(ids))
+                    load_page()
+            
+            def prev_page():
+                if len(page_starts) > 1:
+                    page_starts.pop()
+                    load_page()
+            
+            def reuse_selected(event=None):
+                """将选中的记录填入计算器并重新计算"""
+                selection = tree.selection()
+                if not selection:
+                    messagebox.showinfo("提示", "请先选择一条记录", parent=history_window)
+                    return
+                _, record = page_records[selection[0]]
+                site = record.get('site', 'us')
+                
+                if site != self.current_site:
+                    self.switch_site(site)
+                self.max_len_var.set(str(record.get('max_len', '')))
+                self.mid_len_var.set(str(record.get('mid_len', '')))
+                self.min_len_var.set(str(record.get('min_len', '')))
+                self.weight_var.set(str(record.get('weight', '')))
+                if site == 'us' and record.get('weight_unit'):
+                    self.weight_unit_var.set(record['weight_unit'])
+                    self.last_weight_unit = record['weight_unit']
+                if site == 'jp':
+                    if hasattr(self, 'price_over_1000_var') and 'price_over_1000' in record:
+                        self.price_over_1000_var.set(record['price_over_1000'])
+                    if hasattr(self, 'is_frozen_var') and 'is_frozen' in record:
+                        self.is_frozen_var.set(record['is_frozen'])
+                
+                self.show_page("fba")
+                self.schedule_size_segment_update()
+                self.calculate_shipping()
+            
+            tree.bind("<Double-1>", reuse_selected)
+            
+            ttk.Button(filter_frame, text="查询", command=search, style="Accent.TButton").grid(
+                row=0, column=7, sticky=tk.E, padx=5, pady=3)
+            
+            # 底部按钮
+            bottom_frame = ttk.Frame(history_window)
+            bottom_frame.pack(fill=tk.X, padx=10, pady=10)
+            ttk.Label(bottom_frame, textvariable=status_var).pack(side=tk.LEFT)
+            ttk.Button(bottom_frame, text="关闭", command=history_window.destroy).pack(side=tk.RIGHT, padx=5)
+            ttk.Button(bottom_frame, text="填入计算器", command=reuse_selected, style="Accent.TButton").pack(side=tk.RIGHT, padx=5)
+            next_btn = ttk.Button(bottom_frame, text="下一页", command=next_page)
+            next_btn.pack(side=tk.RIGHT, padx=5)
+            prev_btn = ttk.Button(bottom_frame, text="上一页", command=prev_page)
+            prev_btn.pack(side=tk.RIGHT, padx=5)
+            
+            load_page()
+        
+        except Exception as e:
+            messagebox.showerror("错误", f"打开历史记录时出错：\n{str(e)}")
     
     def export_data(self):
-        """将计算结果导出为Excel或CSV格式"""
+        """将当前计算结果或全部计算历史导出为Excel、CSV或JSON Lines格式"""
         try:
             # 检查是否有计算历史记录
-            if not self.calculation_history and not self.result_text.get(1.0, tk.END).strip():
+            if self.last_calculation is None and not self.calculation_history.count_all():
                 messagebox.showinfo("提示", "没有可导出的数据，请先进行计算")
                 return
             
             # 创建导出选项对话框
             export_window = tk.Toplevel(self.root)
             export_window.title("导出数据选项")
-            export_window.geometry("400x250")
+            export_window.geometry("400x280")
             export_window.transient(self.root)
             export_window.grab_set()
             
@@ -3867,172 +3746,65 @@ if %ERRORLEVEL% equ 0 (
             
             format_frame = ttk.Frame(export_window)
             format_frame.pack(pady=5)
-            ttk.Radiobutton(format_frame, text="Excel格式 (.xlsx)", variable=format_var, value="excel").pack(side=tk.LEFT, padx=20)
-            ttk.Radiobutton(format_frame, text="CSV格式 (.csv)", variable=format_var, value="csv").pack(side=tk.LEFT, padx=20)
+            ttk.Radiobutton(format_frame, text="Excel (.xlsx)", variable=format_var, value="excel").pack(side=tk.LEFT, padx=10)
+            ttk.Radiobutton(format_frame, text="CSV (.csv)", variable=format_var, value="csv").pack(side=tk.LEFT, padx=10)
+            ttk.Radiobutton(format_frame, text="JSON Lines (.jsonl)", variable=format_var, value="jsonl").pack(side=tk.LEFT, padx=10)
+            
+            # 各格式的默认扩展名和文件类型
+            formats = {
+                "excel": (".xlsx", ("Excel文件", "*.xlsx")),
+                "csv": (".csv", ("CSV文件", "*.csv")),
+                "jsonl": (".jsonl", ("JSON Lines文件", "*.jsonl")),
+            }
             
-            # 准备导出数据的函数
-            def prepare_export_data():
+            def execute_export():
                 export_type = export_type_var.get()
                 format_type = format_var.get()
                 export_window.destroy()
                 
-                # 准备导出数据
-                data_list = []
-                
+                # 当前结果直接使用最近一次计算的结构化记录，历史记录从数据库逐条读取
                 if export_type == "current":
-                    # 获取当前结果
-                    result_text = self.result_text.get(1.0, tk.END).strip()
-                    if not result_text:
+                    if self.last_calculation is None:
                         messagebox.showinfo("提示", "没有当前计算结果可导出")
-                        return None, export_type, format_type
-                    
-                    data = {}
-                    lines = result_text.split('\n')
-                    for line in lines:
-                        if '商品尺寸分段：' in line:
-                            data['尺寸分段'] = line.split('：')[-1].strip()
-                        elif '重量：' in line:
-                            data['重量'] = line.split('：')[-1].strip()
-                        elif '最长边：' in line:
-                            data['最长边'] = line.split('：')[-1].strip()
-                        elif '次长边：' in line:
-                            data['次长边'] = line.split('：')[-1].strip()
-                        elif '最短边：' in line:
-                            data['最短边'] = line.split('：')[-1].strip()
-                        elif '长度+围长：' in line:
-                            data['长度+围长'] = line.split('：')[-1].strip()
-                        elif '配送费：' in line:
-                            data['配送费'] = line.split('：')[-1].strip()
-                    data_list.append(data)
+                        return
+                    records = [self.last_calculation]
                 else:
-                    # 使用历史记录数据
-                    if not self.calculation_history:
+                    if not self.calculation_history.count_all():
                         messagebox.showinfo("提示", "计算历史记录为空")
-                        return None, export_type, format_type
-                    data_list = self.calculation_history.copy()
-                
-                return data_list, export_type, format_type
-            
-            # 创建按钮框架
-            button_frame = ttk.Frame(export_window)
-            button_frame.pack(pady=15)
-            ttk.Button(button_frame, text="确定", command=lambda: execute_export(prepare_export_data())).pack(side=tk.LEFT, padx=10)
-            ttk.Button(button_frame, text="取消", command=export_window.destroy).pack(side=tk.LEFT, padx=10)
-            
-            # 等待对话框关闭
-            self.root.wait_window(export_window)
-            
-            # 执行导出的函数
-            def execute_export(result):
-                if result is None:
-                    return
-                    
-                data_list, export_type, format_type = result
-                if data_list is None:
-                    return
+                        return
+                    records = self.calculation_history.iter_all()
                 
-                # 打开文件保存对话框
-                file_types = [
-                    ("Excel文件", "*.xlsx"),
-                    ("CSV文件", "*.csv"),
-                    ("所有文件", "*.*")
-                ] if format_type == "excel" else [
-                    ("CSV文件", "*.csv"),
-                    ("Excel文件", "*.xlsx"),
-                    ("所有文件", "*.*")
-                ]
+                default_ext, file_type = formats[format_type]
+                # 没有安装openpyxl时默认保存为CSV
+                if default_ext == ".xlsx" and not lazy_imports.is_available("openpyxl"):
+                    messagebox.showinfo("提示", "未安装openpyxl库，将导出为CSV格式")
+                    default_ext, file_type = formats["csv"]
                 
-                default_ext = ".xlsx" if format_type == "excel" else ".csv"
                 filename = filedialog.asksaveasfilename(
                     defaultextension=default_ext,
-                    filetypes=file_types,
+                    filetypes=[file_type] + [other for _, other in formats.values() if other != file_type] + [("所有文件", "*.*")],
                     title="保存计算结果"
                 )
-                
                 if not filename:
                     return
                 
                 try:
-                    if format_type == "excel" or filename.lower().endswith('.xlsx'):
-                        # 使用我们的导出Excel方法
-                        self._export_to_excel(filename, data_list)
-                    else:
-                        # 导出为CSV格式
-                        self._export_to_csv(filename, data_list)
+                    count = history_store.export_records(records, filename)
+                    messagebox.showinfo("成功", f"已导出 {count} 条记录到\n{filename}")
+                except ImportError:
+                    messagebox.showerror("错误", "导出Excel文件需要安装openpyxl库，请选择CSV或JSON Lines格式")
                 except Exception as e:
                     messagebox.showerror("错误", f"导出失败：\n{str(e)}")
+            
+            # 创建按钮框架
+            button_frame = ttk.Frame(export_window)
+            button_frame.pack(pady=15)
+            ttk.Button(button_frame, text="确定", command=execute_export).pack(side=tk.LEFT, padx=10)
+            ttk.Button(button_frame, text="取消", command=export_window.destroy).pack(side=tk.LEFT, padx=10)
         
         except Exception as e:
             messagebox.showerror("错误", f"导出数据时出错：\n{str(e)}")
     
-    def _export_to_excel(self, filename, data):
-        """将数据导出为Excel格式，支持单个数据字典或数据列表，并设置自适应列宽"""
-        try:
-            # 尝试导入pandas
-            import pandas as pd
-            
-            # 确保data是列表格式
-            data_list = data if isinstance(data, list) else [data]
-            
-            if not data_list:
-                raise Exception("没有数据可导出")
-            
-            # 创建DataFrame
-            df = pd.DataFrame(data_list)
-            
-            # 导出到Excel
-            with pd.ExcelWriter(filename, engine='openpyxl') as writer:
-                df.to_excel(writer, index=False)
-                
-                # 获取工作表
-                worksheet = writer.sheets['Sheet1']
-                
-                # 设置列宽自适应
-                for column in worksheet.columns:
-                    max_length = 0
-                    column_letter = column[0].column_letter
-                    for cell in column:
-                        try:
-                            if len(str(cell.value)) > max_length:
-                                max_length = len(str(cell.value))
-                        except:
-                            pass
-                    adjusted_width = min(max_length + 2, 50)  # 限制最大宽度为50
-                    worksheet.column_dimensions[column_letter].width = adjusted_width
-            
-            messagebox.showinfo("成功", f"数据已成功导出到\n{filename}")
-            
-        except ImportError:
-            # 如果没有安装pandas，降级到CSV格式
-            csv_filename = filename.replace('.xlsx', '.csv')
-            self._export_to_csv(csv_filename, data)
-            messagebox.showinfo("提示", f"未安装pandas库，已将数据导出为CSV格式到\n{csv_filename}")
-            
-        except Exception as e:
-            raise Exception(f"导出Excel失败：{str(e)}")
-    
-    def _export_to_csv(self, filename, data):
-        """将数据导出为CSV格式，支持单个数据字典或数据列表"""
-        try:
-            import csv
-            # 确保data是列表格式
-            data_list = data if isinstance(data, list) else [data]
-            
-            if not data_list:
-                raise Exception("没有数据可导出")
-                
-            with open(filename, 'w', newline='', encoding='utf-8-sig') as f:
-                # 使用第一个数据项的键作为字段名
-                fieldnames = data_list[0].keys()
-                writer = csv.DictWriter(f, fieldnames=fieldnames)
-                writer.writeheader()
-                # 写入所有数据行
-                for row in data_list:
-                    writer.writerow(row)
-            messagebox.showinfo("成功", f"数据已成功导出到\n{filename}")
-        except Exception as e:
-            raise Exception(f"导出CSV失败：{str(e)}")
-    
     def batch_process(self):
         """批量导入产品信息进行费用计算"""
         try:
@@ -4062,6 +3834,14 @@ if %ERRORLEVEL% equ 0 (
             progress_label = ttk.Label(progress_frame, text="0%")
             progress_label.pack(side=tk.RIGHT, padx=10)
             
+            # 多进程并行计算选项
+            parallel_var = tk.BooleanVar(value=False)
+            ttk.Checkbutton(
+                batch_window,
+                text=f"多进程并行计算（适合超大文件，使用 {os.cpu_count() or 1} 个进程）",
+                variable=parallel_var
+            ).pack(anchor=tk.W, padx=10)
+            
             # 创建结果文本框
             result_frame = ttk.Frame(batch_window)
             result_frame.pack(fill=tk.BOTH, expand=True, pady=10, padx=10)
@@ -4122,35 +3902,18 @@ if %ERRORLEVEL% equ 0 (
                             return
                         
                         try:
-                                if format_type == "excel":
-                                    # 尝试使用pandas导出Excel，如果失败则自动降级到CSV
-                                    try:
-                                        import pandas as pd
-                                        df = pd.DataFrame(template_data)
-                                        with pd.ExcelWriter(filename, engine='openpyxl') as writer:
-                                            df.to_excel(writer, index=False)
-                                        messagebox.showinfo("成功", f"模板文件已保存到\n{filename}")
-                                    except ImportError:
-                                        # 自动降级到CSV格式，避免显示错误信息
-                                        csv_filename = filename.replace('.xlsx', '.csv')
-                                        import csv
-                                        with open(csv_filename, 'w', newline='', encoding='utf-8-sig') as f:
-                                            fieldnames = list(template_data[0].keys())
-                                            writer = csv.DictWriter(f, fieldnames=fieldnames)
-                                            writer.writeheader()
-                                            for data in template_data:
-                                                writer.writerow(data)
-                                        messagebox.showinfo("提示", f"已自动创建CSV模板文件\n{csv_filename}")
-                                else:
-                                    # 导出为CSV格式
-                                    import csv
-                                with open(filename, 'w', newline='', encoding='utf-8-sig') as f:
-                                    fieldnames = list(template_data[0].keys())
-                                    writer = csv.DictWriter(f, fieldnames=fieldnames)
-                                    writer.writeheader()
-                                    for data in template_data:
-                                        writer.writerow(data)
-                                messagebox.showinfo("成功", f"模板文件已保存到\n{filename}")
+                            # 没有安装openpyxl时自动降级到CSV格式
+                            if filename.lower().endswith('.xlsx') and not lazy_imports.is_available('openpyxl'):
+                                filename = filename[:-len('.xlsx')] + '.csv'
+                                message = ("提示", f"未安装openpyxl库，已自动创建CSV模板文件\n{filename}")
+                            else:
+                                message = ("成功", f"模板文件已保存到\n{filename}")
+                            
+                            with batch_engine.open_result_writer(filename, list(template_data[0].keys())) as writer:
+                                writer.writeheader()
+                                for data in template_data:
+                                    writer.writerow(data)
+                            messagebox.showinfo(*message)
                         except Exception as e:
                             messagebox.showerror("错误", f"保存模板文件失败：\n{str(e)}")
                     
@@ -4162,6 +3925,96 @@ if %ERRORLEVEL% equ 0 (
                 except Exception as e:
                     messagebox.showerror("错误", f"创建模板文件时出错：\n{str(e)}")
             
+            # 后台工作线程通过队列向界面报告进度和日志，由主线程定时批量刷新
+            progress_queue = queue.Queue()
+            
+            def post(kind, *payload):
+                """从工作线程发送消息到界面（log/progress为过程消息，其余为结束消息）"""
+                progress_queue.put((kind,) + payload)
+            
+            def make_progress_reporter():
+                """创建节流的进度报告函数（参数为0~1的完成比例），两次进度消息之间至少间隔BATCH_PROGRESS_INTERVAL秒"""
+                last_report = [0.0]
+                
+                def report(fraction):
+                    now = time.monotonic()
+                    if fraction >= 1 or now - last_report[0] >= self.BATCH_PROGRESS_INTERVAL:
+                        last_report[0] = now
+                        post('progress', fraction * 100)
+                
+                return report
+            
+            def drain_progress_queue():
+                """在主线程中取出队列中的全部消息，合并后一次性刷新界面"""
+                if not batch_window.winfo_exists():
+                    return
+                
+                log_lines = []
+                progress = None
+                finished = None
+                while finished is None:
+                    try:
+                        message = progress_queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if message[0] == 'log':
+                        log_lines.append(message[1])
+                    elif message[0] == 'progress':
+                        progress = message[1]
+                    else:
+                        finished = message
+                
+                if log_lines:
+                    result_text.insert(tk.END, "".join(log_lines))
+                    result_text.see(tk.END)
+                if progress is not None:
+                    progress_var.set(progress)
+                    progress_label.config(text=f"{int(progress)}%")
+                if finished is not None:
+                    import_btn.config(state=tk.NORMAL)
+                    # 结束消息之后不再轮询（如需转换后重新处理，start_worker会重新启动轮询）
+                    handle_worker_finished(finished)
+                    return
+                
+                self.root.after(self.BATCH_DRAIN_INTERVAL_MS, drain_progress_queue)
+            
+            def handle_worker_finished(message):
+                """处理工作线程的结束消息（对话框只能在主线程中弹出）"""
+                kind = message[0]
+                if kind == 'saved':
+                    output_filename, success_rows, total_rows = message[1], message[2], message[3]
+                    messagebox.showinfo("完成", f"成功处理 {success_rows}/{total_rows} 条数据\n结果已保存到\n{output_filename}")
+                elif kind == 'error':
+                    messagebox.showerror(message[1], message[2])
+                elif kind == 'info':
+                    messagebox.showinfo(message[1], message[2])
+            
+            def ask_output_file():
+                """批量处理为流式处理，结果边算边写，因此需要在处理前选择结果文件"""
+                filename = filedialog.asksaveasfilename(
+                    defaultextension=".xlsx",
+                    filetypes=[("Excel文件", "*.xlsx"), ("CSV文件", "*.csv"), ("所有文件", "*.*")],
+                    title="选择处理结果的保存位置"
+                )
+                
+                if filename and filename.lower().endswith('.xlsx') and not lazy_imports.is_available('openpyxl'):
+                    # 如果没有安装openpyxl，降级到CSV格式
+                    filename = filename[:-len('.xlsx')] + '.csv'
+                    messagebox.showinfo("提示", f"未安装openpyxl库，结果将保存为CSV格式到\n{filename}")
+                return filename
+            
+            def start_worker(target, *args):
+                """在后台线程中运行处理函数，并启动界面刷新循环"""
+                def run():
+                    try:
+                        target(*args)
+                    except Exception as e:
+                        post('error', "错误", f"批量处理时出错：\n{str(e)}")
+                
+                import_btn.config(state=tk.DISABLED)
+                threading.Thread(target=run, daemon=True).start()
+                self.root.after(self.BATCH_DRAIN_INTERVAL_MS, drain_progress_queue)
+            
             # 导入文件按钮
             def import_file():
                 try:
@@ -4180,335 +4033,112 @@ if %ERRORLEVEL% equ 0 (
                     if not filename:
                         return
                     
+                    if not filename.lower().endswith(('.xlsx', '.csv')):
+                        messagebox.showerror("错误", "不支持的文件格式，请选择Excel或CSV文件")
+                        return
+                    
+                    output_filename = ask_output_file()
+                    if not output_filename:
+                        return
+                    workers = (os.cpu_count() or 1) if parallel_var.get() else 1
+                    
                     # 清空结果文本
                     result_text.delete(1.0, tk.END)
                     result_text.insert(tk.END, f"开始处理文件: {filename}\n")
-                    result_text.update()
+                    progress_var.set(0)
+                    progress_label.config(text="0%")
                     
                     # 根据文件扩展名选择处理方式
-                    if filename.lower().endswith('.xlsx'):
-                        process_excel_file(filename)
-                    elif filename.lower().endswith('.csv'):
-                        process_csv_file(filename)
+                    if filename.lower().endswith('.csv'):
+                        start_worker(csv_worker, filename, output_filename, workers)
                     else:
-                        messagebox.showerror("错误", "不支持的文件格式，请选择Excel或CSV文件")
+                        start_worker(xlsx_stream_worker, filename, output_filename, workers)
                 
                 except Exception as e:
                     messagebox.showerror("错误", f"导入文件时出错：\n{str(e)}")
             
             # 按钮将在函数末尾创建
             
-            # 处理Excel文件
-            def process_excel_file(filename):
-                try:
-                    # 尝试导入pandas
-                    import pandas as pd
-                    
-                    # 读取Excel文件
-                    try:
-                        df = pd.read_excel(filename)
-                    except Exception as excel_error:
-                        # 如果读取Excel失败，尝试提示用户转成CSV格式
-                        result_text.insert(tk.END, f"读取Excel文件失败：{str(excel_error)}\n")
-                        result_text.insert(tk.END, "尝试将Excel文件转换为CSV格式...\n")
-                        result_text.update()
-                        
-                        # 提示用户手动转换或尝试其他方法
-                        if messagebox.askyesno("Excel读取失败", "无法读取Excel文件。这可能是由于缺少必要的依赖项。\n\n是否要尝试将Excel文件转换为CSV格式并继续处理？"):
-                            # 尝试使用临时CSV文件路径
-                            import tempfile
-                            import csv
-                            import os
-                            
-                            try:
-                                # 创建临时CSV文件
-                                csv_temp = tempfile.NamedTemporaryFile(delete=False, suffix='.csv', encoding='utf-8-sig')
-                                csv_temp.close()
-                                
-                                # 尝试使用pandas转换格式
-                                try:
-                                    df = pd.read_excel(filename)
-                                    df.to_csv(csv_temp.name, index=False, encoding='utf-8-sig')
-                                    result_text.insert(tk.END, "成功将Excel文件转换为CSV格式\n")
-                                    result_text.update()
-                                    # 使用CSV处理函数处理转换后的文件
-                                    process_csv_file(csv_temp.name)
-                                    # 删除临时文件
-                                    os.unlink(csv_temp.name)
-                                    return
-                                except Exception as convert_error:
-                                    result_text.insert(tk.END, f"转换失败：{str(convert_error)}\n")
-                                    os.unlink(csv_temp.name)
-                                    messagebox.showinfo("提示", "请手动将Excel文件另存为CSV格式，然后选择CSV文件进行处理。")
-                                    return
-                            except Exception as temp_error:
-                                result_text.insert(tk.END, f"创建临时文件失败：{str(temp_error)}\n")
-                                messagebox.showinfo("提示", "请手动将Excel文件另存为CSV格式，然后选择CSV文件进行处理。")
-                                return
-                        else:
-                            return
-                    
-                    # 检查必要的列是否存在
-                    required_columns = ['重量(g)', '最长边(cm)', '次长边(cm)', '最短边(cm)']
-                    missing_columns = [col for col in required_columns if col not in df.columns]
-                    
-                    if missing_columns:
-                        messagebox.showerror("错误", f"文件缺少必要的列：{', '.join(missing_columns)}")
-                        return
-                    
-                    # 处理每一行数据
-                    results = []
-                    total_rows = len(df)
-                    
-                    for index, row in df.iterrows():
-                        try:
-                            # 更新进度条
-                            progress = (index + 1) / total_rows * 100
-                            progress_var.set(progress)
-                            progress_label.config(text=f"{int(progress)}%")
-                            batch_window.update()
-                            
-                            # 提取数据
-                            # 创建默认的column_map
-                            column_map = {}
-                            # 使用映射的列名或直接使用原始列名
-                            weight_g = float(row[column_map.get('重量(g)', '重量(g)')])
-                            length_cm = float(row[column_map.get('最长边(cm)', '最长边(cm)')])
-                            width_cm = float(row[column_map.get('次长边(cm)', '次长边(cm)')])
-                            height_cm = float(row[column_map.get('最短边(cm)', '最短边(cm)')])
-                            
-                            # 计算费用
-                            calc_result = self.calculate_fba_fee(weight_g, length_cm, width_cm, height_cm)
-                            
-                            # 保存结果
-                            result_dict = {
-                                '重量(g)': weight_g,
-                                '最长边(cm)': length_cm,
-                                '次长边(cm)': width_cm,
-                                '最短边(cm)': height_cm,
-                                '尺寸分段': calc_result['size_tier'],
-                                '重量': calc_result['weight_display'],
-                                '长度+围长': calc_result['girth_display'],
-                                '配送费': calc_result['fee']
-                            }
-                            
-                            # 添加原始数据中的其他列
-                            for col in df.columns:
-                                if col not in required_columns:
-                                    result_dict[col] = row[col]
-                            
-                            results.append(result_dict)
-                            
-                            # 显示处理结果
-                            result_text.insert(tk.END, f"处理行 {index + 1}/{total_rows}: 成功\n")
-                            result_text.see(tk.END)
-                            result_text.update()
-                            
-                        except Exception as e:
-                            result_text.insert(tk.END, f"处理行 {index + 1}/{total_rows}: 失败 - {str(e)}\n")
-                            result_text.see(tk.END)
-                            result_text.update()
-                    
-                    # 完成后保存结果
-                    if results:
-                        # 询问是否保存结果
-                        if messagebox.askyesno("完成", f"成功处理 {len(results)}/{total_rows} 条数据\n是否保存结果到文件？"):
-                            save_results(results)
+            def make_error_logger():
+                """创建失败行记录函数和结束汇总函数，只逐条记录前若干条失败行，避免超大文件把日志撑满"""
+                failed_rows = [0]
                 
-                except ImportError:
-                    # 如果导入pandas失败，建议用户使用CSV格式
-                    result_text.insert(tk.END, "未找到pandas库，无法处理Excel文件\n")
-                    messagebox.showinfo("提示", "未安装pandas和openpyxl库。请将Excel文件另存为CSV格式，然后选择CSV文件进行处理。")
-                except Exception as e:
-                    # 捕获其他可能的错误
-                    result_text.insert(tk.END, f"处理Excel文件时出错：{str(e)}\n")
-                    result_text.insert(tk.END, "尝试将Excel文件另存为CSV格式可能会解决此问题\n")
-                    messagebox.showerror("错误", f"处理Excel文件时出错：\n{str(e)}\n\n请尝试将Excel文件另存为CSV格式，然后选择CSV文件进行处理。")
+                def log_row_error(row_number, error):
+                    failed_rows[0] += 1
+                    if failed_rows[0] <= self.BATCH_MAX_LOGGED_ERRORS:
+                        post('log', f"处理行 {row_number}: 失败 - {error}\n")
+                
+                def finish(success_rows, total_rows, cache_stats):
+                    if failed_rows[0] > self.BATCH_MAX_LOGGED_ERRORS:
+                        post('log', f"另有 {failed_rows[0] - self.BATCH_MAX_LOGGED_ERRORS} 行处理失败，未逐条显示\n")
+                    post('log', f"批量计算完成：成功 {success_rows}/{total_rows} 行\n")
+                    post('log', f"{cache_stats.summary()}\n")
+                
+                return log_row_error, finish
             
-            # 处理CSV文件
-            def process_csv_file(filename):
+            # 流式处理CSV文件（在工作线程中运行）：逐行读取、计算并写入结果文件，内存占用与文件大小无关
+            def csv_worker(filename, output_filename, workers=1):
                 try:
-                    # 定义必要的列名，确保在所有代码路径中都可用
-                    required_columns = ['重量(g)', '最长边(cm)', '次长边(cm)', '最短边(cm)']
-                    
-                    # 读取CSV文件 - 尝试多种编码格式
-                    import csv
-                    # 常见的CSV编码格式列表，按优先级排序
-                    encodings = ['utf-8-sig', 'gbk', 'cp936', 'cp1252', 'latin-1']
-                    rows = None
-                    used_encoding = None
-                    
-                    # 尝试不同的编码格式
-                    for encoding in encodings:
-                        try:
-                            with open(filename, 'r', encoding=encoding) as f:
-                                reader = csv.DictReader(f)
-                                rows = list(reader)
-                            used_encoding = encoding
-                            break
-                        except UnicodeDecodeError:
-                            continue
+                    log_row_error, log_summary = make_error_logger()
+                    cache_stats = batch_engine.CacheStats()
+                    if workers > 1:
+                        post('log', f"使用 {workers} 个进程并行计算\n")
                     
-                    # 如果所有编码都失败
-                    if rows is None:
-                        raise UnicodeDecodeError('UTF-8', b'', 0, 1, '无法识别文件编码，请尝试使用Excel将文件另存为CSV UTF-8格式')
+                    # 根据文件开头的字节检测编码，只完整解析文件一次
+                    encoding = batch_engine.detect_encoding(filename)
+                    post('log', f"检测到文件编码: {encoding}\n")
                     
-                    # 检查必要的列是否存在
-                    if not rows:
-                        messagebox.showerror("错误", "CSV文件为空")
+                    try:
+                        success_rows, total_rows = batch_engine.stream_csv_fees(
+                            filename, output_filename, encoding,
+                            on_progress=make_progress_reporter(),
+                            on_error=log_row_error,
+                            workers=workers,
+                            cache_stats=cache_stats
+                        )
+                    except UnicodeDecodeError:
+                        post('error', "错误", f"文件中存在不符合 {encoding} 编码的内容，请尝试使用Excel将文件另存为CSV UTF-8格式")
                         return
                     
-                    # 获取实际的列名并进行清理（去除空格和其他可能的干扰字符）
-                    actual_columns = {col.strip() for col in rows[0].keys()}
-                    
-                    # 定义必要列的映射，支持多种可能的列名变体
-                    column_mappings = {
-                        '重量(g)': ['重量(g)', '重量', 'weight'],
-                        '最长边(cm)': ['最长边(cm)', '最长边', 'length', '长'],
-                        '次长边(cm)': ['次长边(cm)', '次长边', 'width', '宽'],
-                        '最短边(cm)': ['最短边(cm)', '最短边', 'height', '高']
-                    }
-                    
-                    # 尝试匹配列名
-                    column_map = {}
-                    missing_columns = []
-                    
-                    for req_col, possible_names in column_mappings.items():
-                        found = False
-                        for actual_col in actual_columns:
-                            # 不区分大小写进行匹配，并且考虑部分匹配
-                            actual_lower = actual_col.lower()
-                            for possible in possible_names:
-                                possible_lower = possible.lower()
-                                if possible_lower in actual_lower or actual_lower in possible_lower:
-                                    column_map[req_col] = actual_col
-                                    found = True
-                                    break
-                            if found:
-                                break
-                        if not found:
-                            missing_columns.append(req_col)
-                    
-                    if missing_columns:
-                        # 尝试使用原始逻辑再次检查，确保向后兼容性
-                        original_missing = [col for col in required_columns if col not in rows[0]]
-                        if original_missing:
-                            messagebox.showerror("错误", f"文件缺少必要的列：{', '.join(original_missing)}")
-                            return
-                    
-                    # 处理每一行数据
-                    results = []
-                    total_rows = len(rows)
-                    
-                    for index, row in enumerate(rows):
-                        try:
-                            # 更新进度条
-                            progress = (index + 1) / total_rows * 100
-                            progress_var.set(progress)
-                            progress_label.config(text=f"{int(progress)}%")
-                            batch_window.update()
-                            
-                            # 提取数据 - 使用column_map进行正确的列名映射
-                            weight_g = float(row[column_map.get('重量(g)', '重量(g)')])
-                            length_cm = float(row[column_map.get('最长边(cm)', '最长边(cm)')])
-                            width_cm = float(row[column_map.get('次长边(cm)', '次长边(cm)')])
-                            height_cm = float(row[column_map.get('最短边(cm)', '最短边(cm)')])
-                            
-                            # 计算费用
-                            calc_result = self.calculate_fba_fee(weight_g, length_cm, width_cm, height_cm)
-                            
-                            # 保存结果
-                            result_dict = {
-                                '重量(g)': weight_g,
-                                '最长边(cm)': length_cm,
-                                '次长边(cm)': width_cm,
-                                '最短边(cm)': height_cm,
-                                '尺寸分段': calc_result['size_tier'],
-                                '重量': calc_result['weight_display'],
-                                '长度+围长': calc_result['girth_display'],
-                                '配送费': calc_result['fee']
-                            }
-                            
-                            # 添加原始数据中的其他列
-                            for col in row:
-                                if col not in required_columns:
-                                    result_dict[col] = row[col]
-                            
-                            results.append(result_dict)
-                            
-                            # 显示处理结果
-                            result_text.insert(tk.END, f"处理行 {index + 1}/{total_rows}: 成功\n")
-                            result_text.see(tk.END)
-                            result_text.update()
-                            
-                        except Exception as e:
-                            result_text.insert(tk.END, f"处理行 {index + 1}/{total_rows}: 失败 - {str(e)}\n")
-                            result_text.see(tk.END)
-                            result_text.update()
-                    
-                    # 完成后保存结果
-                    if results:
-                        # 询问是否保存结果
-                        if messagebox.askyesno("完成", f"成功处理 {len(results)}/{total_rows} 条数据\n是否保存结果到文件？"):
-                            save_results(results)
+                    log_summary(success_rows, total_rows, cache_stats)
+                    post('saved', output_filename, success_rows, total_rows)
                 
+                except ValueError as e:
+                    # 文件为空或缺少必要的列
+                    post('error', "错误", str(e))
                 except Exception as e:
-                    messagebox.showerror("错误", f"处理CSV文件时出错：\n{str(e)}")
+                    post('error', "错误", f"处理CSV文件时出错：\n{str(e)}")
             
-            # 保存结果
-            def save_results(results):
+            # 流式处理Excel文件（在工作线程中运行）：只读模式逐行读取工作表，不生成完整的DataFrame
+            def xlsx_stream_worker(filename, output_filename, workers=1):
                 try:
-                    # 打开文件保存对话框
-                    file_types = [
-                        ("Excel文件", "*.xlsx"),
-                        ("CSV文件", "*.csv"),
-                        ("所有文件", "*.*")
-                    ]
+                    log_row_error, log_summary = make_error_logger()
+                    cache_stats = batch_engine.CacheStats()
+                    if workers > 1:
+                        post('log', f"使用 {workers} 个进程并行计算\n")
                     
-                    default_ext = ".xlsx"
-                    filename = filedialog.asksaveasfilename(
-                        defaultextension=default_ext,
-                        filetypes=file_types,
-                        title="保存处理结果"
+                    success_rows, total_rows = batch_engine.stream_xlsx_fees(
+                        filename, output_filename,
+                        on_progress=make_progress_reporter(),
+                        on_error=log_row_error,
+                        workers=workers,
+                        cache_stats=cache_stats
                     )
                     
-                    if not filename:
-                        return
-                    
-                    if filename.lower().endswith('.xlsx'):
-                        # 尝试使用pandas导出Excel
-                        try:
-                            import pandas as pd
-                            df = pd.DataFrame(results)
-                            with pd.ExcelWriter(filename, engine='openpyxl') as writer:
-                                df.to_excel(writer, index=False)
-                            messagebox.showinfo("成功", f"结果已成功保存到\n{filename}")
-                        except ImportError:
-                            # 如果没有安装pandas，降级到CSV格式
-                            save_to_csv(filename.replace('.xlsx', '.csv'), results)
-                    else:
-                        # 导出为CSV格式
-                        save_to_csv(filename, results)
+                    log_summary(success_rows, total_rows, cache_stats)
+                    post('saved', output_filename, success_rows, total_rows)
                 
+                except ImportError:
+                    # 如果导入openpyxl失败，建议用户使用CSV格式
+                    post('log', "未找到openpyxl库，无法处理Excel文件\n")
+                    post('info', "提示", "未安装openpyxl库。请将Excel文件另存为CSV格式，然后选择CSV文件进行处理。")
+                except ValueError as e:
+                    # 文件为空或缺少必要的列
+                    post('error', "错误", str(e))
                 except Exception as e:
-                    messagebox.showerror("错误", f"保存结果时出错：\n{str(e)}")
-            
-            # 保存到CSV文件
-            def save_to_csv(filename, results):
-                try:
-                    import csv
-                    with open(filename, 'w', newline='', encoding='utf-8-sig') as f:
-                        if results:
-                            fieldnames = list(results[0].keys())
-                            writer = csv.DictWriter(f, fieldnames=fieldnames)
-                            writer.writeheader()
-                            for data in results:
-                                writer.writerow(data)
-                    messagebox.showinfo("成功", f"结果已成功保存到\n{filename}")
-                except Exception as e:
-                    messagebox.showerror("错误", f"保存CSV文件失败：\n{str(e)}")
-            
-
+                    # 捕获其他可能的错误（如文件损坏或不是xlsx格式）
+                    post('log', f"处理Excel文件时出错：{str(e)}\n")
+                    post('error', "错误", f"处理Excel文件时出错：\n{str(e)}\n\n请尝试将Excel文件另存为CSV格式，然后选择CSV文件进行处理。")
             
             # 添加按钮 - 确保只创建一组按钮
             # 先清空按钮框架，避免重复创建
@@ -4526,394 +4156,15 @@ if %ERRORLEVEL% equ 0 (
             
         except Exception as e:
             messagebox.showerror("错误", f"批量处理时出错：\n{str(e)}")
-    
-    def calculate_fee_with_steps(self, size_segment, weight_lb, weight_oz, weight_unit):
-        """
-        计算配送费用并返回详细计算过程
-        """
-        steps = []
-        
-        # 记录基本信息
-        steps.append(f"1. 根据尺寸分段 '{size_segment}' 计算费用")
-        
-        # 小号标准尺寸（盎司）
-        if size_segment == "小号标准尺寸":
-            steps.append("   - 小号标准尺寸费用计算规则（按盎司）:")
-            if weight_oz <= 2:
-                fee = 3.06
-                steps.append(f"   - 当前重量 {weight_oz:.2f} 盎司 ≤ 2盎司，适用费率: $3.06")
-            elif weight_oz <= 4:
-                fee = 3.15
-                steps.append(f"   - 当前重量 2盎司 < {weight_oz:.2f} 盎司 ≤ 4盎司，适用费率: $3.15")
-            elif weight_oz <= 6:
-                fee = 3.24
-                steps.append(f"   - 当前重量 4盎司 < {weight_oz:.2f} 盎司 ≤ 6盎司，适用费率: $3.24")
-            elif weight_oz <= 8:
-                fee = 3.33
-                steps.append(f"   - 当前重量 6盎司 < {weight_oz:.2f} 盎司 ≤ 8盎司，适用费率: $3.33")
-            elif weight_oz <= 10:
-                fee = 3.43
-                steps.append(f"   - 当前重量 8盎司 < {weight_oz:.2f} 盎司 ≤ 10盎司，适用费率: $3.43")
-            elif weight_oz <= 12:
-                fee = 3.53
-                steps.append(f"   - 当前重量 10盎司 < {weight_oz:.2f} 盎司 ≤ 12盎司，适用费率: $3.53")
-            elif weight_oz <= 14:
-                fee = 3.60
-                steps.append(f"   - 当前重量 12盎司 < {weight_oz:.2f} 盎司 ≤ 14盎司，适用费率: $3.60")
-            elif weight_oz <= 16:
-                fee = 3.65
-                steps.append(f"   - 当前重量 14盎司 < {weight_oz:.2f} 盎司 ≤ 16盎司，适用费率: $3.65")
-            else:
-                fee = "重量区间不匹配"
-                steps.append(f"   - 错误: {weight_oz:.2f} 盎司超出小号标准尺寸范围")
-        
-        # 大号标准尺寸
-        elif size_segment == "大号标准尺寸":
-            steps.append("   - 大号标准尺寸费用计算规则:")
-            if weight_unit == '盎司':
-                steps.append(f"   - 当前使用单位: 盎司 ({weight_oz:.2f} 盎司)")
-                if weight_oz <= 4:
-                    fee = 3.68
-                    steps.append(f"   - 当前重量 {weight_oz:.2f} 盎司 ≤ 4盎司，适用费率: $3.68")
-                elif weight_oz <= 8:
-                    fee = 3.90
-                    steps.append(f"   - 当前重量 4盎司 < {weight_oz:.2f} 盎司 ≤ 8盎司，适用费率: $3.90")
-                elif weight_oz <= 12:
-                    fee = 4.15
-                    steps.append(f"   - 当前重量 8盎司 < {weight_oz:.2f} 盎司 ≤ 12盎司，适用费率: $4.15")
-                elif weight_oz <= 16:
-                    fee = 4.55
-                    steps.append(f"   - 当前重量 12盎司 < {weight_oz:.2f} 盎司 ≤ 16盎司，适用费率: $4.55")
-                elif 24 < weight_oz <= 28:
-                    fee = 4.55
-                    steps.append(f"   - 当前重量 24盎司 < {weight_oz:.2f} 盎司 ≤ 28盎司，适用费率: $4.55")
-                else:
-                    steps.append(f"   - 重量超出盎司区间，转换为磅计算 ({weight_lb:.2f} 磅)")
-                    fee = self.calculate_large_standard_fee_by_lb(weight_lb)
-                    steps.extend(self.get_large_standard_calculation_steps(weight_lb))
-            else:
-                steps.append(f"   - 当前使用单位: 磅 ({weight_lb:.2f} 磅)")
-                fee = self.calculate_large_standard_fee_by_lb(weight_lb)
-                steps.extend(self.get_large_standard_calculation_steps(weight_lb))
-        
-        # 大号大件
-        elif size_segment == "大号大件":
-            steps.append("   - 大号大件费用计算规则:")
-            base_fee = 9.61
-            per_lb_fee = 0.38
-            steps.append(f"   - 基础费用: ${base_fee:.2f}")
-            steps.append(f"   - 每磅额外费用: ${per_lb_fee:.2f}")
-            fee = round(base_fee + max(0, weight_lb) * per_lb_fee, 2)
-            steps.append(f"   - 计算公式: ${base_fee:.2f} + {weight_lb:.2f} 磅 × ${per_lb_fee:.2f}/磅 = ${fee:.2f}")
-        
-        # 超大件：0至50磅
-        elif size_segment == "超大件：0至50磅":
-            steps.append("   - 超大件(0至50磅)费用计算规则:")
-            base_fee = 26.33
-            per_lb_fee = 0.38
-            steps.append(f"   - 基础费用: ${base_fee:.2f}")
-            steps.append(f"   - 每磅额外费用: ${per_lb_fee:.2f}")
-            fee = round(base_fee + max(0, weight_lb) * per_lb_fee, 2)
-            steps.append(f"   - 计算公式: ${base_fee:.2f} + {weight_lb:.2f} 磅 × ${per_lb_fee:.2f}/磅 = ${fee:.2f}")
-        
-        # 超大件：50至70磅
-        elif size_segment == "超大件：50至70磅（不含50磅）":
-            steps.append("   - 超大件(50至70磅)费用计算规则:")
-            base_fee = 40.12
-            per_lb_fee = 0.75
-            steps.append(f"   - 基础费用: ${base_fee:.2f}")
-            steps.append(f"   - 超出50磅部分每磅额外费用: ${per_lb_fee:.2f}")
-            additional_weight = max(0, weight_lb - 51)
-            fee = round(base_fee + additional_weight * per_lb_fee, 2)
-            steps.append(f"   - 超出重量: {additional_weight:.2f} 磅")
-            steps.append(f"   - 计算公式: ${base_fee:.2f} + {additional_weight:.2f} 磅 × ${per_lb_fee:.2f}/磅 = ${fee:.2f}")
-        
-        # 超大件：70至150磅
-        elif size_segment == "超大件：70至150磅（不含70磅）":
-            steps.append("   - 超大件(70至150磅)费用计算规则:")
-            base_fee = 54.81
-            per_lb_fee = 0.75
-            steps.append(f"   - 基础费用: ${base_fee:.2f}")
-            steps.append(f"   - 超出70磅部分每磅额外费用: ${per_lb_fee:.2f}")
-            additional_weight = max(0, weight_lb - 71)
-            fee = round(base_fee + additional_weight * per_lb_fee, 2)
-            steps.append(f"   - 超出重量: {additional_weight:.2f} 磅")
-            steps.append(f"   - 计算公式: ${base_fee:.2f} + {additional_weight:.2f} 磅 × ${per_lb_fee:.2f}/磅 = ${fee:.2f}")
-        
-        # 超大件：150磅以上
-        elif size_segment == "超大件：150磅以上（不含150磅）":
-            steps.append("   - 超大件(150磅以上)费用计算规则:")
-            base_fee = 194.95
-            per_lb_fee = 0.19
-            steps.append(f"   - 基础费用: ${base_fee:.2f}")
-            steps.append(f"   - 超出150磅部分每磅额外费用: ${per_lb_fee:.2f}")
-            additional_weight = max(0, weight_lb - 151)
-            fee = round(base_fee + additional_weight * per_lb_fee, 2)
-            steps.append(f"   - 超出重量: {additional_weight:.2f} 磅")
-            steps.append(f"   - 计算公式: ${base_fee:.2f} + {additional_weight:.2f} 磅 × ${per_lb_fee:.2f}/磅 = ${fee:.2f}")
-        
-        else:
-            fee = "无法计算配送费"
-            steps.append(f"   - 错误: 无法识别的尺寸分段 '{size_segment}'")
-        
-        # 添加最终结果
-        steps.append(f"\n2. 最终配送费用: ${fee}")
-        
-        # 返回费用和计算步骤
-        return fee, "\n".join(steps)
-    
-    def get_large_standard_calculation_steps(self, weight_lb):
-        """
-        获取大号标准尺寸按磅计算的详细步骤
-        """
-        steps = []
-        
-        if weight_lb <= 1:
-            steps.append(f"   - 当前重量 {weight_lb:.2f} 磅 ≤ 1磅，适用费率: $3.68")
-        elif weight_lb <= 1.25:
-            steps.append(f"   - 当前重量 1磅 < {weight_lb:.2f} 磅 ≤ 1.25磅，适用费率: $4.99")
-        elif weight_lb <= 1.5:
-            steps.append(f"   - 当前重量 1.25磅 < {weight_lb:.2f} 磅 ≤ 1.5磅，适用费率: $5.37")
-        elif weight_lb <= 1.75:
-            steps.append(f"   - 当前重量 1.5磅 < {weight_lb:.2f} 磅 ≤ 1.75磅，适用费率: $5.52")
-        elif weight_lb <= 2:
-            steps.append(f"   - 当前重量 1.75磅 < {weight_lb:.2f} 磅 ≤ 2磅，适用费率: $5.77")
-        elif weight_lb <= 2.25:
-            steps.append(f"   - 当前重量 2磅 < {weight_lb:.2f} 磅 ≤ 2.25磅，适用费率: $5.87")
-        elif weight_lb <= 2.5:
-            steps.append(f"   - 当前重量 2.25磅 < {weight_lb:.2f} 磅 ≤ 2.5磅，适用费率: $6.05")
-        elif weight_lb <= 2.75:
-            steps.append(f"   - 当前重量 2.5磅 < {weight_lb:.2f} 磅 ≤ 2.75磅，适用费率: $6.21")
-        elif weight_lb <= 3:
-            steps.append(f"   - 当前重量 2.75磅 < {weight_lb:.2f} 磅 ≤ 3磅，适用费率: $6.62")
-        elif weight_lb <= 20:
-            base_fee = 6.92
-            per_quarter_lb = 0.08
-            additional_weight = weight_lb - 3
-            additional_quarter_lbs = additional_weight * 4
-            additional_fee = additional_quarter_lbs * per_quarter_lb
-            total_fee = round(base_fee + additional_fee, 2)
-            steps.append(f"   - 当前重量 3磅 < {weight_lb:.2f} 磅 ≤ 20磅")
-            steps.append(f"   - 基础费用: ${base_fee:.2f}")
-            steps.append(f"   - 超出3磅部分: {additional_weight:.2f} 磅")
-            steps.append(f"   - 超出部分折合四分之一磅: {additional_quarter_lbs:.2f} 个")
-            steps.append(f"   - 每个四分之一磅费用: ${per_quarter_lb:.2f}")
-            steps.append(f"   - 超出部分费用: {additional_quarter_lbs:.2f} × ${per_quarter_lb:.2f} = ${additional_fee:.2f}")
-            steps.append(f"   - 总费用: ${base_fee:.2f} + ${additional_fee:.2f} = ${total_fee:.2f}")
-        else:
-            steps.append(f"   - 错误: {weight_lb:.2f} 磅超出大号标准尺寸重量范围")
-        
-        return steps
-    
-    def create_weight_converter_ui(self):
-        """创建独立的重量转换工具界面"""
-        # 获取重量转换器框架
-        frame = self.weight_converter_frame
-        
-        # 创建标题
-        title_label = ttk.Label(
-            frame, 
-            text="重量单位转换器", 
-            font=self.title_font
-        )
-        title_label.pack(pady=20)
-        
-        # 创建输入框架
-        input_frame = ttk.LabelFrame(frame, text="转换设置", padding="20")
-        input_frame.pack(fill=tk.X, padx=20, pady=10)
-        
-        # 输入值
-        value_frame = ttk.Frame(input_frame)
-        value_frame.pack(fill=tk.X, pady=10)
-        
-        ttk.Label(value_frame, text="输入值:", width=10).pack(side=tk.LEFT, padx=5)
-        
-        self.weight_input_var = tk.StringVar(value="1")
-        self.weight_input_entry = ttk.Entry(
-            value_frame, 
-            textvariable=self.weight_input_var, 
-            width=15,
-            justify=tk.RIGHT
-        )
-        self.weight_input_entry.pack(side=tk.LEFT, padx=5)
-        
-        # 源单位选择
-        from_unit_frame = ttk.Frame(input_frame)
-        from_unit_frame.pack(fill=tk.X, pady=10)
-        
-        ttk.Label(from_unit_frame, text="从单位:", width=10).pack(side=tk.LEFT, padx=5)
-        
-        self.from_unit_var = tk.StringVar(value="磅")
-        units_frame = ttk.Frame(from_unit_frame)
-        units_frame.pack(side=tk.LEFT)
-        
-        units = ["磅 (lb)", "盎司 (oz)", "克 (g)", "千克 (kg)"]
-        unit_values = ["磅", "盎司"]
-        
-        for text, value in zip(units, unit_values):
-            ttk.Radiobutton(
-                units_frame, 
-                text=text, 
-                variable=self.from_unit_var, 
-                value=value
-            ).pack(side=tk.LEFT, padx=10)
-        
-        # 目标单位选择
-        to_unit_frame = ttk.Frame(input_frame)
-        to_unit_frame.pack(fill=tk.X, pady=10)
-        
-        ttk.Label(to_unit_frame, text="到单位:", width=10).pack(side=tk.LEFT, padx=5)
-        
-        self.to_unit_var = tk.StringVar(value="千克")
-        to_units_frame = ttk.Frame(to_unit_frame)
-        to_units_frame.pack(side=tk.LEFT)
-        
-        for text, value in zip(units, unit_values):
-            ttk.Radiobutton(
-                to_units_frame, 
-                text=text, 
-                variable=self.to_unit_var, 
-                value=value
-            ).pack(side=tk.LEFT, padx=10)
-        
-        # 转换按钮
-        button_frame = ttk.Frame(frame)
-        button_frame.pack(pady=20)
-        
-        self.convert_button = ttk.Button(
-            button_frame, 
-            text="转换重量", 
-            command=self.convert_weight
-        )
-        self.convert_button.pack(padx=10)
-        
-        # 结果显示
-        result_frame = ttk.LabelFrame(frame, text="转换结果", padding="20")
-        result_frame.pack(fill=tk.X, padx=20, pady=10)
-        
-        # 创建结果标签
-        self.weight_result_var = tk.StringVar(value="请点击转换按钮")
-        self.weight_result_label = ttk.Label(
-            result_frame, 
-            textvariable=self.weight_result_var,
-            font=self.header_font,
-            wraplength=600
-        )
-        self.weight_result_label.pack(pady=10)
-        
-        # 添加转换信息区域
-        info_frame = ttk.LabelFrame(frame, text="转换信息", padding="20")
-        info_frame.pack(fill=tk.X, padx=20, pady=10)
-        
-        info_text = """
-        常用重量单位转换关系：
-        • 1 磅 = 16 盎司 = 453.59237 克 = 0.45359237 千克
-        • 1 盎司 = 28.349523125 克
-        • 1 千克 = 1000 克 = 35.2739619 盎司 = 2.20462262 磅
-        """
-        
-        ttk.Label(info_frame, text=info_text, justify=tk.LEFT).pack(anchor=tk.W)
-    
-    def convert_weight(self):
-        """执行重量单位转换计算"""
-        try:
-            # 获取输入值和单位
-            input_value = float(self.weight_input_var.get())
-            from_unit = self.from_unit_var.get()
-            to_unit = self.to_unit_var.get()
-            
-            # 如果单位相同，直接显示结果
-            if from_unit == to_unit:
-                self.weight_result_var.set(f"{input_value} {from_unit} = {input_value} {to_unit}")
-                return
-            
-            # 首先将所有单位转换为克进行中间计算
-            if from_unit == "磅":
-                weight_in_grams = input_value * 453.59237
-            elif from_unit == "盎司":
-                weight_in_grams = input_value * 28.349523125
-            elif from_unit == "克":
-                weight_in_grams = input_value
-            elif from_unit == "千克":
-                weight_in_grams = input_value * 1000
-            else:
-                weight_in_grams = input_value  # 默认不转换
-            
-            # 然后将克转换为目标单位
-            if to_unit == "磅":
-                converted_weight = weight_in_grams / 453.59237
-            elif to_unit == "盎司":
-                converted_weight = weight_in_grams / 28.349523125
-            elif to_unit == "克":
-                converted_weight = weight_in_grams
-            elif to_unit == "千克":
-                converted_weight = weight_in_grams / 1000
-            else:
-                converted_weight = weight_in_grams  # 默认不转换
-            
-            # 根据单位决定保留的小数位数
-            if to_unit in ["磅", "千克"]:
-                result_str = f"{converted_weight:.6f}"
-            elif to_unit == "盎司":
-                result_str = f"{converted_weight:.4f}"
-            else:  # 克
-                result_str = f"{converted_weight:.2f}"
-            
-            # 去除末尾多余的零和小数点
-            result_str = result_str.rstrip('0').rstrip('.') if '.' in result_str else result_str
-            
-            # 更新结果显示
-            self.weight_result_var.set(f"{input_value} {from_unit} = {result_str} {to_unit}")
-            
-        except ValueError:
-            self.weight_result_var.set("错误：请输入有效的数字")
-        except Exception as e:
-            self.weight_result_var.set(f"转换错误：{str(e)}")
 
 import sys
 import logging
 import os
-import urllib.request
 
 
 
 
 
-# 自动联网功能，支持自动更新
-def ensure_internet_connection():
-    """
-    确保网络连接可用，支持自动更新功能
-    尝试连接多个常见URL，增加连接成功率
-    """
-    logging.info("正在检查网络连接...")
-    
-    # 尝试连接的URL列表，包括常用的稳定网站和更新服务器
-    test_urls = [
-        "https://www.baidu.com",  # 国内常用网站
-        "https://tomarens.xyz",  # 上传服务器地址
-        "https://example.com"     # 默认更新检查地址的域名
-    ]
-    
-    max_retries = 2  # 每个URL的最大重试次数
-    
-    for url in test_urls:
-        for attempt in range(max_retries + 1):
-            try:
-                # 发送HEAD请求，只获取响应头，不下载内容
-                req = urllib.request.Request(url, method='HEAD')
-                with urllib.request.urlopen(req, timeout=3) as response:
-                    if response.status == 200:
-                        logging.info(f"成功连接到 {url}")
-                        return True
-            except Exception as e:
-                logging.warning(f"连接到 {url} 失败（尝试 {attempt+1}/{max_retries+1}）: {str(e)}")
-                if attempt < max_retries:
-                    import time
-                    time.sleep(0.5)  # 短暂延迟后重试
-    
-    logging.error("所有网络连接尝试都失败了")
-    return False
-
 # 确保在打包为可执行文件时能够正确找到路径
 def resource_path(relative_path):
     """获取资源的绝对路径，支持PyInstaller打包"""
@@ -4946,17 +4197,15 @@ logging.basicConfig(
         logging.StreamHandler()
     ]
 )
+startup_profiler.checkpoint("加载主程序模块并配置日志")
 
 def run_app():
     try:
         logging.info("FBA配送费计算器启动")
         
-        # 自动确保网络连接，支持自动更新功能
-        if not ensure_internet_connection():
-            logging.warning("网络连接检查失败，将在后台继续尝试连接")
-        
         # 创建主窗口
         root = tk.Tk()
+        startup_profiler.checkpoint("创建主窗口")
         
         # 设置窗口标题和基本属性
         root.title("FBA配送费计算器")
@@ -4975,11 +4224,15 @@ def run_app():
         
         # 创建应用实例
         app = FBAShippingCalculator(root)
+        startup_profiler.checkpoint("创建主界面")
+        
+        # 启用启动耗时分析时，首次绘制后将报告写入日志
+        startup_profiler.report_on_first_paint(root)
         
-        # 窗口关闭时的处理
+        # 窗口关闭时的处理：交给应用实例保存设置、关闭历史记录数据库后再销毁窗口
         def on_closing():
             logging.info("用户关闭窗口")
-            root.destroy()
+            app.on_closing()
         
         root.protocol("WM_DELETE_WINDOW", on_closing)
         
@@ -5134,6 +4387,10 @@ def run_app():
             self.weight_result_var.set(f"转换错误：{str(e)}")
 
 if __name__ == "__main__":
+    # 打包后的程序在Windows上使用多进程批量计算时需要
+    import multiprocessing
+    multiprocessing.freeze_support()
+    
     # 修复在某些环境下的编码问题
     try:
         if hasattr(sys.stdout, 'encoding') and sys.stdout.encoding != 'utf-8' and hasattr(sys.stdout, 'reconfigure'):
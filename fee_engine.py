@@ -0,0 +1,652 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+FBA配送费计算引擎
+不依赖tkinter，可供GUI、批量处理和其他定价服务直接调用
+美国站和日本站的费率表以有序断点表保存，通过二分查找（bisect）定位适用费率
+计算结果以结构化的FeeQuote返回，计算步骤说明只在界面需要显示时由render_steps生成
+"""
+
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+from functools import lru_cache
+
+# 单位换算常量
+CM_PER_INCH = 2.54
+GRAMS_PER_LB = 453.592
+GRAMS_PER_OZ = 28.3495
+OZ_PER_LB = 16
+
+INF = float("inf")
+
+# 结构化计算结果：站点、尺寸分段、适用规则编号、费用、计算输入（字典）
+FeeQuote = namedtuple("FeeQuote", "site size_segment rule_id fee inputs")
+
+# ---------------------------------------------------------------------------
+# 美国站费率表
+# ---------------------------------------------------------------------------
+
+# 按重量线性计费的规则：基础费用 + (重量-起算重量) × 每单位数 × 单位费率
+LinearRate = namedtuple("LinearRate", "base start rate units_per_lb")
+
+# 单个尺寸分段的费率表：breaks为升序的重量上限（含），rules与之一一对应
+RateTable = namedtuple("RateTable", "unit breaks rules overflow")
+
+# 标准尺寸/大件的尺寸上限：(分段, 重量上限(盎司), 最长边, 次长边, 最短边, 长度+围长)，按顺序匹配
+US_STANDARD_TIERS = (
+    ("小号标准尺寸", 16, 15, 12, 0.75, INF),
+    ("大号标准尺寸", 320, 18, 14, 8, INF),
+    ("大号大件", 50 * OZ_PER_LB, 59, 33, 33, 130),
+)
+
+# 超大件的判定上限：最长边、次长边、最短边、长度+围长、重量(磅)
+US_OVERSIZE_LIMITS = (59, 33, 33, 130, 50)
+
+# 超大件按重量细分：bisect_right定位，断点重量归入下一档（含下限）
+US_OVERSIZE_BREAKS_LB = (50, 70, 150)
+US_OVERSIZE_TIERS = (
+    "超大件：0至50磅",
+    "超大件：50至70磅（含50磅）",
+    "超大件：70至150磅（含70磅）",
+    "超大件：150磅以上（含150磅）",
+)
+
+US_RATE_CARD = {
+    "小号标准尺寸": RateTable(
+        unit="oz",
+        breaks=(2, 4, 6, 8, 10, 12, 14, 16),
+        rules=(3.06, 3.15, 3.24, 3.33, 3.43, 3.53, 3.60, 3.65),
+        overflow="重量区间不匹配",
+    ),
+    "大号标准尺寸": RateTable(
+        unit="lb",
+        breaks=(0.25, 0.5, 0.75, 1, 1.25, 1.5, 1.75, 2, 2.25, 2.5, 2.75, 3, 20),
+        rules=(3.68, 3.90, 4.15, 4.55, 4.99, 5.37, 5.52, 5.77, 5.87, 6.05, 6.21, 6.62,
+               LinearRate(6.92, 3, 0.08, 4)),
+        overflow="超出重量范围",
+    ),
+    "大号大件": RateTable("lb", (INF,), (LinearRate(9.61, 0, 0.38, 1),), None),
+    US_OVERSIZE_TIERS[0]: RateTable("lb", (INF,), (LinearRate(26.33, 0, 0.38, 1),), None),
+    US_OVERSIZE_TIERS[1]: RateTable("lb", (INF,), (LinearRate(40.12, 50, 0.75, 1),), None),
+    US_OVERSIZE_TIERS[2]: RateTable("lb", (INF,), (LinearRate(54.81, 70, 0.75, 1),), None),
+    US_OVERSIZE_TIERS[3]: RateTable("lb", (INF,), (LinearRate(194.95, 150, 0.19, 1),), None),
+}
+
+US_UNKNOWN_SEGMENT_FEE = "无法计算配送费"
+
+# ---------------------------------------------------------------------------
+# 日本站费率表
+# ---------------------------------------------------------------------------
+
+# 日本站尺寸分段按最长边(厘米)划分
+JP_SIZE_BREAKS_CM = (35, 80, 120, 200)
+JP_SIZE_SEGMENTS = ("小号", "标准", "大件", "超大件", "超大件（超出200厘米）")
+
+# 单条费率：规则说明、价格超过1000日元的费用、价格不超过1000日元的费用
+JpFee = namedtuple("JpFee", "label over_1000 under_1000")
+
+# 断点表：breaks为升序上限（含），entries为JpFee、嵌套的JpBand或None（未匹配）
+JpBand = namedtuple("JpBand", "breaks entries")
+
+
+def _band(*pairs):
+    """由(上限, 条目)对构造断点表；最长边表以厘米为单位，重量表以克为单位"""
+    return JpBand(tuple(p[0] for p in pairs), tuple(p[1] for p in pairs))
+
+
+JP_RATE_CARD = {
+    # 冷冻商品
+    (True, "小号"): _band(
+        (INF, _band((250, JpFee("小号（≤250克）", 695, 647)))),
+    ),
+    (True, "标准"): _band(
+        (26, JpFee("标准尺寸-1（≤26厘米）", 867, 697)),
+        (32, JpFee("标准尺寸-2（≤32厘米）", 788, 723)),
+        (45, JpFee("标准尺寸-3（≤45厘米）", 830, 754)),
+        (60, JpFee("标准尺寸-4（≤60厘米）", 960, 874)),
+        (80, _band(
+            (2000, JpFee("标准尺寸-5（≤80厘米，≤2千克）", 898, 804)),
+            (2500, JpFee("标准尺寸-6（≤80厘米，≤2.5千克）", 987, 917)),
+            (3500, JpFee("标准尺寸-7（≤80厘米，≤3.5千克）", 1027, 941)),
+            (INF, JpFee("标准尺寸-8（≤80厘米，>3.5千克）", 1071, 941)),
+        )),
+    ),
+    (True, "大件"): _band(
+        (60, _band((2000, JpFee("大件-1（≤60厘米，≤2千克）", 984, 898)))),
+        (80, _band(
+            (2000, JpFee("大件-2（≤80厘米，≤2千克）", 990, 900)),
+            (5000, JpFee("大件-3（≤80厘米，≤5千克）", 1080, 983)),
+        )),
+        (100, JpFee("大件-4（≤100厘米）", 1153, 1041)),
+    ),
+    (True, "超大件"): _band(
+        (120, JpFee("超大件-1（≤120厘米）", 1559, 1434)),
+        (140, JpFee("超大件-2（≤140厘米）", 1925, 1760)),
+        (170, JpFee("超大件-3（≤170厘米）", 2760, 2600)),
+        (200, JpFee("超大件-4（≤200厘米）", 3720, 3500)),
+    ),
+    (True, "超大件（超出200厘米）"): _band(
+        (INF, JpFee("超大件（超出200厘米）", 4820, 4620)),
+    ),
+    # 非冷冻商品
+    (False, "小号"): _band(
+        (INF, _band((250, JpFee("小号（≤250克）", 630, 589)))),
+    ),
+    (False, "标准"): _band(
+        (26, JpFee("标准尺寸-1（≤26厘米）", 807, 677)),
+        (32, JpFee("标准尺寸-2（≤32厘米）", 781, 723)),
+        (45, JpFee("标准尺寸-3（≤45厘米）", 860, 784)),
+        (60, JpFee("标准尺寸-4（≤60厘米）", 994, 914)),
+        (80, JpFee("标准尺寸-5（≤80厘米，≤2千克）", 896, 801)),
+    ),
+    (False, "大件"): _band(
+        (60, JpFee("大件-1（≤60厘米，≤2千克）", 946, 886)),
+        (80, _band(
+            (2000, JpFee("大件-2（≤80厘米，≤2千克）", 963, 893)),
+            (5000, JpFee("大件-3（≤80厘米，≤5千克）", 1032, 933)),
+        )),
+        (100, JpFee("大件-4（≤100厘米）", 1052, 944)),
+        (120, _band((10000, JpFee("大件-5（≤120厘米，≤10千克）", 1285, 1101)))),
+    ),
+    (False, "超大件"): _band(
+        (140, JpFee("超大件-1（≤140厘米）", 1756, 1680)),
+        (170, JpFee("超大件-2（≤170厘米）", 2675, 2555)),
+        (200, _band(
+            (30000, JpFee("超大件-3（≤200厘米，≤30千克）", 3691, 3491)),
+            (40000, JpFee("超大件-4（≤200厘米，≤40千克）", 4650, 4450)),
+        )),
+    ),
+    (False, "超大件（超出200厘米）"): _band(
+        (INF, JpFee("超大件（超出200厘米）", 4820, 4620)),
+    ),
+}
+
+# 未匹配到任何规则时按重量兜底
+JP_FALLBACK_RATES = {
+    True: _band(
+        (2000, JpFee("默认费用（≤2千克）", 984, 898)),
+        (5000, JpFee("默认费用（≤5千克）", 1080, 983)),
+        (10000, JpFee("默认费用（≤10千克）", 1285, 1101)),
+        (INF, JpFee("默认费用（>10千克）", 1756, 1680)),
+    ),
+    False: _band(
+        (2000, JpFee("默认费用（≤2千克）", 946, 886)),
+        (5000, JpFee("默认费用（≤5千克）", 1032, 933)),
+        (10000, JpFee("默认费用（≤10千克）", 1285, 1101)),
+        (INF, JpFee("默认费用（>10千克）", 1756, 1680)),
+    ),
+}
+
+JP_OVERSIZE_NOTE = "超过200厘米或超过40千克的商品可能需要支付额外的尺寸费用"
+
+# 日本站计算说明中的固定提示
+JP_FROZEN_NOTES = (
+    "- 冷冻商品需使用温控包装，可能产生额外费用",
+    "- 部分冷冻食品可能受特殊处理费影响",
+    "- 对于需要温控包装的商品，如保温时间超过96小时，可能需支付额外费用",
+)
+JP_DISCLAIMER_NOTES = (
+    "- 对于危险商品和需要特殊处理的商品，可能适用不同的费用标准",
+    f"- {JP_OVERSIZE_NOTE}",
+    "- 实际费用可能因亚马逊政策调整而变化，请以亚马逊官网为准",
+    "- 冷冻商品可能产生额外的温控包装和处理费用",
+)
+
+
+# ---------------------------------------------------------------------------
+# 美国站
+# ---------------------------------------------------------------------------
+
+def determine_size_segment(max_len, mid_len, min_len, len_girth, weight_lb, weight_oz):
+    """
+    判断美国站的尺寸分段
+    参数:
+    - max_len/mid_len/min_len: 最长边/次长边/最短边(英寸)
+    - len_girth: 长度+围长(英寸)
+    - weight_lb/weight_oz: 重量(磅/盎司)
+    返回:
+    - 尺寸分段名称
+    """
+    max_limit, mid_limit, min_limit, girth_limit, weight_limit = US_OVERSIZE_LIMITS
+    oversized = (
+        max_len > max_limit or mid_len > mid_limit or min_len > min_limit
+        or len_girth > girth_limit or weight_lb > weight_limit
+    )
+    if not oversized:
+        for segment, oz_limit, max_l, mid_l, min_l, girth_l in US_STANDARD_TIERS:
+            if (weight_oz <= oz_limit and max_len <= max_l and mid_len <= mid_l
+                    and min_len <= min_l and len_girth <= girth_l):
+                return segment
+    return US_OVERSIZE_TIERS[bisect_right(US_OVERSIZE_BREAKS_LB, weight_lb)]
+
+
+def lookup_us_rate(size_segment, weight_lb):
+    """
+    在美国站费率表中定位适用规则
+    返回:
+    - (费率表, 规则序号, 查表用的重量)；分段未知时费率表为None，超出范围时规则序号为None
+    """
+    table = US_RATE_CARD.get(size_segment)
+    if table is None:
+        return None, None, weight_lb
+    weight = weight_lb * OZ_PER_LB if table.unit == "oz" else weight_lb
+    index = bisect_left(table.breaks, weight)
+    if index >= len(table.rules):
+        return table, None, weight
+    return table, index, weight
+
+
+def _apply_rule(rule, weight_lb):
+    """计算单条规则的费用"""
+    if isinstance(rule, LinearRate):
+        return round(rule.base + max(0, weight_lb - rule.start) * rule.units_per_lb * rule.rate, 2)
+    return rule
+
+
+def calculate_fee(size_segment, weight_lb):
+    """
+    计算美国站配送费(美元)
+    参数:
+    - size_segment: 尺寸分段
+    - weight_lb: 重量(磅)
+    返回:
+    - 费用；无法计算时返回说明文字（与原GUI行为一致）
+    """
+    table, index, _ = lookup_us_rate(size_segment, weight_lb)
+    if table is None:
+        return US_UNKNOWN_SEGMENT_FEE
+    if index is None:
+        return table.overflow
+    return _apply_rule(table.rules[index], weight_lb)
+
+
+def calculate_large_standard_fee_by_lb(weight_lb):
+    """大号标准尺寸按磅计算费用"""
+    return calculate_fee("大号标准尺寸", weight_lb)
+
+
+def _describe_us_rule(table, index, weight, weight_lb, fee):
+    """生成美国站规则的计算步骤说明"""
+    unit_name = "盎司" if table.unit == "oz" else "磅"
+    rule = table.rules[index]
+    if isinstance(rule, LinearRate):
+        additional_weight = max(0, weight_lb - rule.start)
+        if rule.units_per_lb == 1:
+            lines = [
+                f"   - 基础费用: ${rule.base:.2f}",
+                f"   - 超出{rule.start}磅部分每磅额外费用: ${rule.rate:.2f}" if rule.start else
+                f"   - 每磅额外费用: ${rule.rate:.2f}",
+            ]
+            if rule.start:
+                lines.append(f"   - 超出重量: {additional_weight:.2f} 磅")
+            lines.append(f"   - 计算公式: ${rule.base:.2f} + {additional_weight:.2f} 磅 × "
+                         f"${rule.rate:.2f}/磅 = ${fee:.2f}")
+            return lines
+        units = additional_weight * rule.units_per_lb
+        additional_fee = units * rule.rate
+        lower = table.breaks[index - 1] if index else 0
+        return [
+            f"   - 当前重量 {lower}磅 < {weight_lb:.2f} 磅 ≤ {table.breaks[index]}磅",
+            f"   - 基础费用: ${rule.base:.2f}",
+            f"   - 超出{rule.start}磅部分: {additional_weight:.2f} 磅",
+            f"   - 超出部分折合四分之一磅: {units:.2f} 个",
+            f"   - 每个四分之一磅费用: ${rule.rate:.2f}",
+            f"   - 超出部分费用: {units:.2f} × ${rule.rate:.2f} = ${additional_fee:.2f}",
+            f"   - 总费用: ${rule.base:.2f} + ${additional_fee:.2f} = ${fee:.2f}",
+        ]
+    upper = table.breaks[index]
+    if index == 0:
+        return [f"   - 当前重量 {weight:.2f} {unit_name} ≤ {upper}{unit_name}，适用费率: ${fee:.2f}"]
+    lower = table.breaks[index - 1]
+    return [f"   - 当前重量 {lower}{unit_name} < {weight:.2f} {unit_name} ≤ {upper}{unit_name}，"
+            f"适用费率: ${fee:.2f}"]
+
+
+def quote_fee(size_segment, weight_lb):
+    """
+    计算美国站配送费并返回结构化结果（不生成说明文字）
+    返回:
+    - FeeQuote；rule_id形如"us:大号标准尺寸:4"，分段未知为"us:unknown"，超出范围为"us:<分段>:overflow"
+    """
+    table, index, _ = lookup_us_rate(size_segment, weight_lb)
+    if table is None:
+        rule_id, fee = "us:unknown", US_UNKNOWN_SEGMENT_FEE
+    elif index is None:
+        rule_id, fee = f"us:{size_segment}:overflow", table.overflow
+    else:
+        rule_id, fee = f"us:{size_segment}:{index}", _apply_rule(table.rules[index], weight_lb)
+    return FeeQuote("us", size_segment, rule_id, fee, {'weight_lb': weight_lb})
+
+
+def _render_steps_us(quote):
+    """生成美国站的计算步骤说明"""
+    size_segment, fee, weight_lb = quote.size_segment, quote.fee, quote.inputs['weight_lb']
+    steps = [f"1. 根据尺寸分段 '{size_segment}' 计算费用"]
+    table, index, weight = lookup_us_rate(size_segment, weight_lb)
+    if table is None:
+        steps.append(f"   - 错误: 无法识别的尺寸分段 '{size_segment}'")
+    else:
+        unit_name = "盎司" if table.unit == "oz" else "磅"
+        steps.append(f"   - {size_segment}费用计算规则（按{unit_name}）:")
+        if index is None:
+            steps.append(f"   - 错误: {weight:.2f} {unit_name}超出{size_segment}重量范围")
+        else:
+            steps.extend(_describe_us_rule(table, index, weight, weight_lb, fee))
+    steps.append(f"\n2. 最终配送费用: ${fee}")
+    return "\n".join(steps)
+
+
+def calculate_fee_with_steps(size_segment, weight_lb):
+    """
+    计算美国站配送费用并返回详细计算过程
+    返回:
+    - (费用, 计算步骤文本)
+    """
+    quote = quote_fee(size_segment, weight_lb)
+    return quote.fee, render_steps(quote)
+
+
+def to_us_units(weight_g, length_cm, width_cm, height_cm):
+    """
+    将公制输入转换为美国站计算所需的英制单位
+    返回:
+    - (最长边, 次长边, 最短边, 长度+围长, 重量磅, 重量盎司)
+    """
+    max_len_in = length_cm / CM_PER_INCH
+    mid_len_in = width_cm / CM_PER_INCH
+    min_len_in = height_cm / CM_PER_INCH
+    weight_lb = weight_g / GRAMS_PER_LB
+    weight_oz = weight_g / GRAMS_PER_OZ
+    len_girth = max_len_in + 2 * (mid_len_in + min_len_in)
+    return max_len_in, mid_len_in, min_len_in, len_girth, weight_lb, weight_oz
+
+
+def calculate_fba_fee(weight_g, length_cm, width_cm, height_cm):
+    """
+    按公制输入计算美国站FBA费用
+    参数:
+    - weight_g: 重量(克)
+    - length_cm/width_cm/height_cm: 最长边/次长边/最短边(厘米)
+    返回:
+    - 包含尺寸分段、重量显示、围长显示和费用的字典
+    """
+    max_len_in, mid_len_in, min_len_in, len_girth, weight_lb, weight_oz = to_us_units(
+        weight_g, length_cm, width_cm, height_cm
+    )
+    size_segment = determine_size_segment(
+        max_len_in, mid_len_in, min_len_in, len_girth, weight_lb, weight_oz
+    )
+    return {
+        'size_tier': size_segment,
+        'weight_display': f"{weight_lb:.2f} 磅 / {weight_oz:.2f} 盎司",
+        'girth_display': f"{len_girth:.2f} 英寸",
+        'fee': calculate_fee(size_segment, weight_lb),
+    }
+
+
+# ---------------------------------------------------------------------------
+# 日本站
+# ---------------------------------------------------------------------------
+
+def determine_size_segment_jp(max_len_cm):
+    """
+    判断日本站的尺寸分段（按最长边）
+    参数:
+    - max_len_cm: 最长边(厘米)
+    返回:
+    - 尺寸分段名称
+    """
+    return JP_SIZE_SEGMENTS[bisect_left(JP_SIZE_BREAKS_CM, max_len_cm)]
+
+
+def _resolve_band(band, value, weight_g):
+    """在断点表中查找，嵌套表按重量继续查找；未匹配返回None"""
+    index = bisect_left(band.breaks, value)
+    if index >= len(band.entries):
+        return None
+    entry = band.entries[index]
+    if isinstance(entry, JpBand):
+        return _resolve_band(entry, weight_g, weight_g)
+    return entry
+
+
+def lookup_jp_rate(size_segment, max_len_cm, weight_g, is_frozen=False):
+    """
+    在日本站费率表中定位适用规则
+    返回:
+    - (JpFee, 是否为兜底规则)
+    """
+    band = JP_RATE_CARD.get((bool(is_frozen), size_segment))
+    rule = _resolve_band(band, max_len_cm, weight_g) if band is not None else None
+    if rule is not None:
+        return rule, False
+    return _resolve_band(JP_FALLBACK_RATES[bool(is_frozen)], weight_g, weight_g), True
+
+
+def calculate_fee_jp(size_segment, max_len_cm, weight_g, price_over_1000, is_frozen=False):
+    """
+    计算日本站配送费(日元)
+    参数:
+    - size_segment: 尺寸分段
+    - max_len_cm: 最长边(厘米)
+    - weight_g: 重量(克)
+    - price_over_1000: 价格是否超过1000日元
+    - is_frozen: 是否为冷冻商品
+    """
+    rule, _ = lookup_jp_rate(size_segment, max_len_cm, weight_g, is_frozen)
+    return rule.over_1000 if price_over_1000 else rule.under_1000
+
+
+def quote_fee_jp(size_segment, max_len_cm, weight_g, price_over_1000, is_frozen=False):
+    """
+    计算日本站配送费并返回结构化结果（不生成说明文字）
+    返回:
+    - FeeQuote；rule_id形如"jp:standard:标准:≤2千克"，未匹配分段时使用兜底规则"jp:frozen:fallback:..."
+    """
+    rule, is_fallback = lookup_jp_rate(size_segment, max_len_cm, weight_g, is_frozen)
+    rule_id = f"jp:{'frozen' if is_frozen else 'standard'}:{'fallback' if is_fallback else size_segment}:{rule.label}"
+    return FeeQuote("jp", size_segment, rule_id, rule.over_1000 if price_over_1000 else rule.under_1000, {
+        'max_len_cm': max_len_cm,
+        'weight_g': weight_g,
+        'price_over_1000': price_over_1000,
+        'is_frozen': is_frozen,
+    })
+
+
+def _render_steps_jp(quote):
+    """生成日本站的计算步骤说明"""
+    size_segment, fee = quote.size_segment, quote.fee
+    max_len_cm = quote.inputs['max_len_cm']
+    weight_g = quote.inputs['weight_g']
+    price_over_1000 = quote.inputs['price_over_1000']
+    is_frozen = quote.inputs['is_frozen']
+    weight_kg = weight_g / 1000
+    rule, is_fallback = lookup_jp_rate(size_segment, max_len_cm, weight_g, is_frozen)
+    goods_type = "冷冻商品" if is_frozen else "非冷冻商品"
+
+    steps = [
+        "===== 日本站FBA配送费计算 =====",
+        f"1. 根据尺寸分段 '{size_segment}' 计算费用",
+        f"2. 商品价格{'超过' if price_over_1000 else '不超过'}1000日元",
+        f"3. 商品重量: {weight_g} 克 ({weight_kg:.2f} 千克)",
+        f"4. 商品最长边: {max_len_cm} 厘米",
+        f"5. 商品类型: {goods_type}",
+        f"6. 使用价格{'超过' if price_over_1000 else '不超过'}1000日元的费用标准",
+        f"7. {goods_type}{'' if is_fallback else '-'}{rule.label}: {fee} 日元",
+    ]
+    if size_segment == JP_SIZE_SEGMENTS[-1]:
+        steps.append(f"注意：{JP_OVERSIZE_NOTE}")
+    steps.append(f"8. 最终配送费: {fee} 日元")
+    steps.append("\n注：所有费用包含10%的燃油附加费")
+
+    if is_frozen:
+        steps.append("\n冷冻商品特别说明：")
+        steps.extend(JP_FROZEN_NOTES)
+
+    steps.append("\n注：本计算基于2025年最新的亚马逊日本站FBA配送费标准（6.1日本站FBA费用计算模块）")
+    steps.append("\n特别说明：")
+    steps.extend(JP_DISCLAIMER_NOTES)
+
+    return "\n".join(steps)
+
+
+def calculate_fee_with_steps_jp(size_segment, max_len_cm, weight_g, price_over_1000, is_frozen=False):
+    """
+    计算日本站FBA配送费用并返回详细计算过程
+    返回:
+    - (费用, 计算步骤文本)
+    """
+    quote = quote_fee_jp(size_segment, max_len_cm, weight_g, price_over_1000, is_frozen)
+    return quote.fee, render_steps(quote)
+
+
+def render_steps(quote):
+    """
+    根据结构化结果生成可读的计算步骤说明（仅在界面显示时调用）
+    参数:
+    - quote: quote_fee或quote_fee_jp返回的FeeQuote
+    返回:
+    - 计算步骤文本
+    """
+    if quote.site == "jp":
+        return _render_steps_jp(quote)
+    return _render_steps_us(quote)
+
+
+# ---------------------------------------------------------------------------
+# 批量（向量化）计算
+# ---------------------------------------------------------------------------
+
+# 批量计算结果中分段编号与名称的对应关系
+US_SEGMENT_NAMES = tuple(t[0] for t in US_STANDARD_TIERS) + US_OVERSIZE_TIERS
+
+
+def calculate_fba_fees(weight_g, length_cm, width_cm, height_cm):
+    """
+    使用NumPy向量化批量计算美国站FBA费用（需要安装numpy）
+    参数:
+    - weight_g: 重量(克)数组
+    - length_cm/width_cm/height_cm: 最长边/次长边/最短边(厘米)数组
+    返回:
+    - 字典，包含以下等长数组：
+      size_tier(分段名称)、segment_code(分段编号，对应US_SEGMENT_NAMES)、
+      weight_lb、weight_oz、len_girth、fee(无法计算时为NaN)
+    """
+    import numpy as np
+
+    weight_g = np.asarray(weight_g, dtype=float)
+    max_len = np.asarray(length_cm, dtype=float) / CM_PER_INCH
+    mid_len = np.asarray(width_cm, dtype=float) / CM_PER_INCH
+    min_len = np.asarray(height_cm, dtype=float) / CM_PER_INCH
+    weight_lb = weight_g / GRAMS_PER_LB
+    weight_oz = weight_g / GRAMS_PER_OZ
+    len_girth = max_len + 2 * (mid_len + min_len)
+
+    # 先按重量给出超大件细分，再用标准尺寸/大件的掩码覆盖
+    standard_count = len(US_STANDARD_TIERS)
+    codes = standard_count + np.searchsorted(US_OVERSIZE_BREAKS_LB, weight_lb, side='right')
+
+    max_limit, mid_limit, min_limit, girth_limit, weight_limit = US_OVERSIZE_LIMITS
+    oversized = ((max_len > max_limit) | (mid_len > mid_limit) | (min_len > min_limit)
+                 | (len_girth > girth_limit) | (weight_lb > weight_limit))
+    unassigned = ~oversized
+    for code, (_, oz_limit, max_l, mid_l, min_l, girth_l) in enumerate(US_STANDARD_TIERS):
+        mask = (unassigned & (weight_oz <= oz_limit) & (max_len <= max_l) & (mid_len <= mid_l)
+                & (min_len <= min_l) & (len_girth <= girth_l))
+        codes[mask] = code
+        unassigned &= ~mask
+
+    fee = np.full(weight_g.shape, np.nan)
+    for code, segment in enumerate(US_SEGMENT_NAMES):
+        mask = codes == code
+        if not mask.any():
+            continue
+        table = US_RATE_CARD[segment]
+        lb = weight_lb[mask]
+        weight = lb * OZ_PER_LB if table.unit == "oz" else lb
+        index = np.searchsorted(table.breaks, weight, side='left')
+        segment_fee = np.full(lb.shape, np.nan)
+        for rule_index, rule in enumerate(table.rules):
+            hit = index == rule_index
+            if isinstance(rule, LinearRate):
+                extra = np.maximum(0, lb[hit] - rule.start) * rule.units_per_lb * rule.rate
+                # np.round与内置round在.5附近的舍入结果不同，逐个使用内置round保证与逐条计算一致
+                segment_fee[hit] = [round(value, 2) for value in (rule.base + extra).tolist()]
+            else:
+                segment_fee[hit] = rule
+        fee[mask] = segment_fee
+
+    return {
+        'size_tier': np.asarray(US_SEGMENT_NAMES, dtype=object)[codes],
+        'segment_code': codes,
+        'weight_lb': weight_lb,
+        'weight_oz': weight_oz,
+        'len_girth': len_girth,
+        'fee': fee,
+    }
+
+
+# ---------------------------------------------------------------------------
+# 费用缓存（批量计算中大量重复的包装规格直接复用结果）
+# ---------------------------------------------------------------------------
+
+# 缓存的最大条目数
+FEE_CACHE_SIZE = 65536
+
+
+@lru_cache(maxsize=FEE_CACHE_SIZE)
+def _cached_fee(site, weight_g, length_cm, width_cm, height_cm, price_over_1000, is_frozen):
+    """按输入计算费用；美国站返回calculate_fba_fee的字段元组，日本站返回(尺寸分段, 费用)"""
+    if site == 'jp':
+        max_len_cm = max(length_cm, width_cm, height_cm)
+        size_segment = determine_size_segment_jp(max_len_cm)
+        return size_segment, calculate_fee_jp(size_segment, max_len_cm, weight_g, price_over_1000, is_frozen)
+
+    result = calculate_fba_fee(weight_g, length_cm, width_cm, height_cm)
+    return result['size_tier'], result['weight_display'], result['girth_display'], result['fee']
+
+
+def _cache_key(weight_g, length_cm, width_cm, height_cm):
+    """
+    生成缓存键：使用原始输入的浮点值，不做舍入
+    （舍入后的值可能跨过重量或尺寸分段的临界点，导致费用与逐条计算不一致）
+    """
+    return float(weight_g), float(length_cm), float(width_cm), float(height_cm)
+
+
+def calculate_fba_fee_cached(weight_g, length_cm, width_cm, height_cm):
+    """
+    带缓存的calculate_fba_fee，输入完全相同的规格直接返回缓存结果
+    返回:
+    - 与calculate_fba_fee相同结构的新字典
+    """
+    size_tier, weight_display, girth_display, fee = _cached_fee(
+        'us', *_cache_key(weight_g, length_cm, width_cm, height_cm), True, False
+    )
+    return {
+        'size_tier': size_tier,
+        'weight_display': weight_display,
+        'girth_display': girth_display,
+        'fee': fee,
+    }
+
+
+def calculate_fee_jp_cached(weight_g, length_cm, width_cm, height_cm, price_over_1000=True, is_frozen=False):
+    """
+    带缓存的日本站费用计算，以三边中的最大值判断尺寸分段
+    返回:
+    - (尺寸分段, 费用)
+    """
+    return _cached_fee(
+        'jp', *_cache_key(weight_g, length_cm, width_cm, height_cm), bool(price_over_1000), bool(is_frozen)
+    )
+
+
+def fee_cache_info():
+    """返回费用缓存的命中/未命中统计（functools的CacheInfo）"""
+    return _cached_fee.cache_info()
+
+
+def fee_cache_clear():
+    """清空费用缓存及统计"""
+    _cached_fee.cache_clear()
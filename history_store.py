@@ -0,0 +1,296 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+FBA配送费计算历史记录
+内存中用定长deque保留最近的记录，同时将每条记录追加写入本地SQLite日志，重启后历史记录不丢失
+日志表在时间、站点、尺寸分段和费用上建有索引，支持按条件筛选和分页查询
+记录可逐条导出为CSV、XLSX或JSON Lines文件
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import sys
+from collections import deque
+from datetime import datetime
+
+import batch_engine
+
+# 内存中保留的最近记录条数（可通过设置中的history_size修改）
+DEFAULT_HISTORY_SIZE = 100
+
+# 历史记录数据库文件名
+HISTORY_DB_FILE = "calculation_history.db"
+
+# 分页查询的默认每页条数
+DEFAULT_PAGE_SIZE = 50
+
+# 导出文件的列：(记录字段, 列名)，美国站和日本站的记录合并在同一组列中
+EXPORT_COLUMNS = [
+    ('timestamp', '时间'),
+    ('site', '站点'),
+    ('size_segment', '尺寸分段'),
+    ('shipping_fee', '配送费'),
+    ('max_len', '最长边'),
+    ('mid_len', '次长边'),
+    ('min_len', '最短边'),
+    ('weight', '重量'),
+    ('weight_unit', '重量单位'),
+    ('len_girth', '长度+围长'),
+    ('total_size', '总尺寸'),
+    ('price_over_1000', '售价超过1000日元'),
+    ('is_frozen', '冷冻商品'),
+    ('rule_id', '计费规则'),
+]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS calculations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    site TEXT NOT NULL,
+    size_segment TEXT,
+    shipping_fee REAL,
+    record TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_calculations_timestamp ON calculations (timestamp);
+CREATE INDEX IF NOT EXISTS idx_calculations_site ON calculations (site);
+CREATE INDEX IF NOT EXISTS idx_calculations_size_segment ON calculations (size_segment);
+CREATE INDEX IF NOT EXISTS idx_calculations_shipping_fee ON calculations (shipping_fee);
+"""
+
+
+def app_data_path(filename):
+    """返回程序目录下的文件路径（打包后为可执行文件所在目录）"""
+    if getattr(sys, 'frozen', False):
+        base_dir = os.path.dirname(os.path.abspath(sys.executable))
+    else:
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(base_dir, filename)
+
+
+def _encode_record(record):
+    """将记录序列化为JSON（datetime保存为ISO格式字符串）"""
+    return json.dumps(record, ensure_ascii=False, default=lambda value: value.isoformat())
+
+
+def _decode_record(text):
+    """从JSON还原记录"""
+    record = json.loads(text)
+    if isinstance(record.get('timestamp'), str):
+        try:
+            record['timestamp'] = datetime.fromisoformat(record['timestamp'])
+        except ValueError:
+            pass
+    return record
+
+
+def _export_row(record):
+    """将一条计算记录转换为导出行（列名为中文，时间精确到秒）"""
+    row = {}
+    for key, label in EXPORT_COLUMNS:
+        value = record.get(key, '')
+        if isinstance(value, datetime):
+            value = value.strftime("%Y-%m-%d %H:%M:%S")
+        row[label] = value
+    return row
+
+
+def export_records(records, path):
+    """
+    逐条导出计算记录，不把全部记录载入内存
+
+    参数:
+        records: 记录字典的可迭代对象（如当前结果的列表或iter_all()）
+        path: 导出文件路径，按扩展名选择格式（.xlsx/.jsonl/其他为CSV）
+
+    返回:
+        导出的记录条数
+    """
+    count = 0
+    with batch_engine.open_result_writer(path, [label for _, label in EXPORT_COLUMNS]) as writer:
+        writer.writeheader()
+        for record in records:
+            writer.writerow(_export_row(record))
+            count += 1
+    return count
+
+
+class CalculationHistory:
+    """
+    计算历史记录：最近的记录保存在定长deque中供界面使用，全部记录追加写入SQLite日志
+
+    参数:
+        db_path: 数据库文件路径，为None时只保存在内存中
+        maxlen: 内存中保留的最近记录条数
+    """
+
+    def __init__(self, db_path=None, maxlen=DEFAULT_HISTORY_SIZE):
+        self.recent = deque(maxlen=maxlen)
+        self._conn = None
+
+        if db_path is None:
+            return
+        try:
+            self._conn = sqlite3.connect(db_path)
+            self._conn.executescript(_SCHEMA)
+            self._conn.commit()
+
+            # 载入最近的记录
+            rows = self._conn.execute(
+                "SELECT record FROM calculations ORDER BY id DESC LIMIT ?", (maxlen,)
+            ).fetchall()
+            self.recent.extend(_decode_record(row[0]) for row in reversed(rows))
+        except sqlite3.Error as e:
+            # 数据库不可用时退化为只在内存中保存
+            logging.warning(f"无法打开历史记录数据库 {db_path}: {e}")
+            self._conn = None
+
+    def __len__(self):
+        return len(self.recent)
+
+    def __iter__(self):
+        return iter(self.recent)
+
+    def copy(self):
+        """返回最近记录的列表副本"""
+        return list(self.recent)
+
+    def append(self, record):
+        """添加一条记录：放入内存并追加写入日志"""
+        self.recent.append(record)
+        if self._conn is None:
+            return
+
+        fee = record.get('shipping_fee')
+        try:
+            timestamp = record.get('timestamp') or datetime.now()
+            self._conn.execute(
+                "INSERT INTO calculations (timestamp, site, size_segment, shipping_fee, record) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (
+                    timestamp.isoformat() if isinstance(timestamp, datetime) else str(timestamp),
+                    record.get('site', ''),
+                    record.get('size_segment'),
+                    # 无法计算时费用为说明文字，不写入数值列
+                    fee if isinstance(fee, (int, float)) else None,
+                    _encode_record(record),
+                )
+            )
+            self._conn.commit()
+        except sqlite3.Error as e:
+            logging.warning(f"写入历史记录失败: {e}")
+
+    def iter_all(self):
+        """
+        按时间顺序逐条读取日志中的全部记录（不一次性载入内存）
+
+        返回:
+            记录字典的生成器；没有数据库时返回内存中的最近记录
+        """
+        if self._conn is None:
+            yield from list(self.recent)
+            return
+        cursor = self._conn.execute("SELECT record FROM calculations ORDER BY id")
+        for row in cursor:
+            yield _decode_record(row[0])
+
+    @staticmethod
+    def _build_filters(site=None, size_segment=None, start=None, end=None, min_fee=None, max_fee=None):
+        """将筛选条件转换为WHERE子句和参数"""
+        conditions = []
+        params = []
+        if site:
+            conditions.append("site = ?")
+            params.append(site)
+        if size_segment:
+            conditions.append("size_segment = ?")
+            params.append(size_segment)
+        if start is not None:
+            conditions.append("timestamp >= ?")
+            params.append(start.isoformat())
+        if end is not None:
+            conditions.append("timestamp < ?")
+            params.append(end.isoformat())
+        if min_fee is not None:
+            conditions.append("shipping_fee >= ?")
+            params.append(min_fee)
+        if max_fee is not None:
+            conditions.append("shipping_fee <= ?")
+            params.append(max_fee)
+        return conditions, params
+
+    def query(self, site=None, size_segment=None, start=None, end=None, min_fee=None, max_fee=None,
+              before_id=None, limit=DEFAULT_PAGE_SIZE):
+        """
+        按条件分页查询日志中的记录，按时间倒序排列
+
+        分页使用记录id定位（keyset分页），翻页代价与页码无关
+
+        参数:
+            site: 站点（'us'或'jp'）
+            size_segment: 尺寸分段
+            start: 开始时间（含），datetime
+            end: 结束时间（不含），datetime
+            min_fee/max_fee: 费用范围（含），无法计算费用的记录不参与费用筛选
+            before_id: 上一页最后一条记录的id，为None时返回第一页
+            limit: 每页条数
+
+        返回:
+            [(记录id, 记录字典), ...]；没有数据库时返回空列表
+        """
+        if self._conn is None:
+            return []
+
+        conditions, params = self._build_filters(site, size_segment, start, end, min_fee, max_fee)
+        if before_id is not None:
+            conditions.append("id < ?")
+            params.append(before_id)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        rows = self._conn.execute(
+            f"SELECT id, record FROM calculations {where} ORDER BY id DESC LIMIT ?", params + [limit]
+        ).fetchall()
+        return [(row_id, _decode_record(record)) for row_id, record in rows]
+
+    def count(self, site=None, size_segment=None, start=None, end=None, min_fee=None, max_fee=None):
+        """统计满足条件的记录数，参数同query"""
+        if self._conn is None:
+            return 0
+        conditions, params = self._build_filters(site, size_segment, start, end, min_fee, max_fee)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return self._conn.execute(f"SELECT COUNT(*) FROM calculations {where}", params).fetchone()[0]
+
+    def size_segments(self, site=None):
+        """返回日志中出现过的尺寸分段（用于筛选下拉框）"""
+        if self._conn is None:
+            return []
+        if site:
+            rows = self._conn.execute(
+                "SELECT DISTINCT size_segment FROM calculations WHERE site = ? ORDER BY size_segment", (site,)
+            )
+        else:
+            rows = self._conn.execute("SELECT DISTINCT size_segment FROM calculations ORDER BY size_segment")
+        return [row[0] for row in rows if row[0]]
+
+    def count_all(self):
+        """日志中的记录总数"""
+        if self._conn is None:
+            return len(self.recent)
+        return self._conn.execute("SELECT COUNT(*) FROM calculations").fetchone()[0]
+
+    def clear(self):
+        """清空内存中的记录和日志"""
+        self.recent.clear()
+        if self._conn is not None:
+            try:
+                self._conn.execute("DELETE FROM calculations")
+                self._conn.commit()
+            except sqlite3.Error as e:
+                logging.warning(f"清空历史记录失败: {e}")
+
+    def close(self):
+        """关闭数据库连接"""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
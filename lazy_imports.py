@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+可选依赖的延迟导入
+openpyxl等较重的库不在启动时导入：第一次处理Excel文件时才加载，
+界面空闲后也可以在后台线程中提前加载，使第一次Excel操作不必等待导入
+"""
+
+import importlib
+import importlib.util
+import logging
+import threading
+import time
+
+# Excel读写需要的可选依赖
+EXCEL_MODULES = ("openpyxl",)
+
+_lock = threading.Lock()
+_available = {}  # 模块名 -> 是否已安装
+_preload_thread = None
+
+
+def is_available(name):
+    """检查可选依赖是否已安装（只查找模块，不导入）"""
+    with _lock:
+        if name not in _available:
+            _available[name] = importlib.util.find_spec(name) is not None
+        return _available[name]
+
+
+def load(name):
+    """
+    导入可选依赖，已导入时直接返回
+
+    参数:
+        name: 模块名
+
+    返回:
+        模块对象；未安装时返回None
+    """
+    if not is_available(name):
+        return None
+    try:
+        return importlib.import_module(name)
+    except ImportError as e:
+        logging.warning(f"导入 {name} 失败: {e}")
+        with _lock:
+            _available[name] = False
+        return None
+
+
+def preload(names=EXCEL_MODULES):
+    """依次导入指定的可选依赖（未安装的跳过）"""
+    for name in names:
+        started = time.perf_counter()
+        if load(name) is not None:
+            logging.info(f"已预加载 {name}，耗时 {(time.perf_counter() - started) * 1000:.0f} 毫秒")
+
+
+def preload_in_background(names=EXCEL_MODULES):
+    """
+    在后台线程中预加载可选依赖，重复调用时只启动一个线程
+
+    返回:
+        后台线程对象
+    """
+    global _preload_thread
+    with _lock:
+        if _preload_thread is None:
+            _preload_thread = threading.Thread(target=preload, args=(names,), daemon=True)
+            _preload_thread.start()
+        return _preload_thread
@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+可断点续传的文件下载
+下载内容先写入 .part 文件，连接中断后使用HTTP Range请求从已下载的位置继续，
+并用ETag/Last-Modified（If-Range）确认服务器上的文件没有变化；下载完成后才替换为目标文件
+"""
+
+import json
+import logging
+import os
+import re
+import time
+import urllib.error
+import urllib.request
+
+CHUNK_SIZE = 64 * 1024  # 每次读取的字节数
+DEFAULT_TIMEOUT = 30  # 连接和读取超时（秒）
+DEFAULT_RETRIES = 5  # 连接中断后的最大重试次数
+RETRY_DELAY = 2  # 重试前的等待时间（秒）
+
+_CONTENT_RANGE = re.compile(r"bytes\s+(\d+)-(\d+)/(\d+|\*)")
+
+
+def _load_state(state_path, url):
+    """读取未完成下载的校验信息（ETag/Last-Modified），URL不同时视为无效"""
+    try:
+        with open(state_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        if state.get('url') == url:
+            return state
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def _save_state(state_path, url, response):
+    state = {
+        'url': url,
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+    }
+    with open(state_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    return state
+
+
+def _discard(*paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def download_file(url, dest_path, progress_callback=None, retries=DEFAULT_RETRIES, timeout=DEFAULT_TIMEOUT):
+    """
+    下载文件，支持断点续传
+
+    参数:
+        url: 下载地址
+        dest_path: 保存路径
+        progress_callback: 进度回调，参数为(已下载字节数, 总字节数)，总字节数未知时为None
+        retries: 连接中断后的最大重试次数
+        timeout: 连接和读取超时（秒）
+
+    返回:
+        保存路径
+
+    异常:
+        urllib.error.URLError / OSError: 重试后仍无法完成下载
+    """
+    part_path = dest_path + ".part"
+    state_path = part_path + ".json"
+
+    attempt = 0
+    while True:
+        state = _load_state(state_path, url)
+        offset = os.path.getsize(part_path) if state and os.path.exists(part_path) else 0
+        validator = state and (state.get('etag') or state.get('last_modified'))
+        if offset and not validator:
+            # 没有校验信息时无法确认文件未变化，重新下载
+            offset = 0
+
+        request = urllib.request.Request(url)
+        if offset:
+            request.add_header('Range', f'bytes={offset}-')
+            request.add_header('If-Range', validator)
+
+        try:
+            try:
+                response = urllib.request.urlopen(request, timeout=timeout)
+            except urllib.error.HTTPError as e:
+                if e.code != 416 or not offset:
+                    raise
+                # 请求的起始位置超出文件大小：已下载完整或服务器上的文件已变小
+                match = re.search(r"/(\d+)", e.headers.get('Content-Range', ''))
+                e.close()
+                if match and int(match.group(1)) == offset:
+                    break
+                _discard(part_path, state_path)
+                continue
+
+            with response:
+                content_range = _CONTENT_RANGE.match(response.headers.get('Content-Range', ''))
+                if response.status == 206 and content_range and int(content_range.group(1)) == offset:
+                    # 服务器从断点继续发送
+                    total = None if content_range.group(3) == '*' else int(content_range.group(3))
+                    mode = 'ab'
+                    logging.info(f"从 {offset} 字节处继续下载 {url}")
+                elif response.status == 206:
+                    # 返回的范围与请求不符，无法拼接，丢弃已下载部分后重新下载
+                    _discard(part_path, state_path)
+                    continue
+                else:
+                    # 服务器返回完整文件（不支持Range或文件已变化），从头下载
+                    length = response.headers.get('Content-Length')
+                    total = int(length) if length else None
+                    offset = 0
+                    mode = 'wb'
+                    _save_state(state_path, url, response)
+
+                downloaded = offset
+                with open(part_path, mode) as f:
+                    while True:
+                        chunk = response.read(CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        f.write(chunk)
+                        downloaded += len(chunk)
+                        if progress_callback:
+                            progress_callback(downloaded, total)
+
+            if total is not None and downloaded < total:
+                raise urllib.error.URLError(f"连接中断，已下载 {downloaded}/{total} 字节")
+            break
+
+        except (urllib.error.URLError, OSError) as e:
+            if isinstance(e, urllib.error.HTTPError) or attempt >= retries:
+                raise
+            attempt += 1
+            logging.warning(f"下载中断（重试 {attempt}/{retries}）: {e}")
+            time.sleep(RETRY_DELAY)
+
+    os.replace(part_path, dest_path)
+    _discard(state_path)
+    return dest_path
@@ -14,7 +14,16 @@ import time
 import subprocess
 import threading
 import ssl
+import re
+import json
+import hashlib
+import socket
+import queue
+import logging
+import logging.handlers
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from email.utils import formatdate
 
 # 服务器配置
 PORT = 8081
@@ -35,24 +44,373 @@ USE_HTTPS = False
 if len(sys.argv) > 1 and sys.argv[1] == "--https":
     USE_HTTPS = True
 
+def get_int_option(name, default):
+    """读取命令行参数中的整数选项（--name N 或 --name=N），未指定或格式错误时返回默认值"""
+    for index, arg in enumerate(sys.argv):
+        try:
+            if arg == name and index + 1 < len(sys.argv):
+                return int(sys.argv[index + 1])
+            if arg.startswith(name + "="):
+                return int(arg.split("=", 1)[1])
+        except ValueError:
+            print(f"警告: 参数 {name} 的值无效，使用默认值 {default}")
+    return default
+
+# 并发配置：同时处理请求的工作线程数，以及同时保持的最大连接数（超出时返回503）
+MAX_WORKERS = get_int_option("--max-workers", 32)
+MAX_CONNECTIONS = get_int_option("--max-connections", 256)
+# 等待accept的连接队列长度，发布新版本时大量客户端会同时请求update_info.json
+LISTEN_BACKLOG = 128
+# 单个连接读写的超时时间（秒），避免慢速或断开的客户端长期占用工作线程
+CONNECTION_TIMEOUT = 60
+# HTTPS连接无法使用sendfile零拷贝发送文件，改为按此大小分块读取发送（字节）
+SENDFILE_FALLBACK_BUFFER_SIZE = 1024 * 1024
+
+# Range请求头中的位置：空或ASCII数字
+_RANGE_NUMBER = re.compile(r'[0-9]*')
+
+def parse_byte_range(header, size):
+    """
+    解析Range请求头，只支持单个字节范围（bytes=起始-结束、bytes=起始-、bytes=-末尾长度）
+
+    参数:
+        header: Range请求头的值
+        size: 文件大小（字节）
+
+    返回:
+        (起始位置, 结束位置)，均包含在内；请求头格式不支持时返回None，按完整文件响应
+
+    异常:
+        ValueError: 范围超出文件大小，应返回416
+    """
+    if not header or not header.startswith('bytes='):
+        return None
+    spec = header[len('bytes='):].strip()
+    if ',' in spec or '-' not in spec:
+        return None
+    first, last = (part.strip() for part in spec.split('-', 1))
+    # 只接受ASCII数字（str.isdigit会把'²'等Unicode数字也当作数字）
+    if not _RANGE_NUMBER.fullmatch(first) or not _RANGE_NUMBER.fullmatch(last) or first == last == '':
+        return None
+
+    if first == '':
+        # 末尾若干字节
+        length = int(last)
+        if length == 0 or size == 0:
+            raise ValueError("请求的范围无效")
+        return max(size - length, 0), size - 1
+
+    start = int(first)
+    end = size - 1 if last == '' else min(int(last), size - 1)
+    if last != '' and int(last) < start:
+        return None
+    if start >= size:
+        raise ValueError("请求的范围超出文件大小")
+    return start, end
+
+# 访问日志：请求线程只把记录放入队列，由后台线程批量写入控制台和日志文件
+ACCESS_LOG_FILE = 'update_server.log'
+# 日志文件超过此大小时轮转，保留的旧日志文件数量（update_server.log.1 ~ .N）
+ACCESS_LOG_MAX_BYTES = 10 * 1024 * 1024
+ACCESS_LOG_BACKUP_COUNT = 5
+# 队列中暂无新记录或累计写入此条数时才刷新到磁盘
+ACCESS_LOG_FLUSH_BATCH = 256
+# 使用 --log-json 参数启动时日志文件每行为一条JSON记录，便于分析
+ACCESS_LOG_JSON = '--log-json' in sys.argv
+
+access_logger = logging.getLogger('update_server.access')
+access_logger.setLevel(logging.INFO)
+access_logger.propagate = False
+
+class BatchedRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """
+    按大小轮转的日志文件，写入后不立即刷新，由AccessLogListener在队列空闲时或累计一批后刷新
+
+    自行记录文件大小判断是否需要轮转，避免RotatingFileHandler每条记录seek/tell导致缓冲区被刷新
+    """
+
+    def __init__(self, filename, max_bytes=ACCESS_LOG_MAX_BYTES, backup_count=ACCESS_LOG_BACKUP_COUNT,
+                 flush_batch=ACCESS_LOG_FLUSH_BATCH):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8', delay=True)
+        self.flush_batch = flush_batch
+        self._pending = 0
+        self._size = None
+
+    def emit(self, record):
+        try:
+            msg = self.format(record) + self.terminator
+            length = len(msg.encode('utf-8'))
+            if self._size is None:
+                self._size = os.path.getsize(self.baseFilename) if os.path.exists(self.baseFilename) else 0
+            if self.maxBytes > 0 and self._size and self._size + length > self.maxBytes:
+                self.doRollover()
+                self._size = 0
+            if self.stream is None:
+                self.stream = self._open()
+            self.stream.write(msg)
+            self._size += length
+            self._pending += 1
+            if self._pending >= self.flush_batch:
+                self.flush()
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        super().flush()
+        self._pending = 0
+
+class AccessLogFormatter(logging.Formatter):
+    """访问日志的文本格式：[时间] 客户端IP - 请求内容"""
+
+    def __init__(self):
+        super().__init__('[%(asctime)s] %(client_ip)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+
+class JsonAccessLogFormatter(logging.Formatter):
+    """访问日志的JSON格式，请求记录包含请求行、状态码和响应大小字段"""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'client_ip': getattr(record, 'client_ip', None),
+            'message': record.getMessage(),
+        }
+        for key in ('request', 'status', 'size'):
+            if hasattr(record, key):
+                entry[key] = getattr(record, key)
+        return json.dumps(entry, ensure_ascii=False)
+
+class AccessLogQueueHandler(logging.handlers.QueueHandler):
+    """把日志记录原样放入队列，格式化在后台线程中进行（记录的参数均为字符串和数字）"""
+
+    def prepare(self, record):
+        return record
+
+class AccessLogListener(logging.handlers.QueueListener):
+    """后台写日志的线程：队列中暂无新记录时刷新文件，突发请求时合并为一次写盘"""
+
+    queue_handler = None  # 接入access_logger的AccessLogQueueHandler，stop时移除
+
+    def handle(self, record):
+        super().handle(record)
+        if self.queue.empty():
+            self.flush()
+
+    def flush(self):
+        for handler in self.handlers:
+            handler.flush()
+
+    def stop(self):
+        """停止接收新记录，处理完队列中剩余的记录后停止，并关闭日志文件"""
+        if self.queue_handler is not None:
+            access_logger.removeHandler(self.queue_handler)
+            self.queue_handler = None
+        super().stop()
+        for handler in self.handlers:
+            handler.close()
+
+def start_access_log(path=ACCESS_LOG_FILE, json_format=ACCESS_LOG_JSON, console=True, max_bytes=ACCESS_LOG_MAX_BYTES):
+    """
+    启动异步访问日志
+
+    参数:
+        path: 日志文件路径
+        json_format: 日志文件是否使用JSON格式
+        console: 是否同时输出到控制台
+        max_bytes: 日志文件轮转的大小（字节）
+
+    返回:
+        AccessLogListener，调用其stop()写出剩余日志（BoundedThreadingHTTPServer在server_close时调用）
+    """
+    file_handler = BatchedRotatingFileHandler(path, max_bytes=max_bytes)
+    file_handler.setFormatter(JsonAccessLogFormatter() if json_format else AccessLogFormatter())
+    handlers = [file_handler]
+    if console:
+        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler.setFormatter(AccessLogFormatter())
+        handlers.append(console_handler)
+
+    log_queue = queue.SimpleQueue()
+    for handler in access_logger.handlers[:]:
+        access_logger.removeHandler(handler)
+    listener = AccessLogListener(log_queue, *handlers)
+    listener.queue_handler = AccessLogQueueHandler(log_queue)
+    # 先启动后台线程再接入记录器，放入队列的记录都会被写出
+    listener.start()
+    access_logger.addHandler(listener.queue_handler)
+    return listener
+
+# 更新信息的来源文件（依次查找），都不存在时根据可执行文件和fba_gui.py中的版本号生成
+MANIFEST_FILES = ['update_info.json', 'test_update_info.json']
+MANIFEST_EXE_PATHS = [os.path.join('dist', 'FBA费用计算器.exe'), 'FBA费用计算器.exe']
+MANIFEST_VERSION_SOURCE = 'fba_gui.py'
+# 检查上述文件是否变化的最短间隔（秒），间隔内的请求直接使用缓存的更新信息
+MANIFEST_CHECK_INTERVAL = 2
+
+class UpdateManifest:
+    """
+    缓存的update_info.json
+
+    启动时生成一次并编码为字节，同时计算ETag；之后的请求直接返回缓存内容，
+    只有来源文件的修改时间或大小变化时才重新生成。客户端携带匹配的If-None-Match时返回304
+    """
+
+    def __init__(self, port):
+        self.port = port
+        self._lock = threading.Lock()
+        self._signature = None
+        self._checked_at = 0.0
+        self._cached = None  # (内容字节, ETag, Last-Modified)
+        try:
+            self.local_ip = socket.gethostbyname(socket.gethostname())
+        except OSError:
+            self.local_ip = '127.0.0.1'
+        self.get()
+
+    def _file_signature(self):
+        """各来源文件的(修改时间, 大小)，文件不存在时为None"""
+        signature = []
+        for path in MANIFEST_FILES + MANIFEST_EXE_PATHS + [MANIFEST_VERSION_SOURCE]:
+            try:
+                stat = os.stat(path)
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    def _build(self):
+        """生成更新信息的内容字节"""
+        for path in MANIFEST_FILES:
+            if os.path.isfile(path):
+                with open(path, 'rb') as f:
+                    return f.read()
+
+        # 动态生成更新信息：获取最新的可执行文件信息
+        latest_version = "1.1.0"
+        exe_size = 0
+        for exe_path in MANIFEST_EXE_PATHS:
+            if os.path.exists(exe_path):
+                try:
+                    exe_size = os.path.getsize(exe_path) / (1024 * 1024)  # MB
+                    # 尝试从fba_gui.py中获取版本号
+                    with open(MANIFEST_VERSION_SOURCE, 'r', encoding='utf-8') as f:
+                        match = re.search(r'VERSION\s*=\s*"([^"]+)"', f.read())
+                        if match:
+                            latest_version = match.group(1)
+                except (OSError, UnicodeDecodeError):
+                    pass
+                break
+
+        update_info = {
+            "version": latest_version,
+            "download_url": f"http://{self.local_ip}:{self.port}/downloads/FBA费用计算器安装程序.exe",
+            "release_notes": "本地服务器提供的最新版本更新",
+            "file_size_mb": f"{exe_size:.2f} MB",
+            "update_time": datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
+        return json.dumps(update_info, ensure_ascii=False).encode('utf-8')
+
+    def get(self):
+        """
+        获取更新信息，来源文件变化时重新生成
+
+        返回:
+            (内容字节, ETag, Last-Modified)
+        """
+        now = time.monotonic()
+        cached = self._cached
+        if cached is not None and now - self._checked_at < MANIFEST_CHECK_INTERVAL:
+            return cached
+
+        with self._lock:
+            if self._cached is not None and now - self._checked_at < MANIFEST_CHECK_INTERVAL:
+                return self._cached
+            signature = self._file_signature()
+            if self._cached is None or signature != self._signature:
+                body = self._build()
+                etag = f'"{hashlib.sha1(body).hexdigest()[:16]}"'
+                last_modified = formatdate(usegmt=True)
+                self._cached = (body, etag, last_modified)
+                self._signature = signature
+            self._checked_at = now
+            return self._cached
+
+class BoundedThreadingHTTPServer(socketserver.TCPServer):
+    """
+    使用有界线程池并发处理请求的服务器
+
+    慢速客户端下载安装包时不会阻塞其他客户端的更新检查和反馈提交；
+    排队和处理中的连接总数超过max_connections时直接返回503，避免无限制地占用内存
+    """
+    allow_reuse_address = True
+    request_queue_size = LISTEN_BACKLOG
+
+    def __init__(self, server_address, handler_class, max_workers=MAX_WORKERS, max_connections=MAX_CONNECTIONS,
+                 access_log=True):
+        super().__init__(server_address, handler_class)
+        # 访问日志的后台写入线程与服务器同时启动，server_close时写出剩余日志并停止
+        self.access_log = start_access_log() if access_log else None
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="update-server")
+        self.connection_slots = threading.BoundedSemaphore(max(max_connections, max_workers))
+        # 客户端轮询的更新信息，启动时生成并缓存
+        self.update_manifest = UpdateManifest(self.server_address[1])
+
+    def process_request(self, request, client_address):
+        """接受连接后交给线程池处理，主线程立即返回继续接受新连接"""
+        if not self.connection_slots.acquire(blocking=False):
+            self.reject_request(request)
+            return
+        self.executor.submit(self.process_request_thread, request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            if isinstance(request, ssl.SSLSocket):
+                # HTTPS连接在工作线程中完成握手，握手失败（如扫描器、客户端断开）直接关闭连接
+                request.settimeout(CONNECTION_TIMEOUT)
+                try:
+                    request.do_handshake()
+                except (ssl.SSLError, OSError):
+                    return
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self.connection_slots.release()
+
+    def reject_request(self, request):
+        """连接数已满：HTTP连接返回503，HTTPS连接（尚未握手）直接关闭"""
+        try:
+            if not isinstance(request, ssl.SSLSocket):
+                request.sendall(b"HTTP/1.0 503 Service Unavailable\r\n"
+                                b"Retry-After: 5\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+        except OSError:
+            pass
+        self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        # 等待已接受的连接处理完毕，它们的访问日志写出后才停止日志线程
+        self.executor.shutdown(wait=True)
+        if self.access_log is not None:
+            self.access_log.stop()
+            self.access_log = None
+
 class CustomHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
     """自定义HTTP请求处理器，支持日志记录和CORS"""
     
+    # 连接读写超时（秒）
+    timeout = CONNECTION_TIMEOUT
+    
     def log_message(self, format, *args):
-        """自定义日志记录格式"""
-        log_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        client_ip = self.client_address[0]
-        request_line = format % args
-        log_entry = f"[{log_time}] {client_ip} - {request_line}\n"
-        
-        print(log_entry, end='')
-        
-        # 保存到日志文件
-        try:
-            with open('update_server.log', 'a', encoding='utf-8') as log_file:
-                log_file.write(log_entry)
-        except:
-            pass
+        """记录日志：只放入队列，由后台线程格式化并写入控制台和日志文件"""
+        access_logger.info(format, *args, extra={'client_ip': self.client_address[0]})
+    
+    def log_request(self, code='-', size='-'):
+        """记录请求，JSON格式的日志中包含请求行、状态码和响应大小字段"""
+        code = getattr(code, 'value', code)
+        access_logger.info('"%s" %s %s', self.requestline, code, size,
+                           extra={'client_ip': self.client_address[0],
+                                  'request': self.requestline, 'status': code, 'size': size})
     
     def is_localhost(self):
         """检查请求是否来自本地主机或内网"""
@@ -87,6 +445,136 @@ class CustomHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
         self.send_header('Access-Control-Allow-Headers', 'Content-Type')
         super().end_headers()
     
+    def copyfile(self, source, outputfile):
+        """发送文件内容，发送到客户端连接时使用send_file_range"""
+        if outputfile is not self.wfile:
+            return super().copyfile(source, outputfile)
+        self.send_file_range(source)
+    
+    def send_file_range(self, source, offset=0, count=None):
+        """
+        发送文件中的一段内容：HTTP连接使用sendfile由内核直接从文件发送到套接字，不经过Python复制；
+        HTTPS连接需要在用户态加密，使用大缓冲区分块发送
+        
+        参数:
+            source: 以二进制模式打开的文件
+            offset: 起始位置
+            count: 发送的字节数，None表示发送到文件末尾
+        """
+        if count == 0:
+            # 空文件：socket.sendfile不接受count=0
+            return
+        if isinstance(self.connection, ssl.SSLSocket):
+            source.seek(offset)
+            buffer = bytearray(SENDFILE_FALLBACK_BUFFER_SIZE)
+            view = memoryview(buffer)
+            remaining = count
+            while remaining is None or remaining > 0:
+                chunk = view if remaining is None else view[:min(remaining, len(buffer))]
+                length = source.readinto(chunk)
+                if not length:
+                    break
+                self.connection.sendall(view[:length])
+                if remaining is not None:
+                    remaining -= length
+        else:
+            # 支持os.sendfile的系统（如Linux）上为零拷贝，其他系统自动退回send
+            self.connection.sendfile(source, offset, count)
+    
+    def send_update_manifest(self):
+        """发送缓存的更新信息，If-None-Match与ETag匹配时返回304，不发送内容"""
+        body, etag, last_modified = self.server.update_manifest.get()
+        
+        if_none_match = self.headers.get('If-None-Match')
+        not_modified = bool(if_none_match) and etag in [tag.strip() for tag in if_none_match.split(',')]
+        if not_modified:
+            self.send_response(304)
+        else:
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', last_modified)
+        # 客户端每次使用前必须向服务器确认，新版本发布后立即生效
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        if not not_modified:
+            self.wfile.write(body)
+    
+    def send_download(self, path, filename):
+        """
+        发送下载文件，支持断点续传
+        
+        响应包含ETag和Last-Modified，客户端中断后可用Range请求从断点继续下载，
+        并用If-Range确认文件未变化（文件已变化时返回完整文件）；If-None-Match匹配时返回304
+        
+        参数:
+            path: 文件路径
+            filename: 文件名（安装包以附件形式下载时使用）
+        """
+        from urllib.parse import quote
+        stat = os.stat(path)
+        size = stat.st_size
+        etag = f'"{size:x}-{stat.st_mtime_ns:x}"'
+        last_modified = self.date_time_string(int(stat.st_mtime))
+        
+        def send_validators():
+            self.send_header('Accept-Ranges', 'bytes')
+            self.send_header('ETag', etag)
+            self.send_header('Last-Modified', last_modified)
+            # 允许客户端保存，但每次使用前必须向服务器确认（新版本发布后立即生效）
+            self.send_header('Cache-Control', 'no-cache')
+        
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match and etag in [tag.strip() for tag in if_none_match.split(',')]:
+            self.send_response(304)
+            send_validators()
+            self.end_headers()
+            return
+        
+        range_header = self.headers.get('Range')
+        if_range = self.headers.get('If-Range')
+        if if_range and if_range.strip() not in (etag, last_modified):
+            # 文件已变化，已下载的部分不能使用，发送完整文件
+            range_header = None
+        
+        try:
+            byte_range = parse_byte_range(range_header, size)
+        except ValueError:
+            self.send_response(416)
+            self.send_header('Content-Range', f'bytes */{size}')
+            self.send_header('Content-Length', '0')
+            send_validators()
+            self.end_headers()
+            return
+        
+        if byte_range:
+            start, end = byte_range
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+        else:
+            start, end = 0, size - 1
+            self.send_response(200)
+        if filename.lower().endswith('.exe'):
+            self.send_header('Content-Type', 'application/octet-stream')
+            # 响应头只能使用latin-1字符，中文文件名按RFC 5987编码，同时提供ASCII文件名兼容旧客户端
+            ascii_filename = filename.encode('ascii', 'ignore').decode('ascii') or 'download.exe'
+            self.send_header('Content-Disposition',
+                             f"attachment; filename=\"{ascii_filename}\"; filename*=UTF-8''{quote(filename)}")
+        else:
+            self.send_header('Content-Type', self.guess_type(path))
+        self.send_header('Content-Length', str(end - start + 1))
+        send_validators()
+        self.end_headers()
+        
+        # 响应头已发送，出错时（如客户端中断下载）只能记录日志并关闭连接
+        try:
+            with open(path, 'rb') as f:
+                self.send_file_range(f, start, end - start + 1)
+        except OSError as e:
+            print(f"发送文件时出错: {e}")
+            self.close_connection = True
+    
     def do_OPTIONS(self):
         """处理OPTIONS请求"""
         self.send_response(200)
@@ -174,74 +662,14 @@ class CustomHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
             return
         
         elif self.path == '/update_info.json':
-            # 尝试提供更新信息文件
-            if os.path.exists('update_info.json'):
-                self.path = '/update_info.json'
-            elif os.path.exists('test_update_info.json'):
-                self.path = '/test_update_info.json'
-            else:
-                # 动态生成更新信息文件
-                self.send_response(200)
-                self.send_header('Content-Type', 'application/json; charset=utf-8')
-                self.end_headers()
-                
-                # 获取最新的可执行文件信息
-                latest_version = "1.1.0"
-                exe_size = 0
-                
-                # 查找最新的可执行文件
-                exe_paths = [
-                    os.path.join('dist', 'FBA费用计算器.exe'),
-                    'FBA费用计算器.exe'
-                ]
-                
-                for exe_path in exe_paths:
-                    if os.path.exists(exe_path):
-                        try:
-                            exe_size = os.path.getsize(exe_path) / (1024 * 1024)  # MB
-                            # 尝试从fba_gui.py中获取版本号
-                            try:
-                                import re
-                                with open('fba_gui.py', 'r', encoding='utf-8') as f:
-                                    content = f.read()
-                                    match = re.search(r'VERSION\s*=\s*"([^"]+)"', content)
-                                    if match:
-                                        latest_version = match.group(1)
-                            except:
-                                pass
-                        except:
-                            pass
-                        break
-                
-                # 获取本地IP地址
-                import socket
-                try:
-                    local_ip = socket.gethostbyname(socket.gethostname())
-                except:
-                    local_ip = '127.0.0.1'
-                
-                # 获取当前服务器端口
-                current_port = self.server.server_address[1]
-                
-                update_info = {
-                    "version": latest_version,
-                    "download_url": f"http://{local_ip}:{current_port}/downloads/FBA费用计算器安装程序.exe",
-                    "release_notes": "本地服务器提供的最新版本更新",
-                    "file_size_mb": f"{exe_size:.2f} MB",
-                    "update_time": datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                }
-                
-                import json
-                self.wfile.write(json.dumps(update_info, ensure_ascii=False).encode('utf-8'))
-                return
+            self.send_update_manifest()
+            return
         
         # 对于可执行文件请求的特殊处理
         elif self.path.endswith('.exe') or self.path.startswith('/downloads/'):
-            # 提取文件名
-            if self.path.startswith('/downloads/'):
-                filename = self.path[len('/downloads/'):]
-            else:
-                filename = os.path.basename(self.path)
+            # 提取文件名（解码URL中的中文文件名，只取文件名部分，防止访问目录外的文件）
+            from urllib.parse import unquote, urlsplit
+            filename = os.path.basename(unquote(urlsplit(self.path).path))
             
             # 尝试从多个位置查找文件，增加更多可能的路径
             possible_paths = [
@@ -255,40 +683,14 @@ class CustomHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
             
             found_path = None
             for path in possible_paths:
-                if os.path.exists(path):
+                if os.path.isfile(path):
                     found_path = path
                     break
             
             if found_path:
-                # 对于大文件，使用优化的传输方式
-                if filename.lower().endswith('.exe') and os.path.getsize(found_path) > 1024 * 1024:  # 大于1MB的文件
-                    self.send_response(200)
-                    self.send_header('Content-Type', 'application/octet-stream')
-                    self.send_header('Content-Disposition', f'attachment; filename="{filename}"')
-                    self.send_header('Content-Length', str(os.path.getsize(found_path)))
-                    # 添加缓存控制头
-                    self.send_header('Cache-Control', 'no-cache, no-store, must-revalidate')
-                    self.send_header('Pragma', 'no-cache')
-                    self.send_header('Expires', '0')
-                    self.end_headers()
-                    
-                    # 使用缓冲区分块发送大文件以提高速度
-                    buffer_size = 8192
-                    try:
-                        with open(found_path, 'rb') as f:
-                            while True:
-                                data = f.read(buffer_size)
-                                if not data:
-                                    break
-                                self.wfile.write(data)
-                        return
-                    except Exception as e:
-                        print(f"发送文件时出错: {e}")
-                        self.send_error(500, f"文件发送失败: {str(e)}")
-                        return
-                else:
-                    # 小文件使用默认处理
-                    self.path = '/' + os.path.relpath(found_path, os.getcwd()).replace('\\', '/')
+                # 所有下载文件都支持断点续传（ETag/Last-Modified、Range/If-Range）和sendfile发送
+                self.send_download(found_path, filename)
+                return
         
         # 使用默认处理方法
         super().do_GET()
@@ -693,7 +1095,8 @@ class CustomHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
             if not os.path.exists(feedback_dir):
                 os.makedirs(feedback_dir)
             
-            feedback_filename = f"feedback_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
+            # 并发提交时同一秒内可能有多条反馈，文件名精确到微秒避免相互覆盖
+            feedback_filename = f"feedback_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.txt"
             feedback_path = os.path.join(feedback_dir, feedback_filename)
             
             with open(feedback_path, 'w', encoding='utf-8') as f:
@@ -1144,34 +1547,39 @@ def start_server_with_mode(use_https=False):
         import socket
         local_ip = socket.gethostbyname(socket.gethostname())
         
-        # 创建服务器，绑定到所有网络接口
+        # 创建服务器，绑定到所有网络接口（服务器类中已设置允许地址重用）
         server_address = ('', port)
-        # 设置允许地址重用
-        socketserver.TCPServer.allow_reuse_address = True
         Handler = CustomHTTPRequestHandler
         
-        # 增加缓冲区大小以提高传输速度
-        with socketserver.TCPServer(server_address, Handler) as httpd:
+        # 使用有界线程池并发处理请求
+        httpd = BoundedThreadingHTTPServer(server_address, Handler)
+        
+        # 如果使用HTTPS，配置SSL上下文
+        if current_use_https:
+            try:
+                print(f"正在加载SSL证书: {CERT_FILE}")
+                print(f"正在加载私钥: {KEY_FILE}")
+                context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+                context.load_cert_chain(certfile=CERT_FILE, keyfile=KEY_FILE)
+                # 握手推迟到工作线程中第一次读写时进行，慢速客户端不会阻塞主线程接受新连接
+                httpd.socket = context.wrap_socket(httpd.socket, server_side=True,
+                                                   do_handshake_on_connect=False)
+                print("SSL配置成功！")
+            except Exception as e:
+                print(f"SSL配置错误: {str(e)}")
+                print("请检查证书文件是否正确，或尝试使用其他证书文件")
+                print("切换到HTTP模式...")
+                current_use_https = False
+                scheme = "http"
+                # 关闭原服务器（监听套接字和线程池）后重新创建
+                httpd.server_close()
+                httpd = BoundedThreadingHTTPServer(server_address, Handler)
+        
+        # 服务器停止时由with关闭实际使用的服务器对象
+        with httpd:
+            # 增加发送缓冲区大小以提高传输速度
             httpd.socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 65536)
             
-            # 如果使用HTTPS，配置SSL上下文
-            if current_use_https:
-                try:
-                    print(f"正在加载SSL证书: {CERT_FILE}")
-                    print(f"正在加载私钥: {KEY_FILE}")
-                    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
-                    context.load_cert_chain(certfile=CERT_FILE, keyfile=KEY_FILE)
-                    httpd.socket = context.wrap_socket(httpd.socket, server_side=True)
-                    print("SSL配置成功！")
-                except Exception as e:
-                    print(f"SSL配置错误: {str(e)}")
-                    print("请检查证书文件是否正确，或尝试使用其他证书文件")
-                    print("切换到HTTP模式...")
-                    current_use_https = False
-                    scheme = "http"
-                    # 重新创建服务器
-                    httpd = socketserver.TCPServer(server_address, Handler)
-            
             # 显示启动信息
             print("=" * 60)
             print("FBA费用计算器更新服务器启动中...")
@@ -1179,6 +1587,9 @@ def start_server_with_mode(use_https=False):
             print(f"本地IP访问: {scheme}://{local_ip}:{port}")
             print(f"更新信息: {scheme}://localhost:{port}/update_info.json")
             print(f"可执行文件: {scheme}://localhost:{port}/downloads/FBA费用计算器.exe")
+            print(f"并发处理: {MAX_WORKERS} 个工作线程，最多 {MAX_CONNECTIONS} 个连接")
+            print(f"访问日志: {ACCESS_LOG_FILE}（{'JSON' if ACCESS_LOG_JSON else '文本'}格式，"
+                  f"超过 {ACCESS_LOG_MAX_BYTES // (1024 * 1024)} MB 轮转）")
             print("=" * 60)
             print("重要提示:")
             print(f"1. 请确保Windows防火墙允许端口{port}的访问")
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+启动耗时分析
+使用 --profile-startup 参数启动程序时，记录导入模块、加载设置、创建样式、各界面构建方法、
+网络检测和首次绘制的时间，首次绘制后将报告写入日志；未启用时所有函数直接返回，不影响启动速度
+"""
+
+import functools
+import logging
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# 是否启用启动耗时分析
+ENABLED = '--profile-startup' in sys.argv
+
+# 计时起点：本模块被导入的时间（应在主程序中最先导入）
+_start = time.perf_counter()
+_last_checkpoint = _start
+
+_lock = threading.Lock()
+_entries = {}  # 阶段名称 -> [首次开始时间, 累计耗时, 调用次数]
+_reported = False
+
+
+def _record(name, started, duration):
+    """记录一次阶段耗时；报告已写出后直接写入日志（如后台网络检测）"""
+    with _lock:
+        entry = _entries.get(name)
+        if entry is None:
+            _entries[name] = [started, duration, 1]
+        else:
+            entry[1] += duration
+            entry[2] += 1
+        reported = _reported
+    if reported:
+        logging.info(f"启动分析：{name} 耗时 {duration * 1000:.1f} 毫秒"
+                     f"（开始于 {(started - _start) * 1000:.1f} 毫秒，首次绘制之后完成）")
+
+
+def checkpoint(name):
+    """记录一个时间点，耗时为距上一个时间点的间隔（用于统计模块导入等顺序执行的步骤）"""
+    global _last_checkpoint
+    if not ENABLED:
+        return
+    now = time.perf_counter()
+    _record(name, _last_checkpoint, now - _last_checkpoint)
+    _last_checkpoint = now
+
+
+@contextmanager
+def phase(name):
+    """记录with块内代码的耗时"""
+    if not ENABLED:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record(name, started, time.perf_counter() - started)
+
+
+def instrument(obj, names=(), prefix='create_'):
+    """
+    为对象的方法添加计时（只替换该实例上的属性，不修改类）
+
+    参数:
+        obj: 要计时的对象（如主窗口类的实例）
+        names: 需要计时的方法名
+        prefix: 以此前缀开头的方法也会被计时（默认所有create_*界面构建方法）
+    """
+    if not ENABLED:
+        return
+    method_names = set(names) | {name for name in dir(type(obj)) if prefix and name.startswith(prefix)}
+    for name in method_names:
+        method = getattr(obj, name, None)
+        if callable(method):
+            setattr(obj, name, _timed(name, method))
+
+
+def _timed(name, method):
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        with phase(name):
+            return method(*args, **kwargs)
+    return wrapper
+
+
+def report():
+    """
+    生成启动耗时报告并写入日志
+
+    返回:
+        报告文本；未启用时返回空字符串
+    """
+    global _reported
+    if not ENABLED:
+        return ""
+    with _lock:
+        entries = sorted(_entries.items(), key=lambda item: item[1][0])
+        _reported = True
+
+    lines = ["===== 启动耗时分析 =====",
+             "开始(毫秒)    耗时(毫秒)  次数  阶段（嵌套调用的耗时会重复计入外层阶段）"]
+    for name, (started, duration, calls) in entries:
+        lines.append(f"{(started - _start) * 1000:10.1f}  {duration * 1000:10.1f}  {calls:4d}  {name}")
+    lines.append(f"总计：启动到报告生成 {(time.perf_counter() - _start) * 1000:.1f} 毫秒")
+    text = "\n".join(lines)
+    logging.info(text)
+    return text
+
+
+def report_on_first_paint(root):
+    """窗口首次绘制后记录时间点并写出报告"""
+    if not ENABLED:
+        return
+
+    def on_idle():
+        checkpoint("首次绘制")
+        report()
+
+    # 窗口的绘制任务在空闲时执行，排在它们之后的空闲回调即为首次绘制完成的时间
+    root.after_idle(on_idle)
@@ -8,172 +8,90 @@ FBA配送费计算器测试脚本
 import sys
 import os
 import math
+import csv
+import json
+import tempfile
+import time
 
 # 添加当前目录到Python路径
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-# 直接实现美国站的尺寸分段判断函数（复制自原代码并简化）
-def determine_size_segment(max_len, mid_len, min_len, len_girth, weight_lb, weight_oz):
-    """判断美国站的尺寸分段"""
-    # 总重量（磅）
-    total_weight_lb = weight_lb + weight_oz / 16.0
-    
-    # 首先判断是否为超大件（两个条件满足其一即可）
-    # 条件1：尺寸超限（最大边>108英寸 或 周长+最长边>165英寸）
-    if max_len > 108 or (len_girth + max_len) > 165:
-        return "超大件"
-    # 条件2：重量超限（>=100磅）
-    elif total_weight_lb >= 100:
-        return "超大件"
-    # 判断大件
-    elif max_len > 18 or len_girth + max_len > 75:
-        if max_len <= 20 and len_girth + max_len <= 118:
-            return "小号大件"
-        elif max_len <= 30 and len_girth + max_len <= 130:
-            return "中号大件"
-        elif max_len <= 48 and len_girth + max_len <= 165:
-            return "大号大件"
-        else:
-            return "超大件"
-    # 判断标准尺寸
-    else:
-        if total_weight_lb < 1:
-            return "小号标准尺寸"
-        else:
-            return "大号标准尺寸"
-
-# 直接实现美国站的费用计算函数（复制自原代码并简化）
-def calculate_fee(size_segment, weight_lb, weight_oz):
-    """计算美国站的配送费"""
-    # 总重量（磅）
-    total_weight_lb = weight_lb + weight_oz / 16.0
-    
-    # 小号标准尺寸费用计算
-    if size_segment == "小号标准尺寸":
-        return 3.0  # 固定费用
-    
-    # 大号标准尺寸费用计算
-    elif size_segment == "大号标准尺寸":
-        if total_weight_lb <= 1:
-            return 3.0
-        elif total_weight_lb <= 2:
-            return 3.96
-        elif total_weight_lb <= 3:
-            return 4.44
-        elif total_weight_lb <= 21:
-            # 基础费用 + (重量-3) × 每磅额外费用
-            base_fee = 4.44
-            additional_fee = (total_weight_lb - 3) * 0.48
-            return base_fee + additional_fee
-        else:
-            # 超出21磅的特殊情况
-            return 11.52  # 兜底值
-    
-    # 小号大件费用计算
-    elif size_segment == "小号大件":
-        if total_weight_lb <= 10:
-            return 8.26
-        else:
-            # 基础费用 + (重量-10) × 每磅额外费用
-            base_fee = 8.26
-            additional_fee = (total_weight_lb - 10) * 0.48
-            return base_fee + additional_fee
-    
-    # 中号大件费用计算
-    elif size_segment == "中号大件":
-        if total_weight_lb <= 20:
-            return 13.85
-        else:
-            # 基础费用 + (重量-20) × 每磅额外费用
-            base_fee = 13.85
-            additional_fee = (total_weight_lb - 20) * 0.48
-            return base_fee + additional_fee
-    
-    # 大号大件费用计算
-    elif size_segment == "大号大件":
-        if total_weight_lb <= 50:
-            return 18.98
-        else:
-            # 基础费用 + (重量-50) × 每磅额外费用
-            base_fee = 18.98
-            additional_fee = (total_weight_lb - 50) * 0.48
-            return base_fee + additional_fee
-    
-    # 超大件费用计算
-    elif size_segment == "超大件":
-        if total_weight_lb <= 90:
-            return 90.0
-        else:
-            # 基础费用 + (重量-90) × 每磅额外费用
-            base_fee = 90.0
-            additional_fee = (total_weight_lb - 90) * 0.76
-            return base_fee + additional_fee
-    
-    # 默认情况
-    else:
-        return 0.0
-
-# 直接实现日本站的尺寸分段判断函数（复制自原代码并简化）
-def determine_size_segment_jp(max_len_cm):
-    """判断日本站的尺寸分段"""
-    if max_len_cm <= 35:
-        return "小号"
-    elif max_len_cm <= 80:
-        return "标准"
-    elif max_len_cm <= 120:
-        return "大件"
-    elif max_len_cm <= 200:
-        return "超大件"
-    else:
-        return "超大件（超出200厘米）"
-
-# 简化版日本站费用计算函数
-def calculate_fee_jp_demo(size_segment, weight_kg, price_over_1000, is_frozen=False):
-    """日本站费用计算演示"""
-    # 这是一个简化版的演示函数，仅用于验证关键逻辑
-    # 实际费用计算请查看原代码中的完整实现
-    if size_segment == "小号":
-        return 630 if is_frozen else 589
-    elif size_segment == "标准":
-        return 960 if is_frozen else 914
-    elif size_segment == "大件":
-        return 1153 if is_frozen else 1052
-    elif size_segment == "超大件":
-        return 2760 if is_frozen else 2675
-    else:
-        return 4820
+from fee_engine import (
+    determine_size_segment,
+    calculate_fee,
+    determine_size_segment_jp,
+    calculate_fee_jp,
+    calculate_fee_with_steps,
+    calculate_fee_with_steps_jp,
+    calculate_fba_fee,
+    calculate_fba_fees,
+    calculate_fba_fee_cached,
+    fee_cache_clear,
+    fee_cache_info,
+    quote_fee,
+    quote_fee_jp,
+    render_steps,
+)
+from batch_engine import (
+    stream_csv_fees,
+    stream_xlsx_fees,
+    detect_encoding,
+    XlsxDictWriter,
+    CacheStats,
+    match_columns,
+    process_chunk,
+    process_row,
+)
+import fba_calc
+import connectivity
+import startup_profiler
+import lazy_imports
+import ui_scheduler
+from history_store import CalculationHistory, export_records
+from datetime import datetime
 
 def test_us_size_segment():
     """测试美国站尺寸分段判断逻辑"""
     print("===== 测试美国站尺寸分段判断 =====")
     
     # 测试用例1：小号标准尺寸
-    max_len, mid_len, min_len = 15, 10, 5
+    max_len, mid_len, min_len = 15, 10, 0.5
     len_girth = 2 * (mid_len + min_len) + max_len
-    weight_lb, weight_oz = 0, 12
+    weight_lb, weight_oz = 0.75, 12
     result = determine_size_segment(max_len, mid_len, min_len, len_girth, weight_lb, weight_oz)
     print(f"测试1（小号标准尺寸）: 结果={result}, 期望=小号标准尺寸")
+    assert result == "小号标准尺寸"
     
     # 测试用例2：大号标准尺寸（重量刚超过1磅）
     max_len, mid_len, min_len = 15, 10, 5
     len_girth = 2 * (mid_len + min_len) + max_len
-    weight_lb, weight_oz = 1, 1
+    weight_lb, weight_oz = 17 / 16, 17
     result = determine_size_segment(max_len, mid_len, min_len, len_girth, weight_lb, weight_oz)
     print(f"测试2（大号标准尺寸-重量）: 结果={result}, 期望=大号标准尺寸")
+    assert result == "大号标准尺寸"
     
-    # 测试用例3：小号大件（刚好超过标准尺寸但小于20英寸）
+    # 测试用例3：大号大件（最长边超过18英寸）
     max_len, mid_len, min_len = 19, 10, 5
     len_girth = 2 * (mid_len + min_len) + max_len
-    weight_lb, weight_oz = 10, 0
+    weight_lb, weight_oz = 10, 160
     result = determine_size_segment(max_len, mid_len, min_len, len_girth, weight_lb, weight_oz)
-    print(f"测试3（小号大件-尺寸）: 结果={result}, 期望=小号大件")
+    print(f"测试3（大号大件-尺寸）: 结果={result}, 期望=大号大件")
+    assert result == "大号大件"
     
-    # 测试用例4：超大件（重量超限）
+    # 测试用例4：超大件（重量超限，断点重量归入下一档）
     max_len, mid_len, min_len = 15, 10, 5
     len_girth = 2 * (mid_len + min_len) + max_len
-    weight_lb, weight_oz = 101, 0  # 101磅 > 100磅
-    result = determine_size_segment(max_len, mid_len, min_len, len_girth, weight_lb, weight_oz)
-    print(f"测试4（超大件-重量超限）: 结果={result}, 期望=超大件")
+    for weight_lb, expected in [(101, "超大件：70至150磅（含70磅）"),
+                                (70, "超大件：70至150磅（含70磅）"),
+                                (150, "超大件：150磅以上（含150磅）")]:
+        result = determine_size_segment(max_len, mid_len, min_len, len_girth, weight_lb, weight_lb * 16)
+        print(f"测试4（超大件-重量超限 {weight_lb}磅）: 结果={result}, 期望={expected}")
+        assert result == expected
+    
+    # 测试用例5：超大件（尺寸超限但重量不足50磅）
+    result = determine_size_segment(60, 10, 5, 90, 20, 320)
+    print(f"测试5（超大件-尺寸超限）: 结果={result}, 期望=超大件：0至50磅")
+    assert result == "超大件：0至50磅"
     
     print()
 
@@ -181,79 +99,719 @@ def test_us_fee_calculation():
     """测试美国站费用计算逻辑"""
     print("===== 测试美国站费用计算 =====")
     
-    # 测试用例1：小号标准尺寸，<1磅
-    size_segment = "小号标准尺寸"
-    weight_lb, weight_oz = 0, 12
-    result = calculate_fee(size_segment, weight_lb, weight_oz)
-    print(f"测试1（小号标准尺寸，12盎司）: 费用=${result:.2f}")
+    # 测试用例1：小号标准尺寸，按盎司断点取费（断点含上限）
+    for weight_oz, expected in [(2, 3.06), (2.01, 3.15), (12, 3.53), (16, 3.65)]:
+        result = calculate_fee("小号标准尺寸", weight_oz / 16)
+        print(f"测试1（小号标准尺寸，{weight_oz}盎司）: 费用=${result:.2f}")
+        assert result == expected
     
-    # 测试用例2：大号标准尺寸，1-2磅边界
-    size_segment = "大号标准尺寸"
-    weight_lb, weight_oz = 2, 0
-    result = calculate_fee(size_segment, weight_lb, weight_oz)
+    # 测试用例2：大号标准尺寸，1-2磅区间
+    result = calculate_fee("大号标准尺寸", 2)
     print(f"测试2（大号标准尺寸，2磅）: 费用=${result:.2f}")
+    assert result == 5.77
     
-    # 测试用例3：大号标准尺寸，3-21磅范围内
-    size_segment = "大号标准尺寸"
-    weight_lb, weight_oz = 10, 0
-    result = calculate_fee(size_segment, weight_lb, weight_oz)
+    # 测试用例3：大号标准尺寸，3-20磅按每四分之一磅计费
+    result = calculate_fee("大号标准尺寸", 10)
     print(f"测试3（大号标准尺寸，10磅）: 费用=${result:.2f}")
+    assert result == round(6.92 + 7 * 4 * 0.08, 2)
     
-    # 测试用例4：中号大件，额外重量计算
-    size_segment = "中号大件"
-    weight_lb, weight_oz = 21, 0  # 21磅（超过首重20磅1磅）
-    result = calculate_fee(size_segment, weight_lb, weight_oz)
-    print(f"测试4（中号大件，21磅）: 费用=${result:.2f}")
+    # 测试用例4：超大件50至70磅，超出50磅部分计费
+    result = calculate_fee("超大件：50至70磅（含50磅）", 60)
+    print(f"测试4（超大件，60磅）: 费用=${result:.2f}")
+    assert result == round(40.12 + 10 * 0.75, 2)
+    
+    # 测试用例5：超出范围和未知分段保持原有的提示文字
+    assert calculate_fee("小号标准尺寸", 2) == "重量区间不匹配"
+    assert calculate_fee("未知分段", 1) == "无法计算配送费"
+    
+    # 测试用例6：计算步骤与费用一致
+    fee, steps = calculate_fee_with_steps("超大件：70至150磅（含70磅）", 80)
+    print(f"测试6（超大件，80磅，计算步骤）: 费用=${fee:.2f}")
+    assert fee == round(54.81 + 10 * 0.75, 2)
+    assert f"最终配送费用: ${fee}" in steps
+    
+    # 测试用例7：公制输入
+    result = calculate_fba_fee(500, 20, 15, 1)
+    print(f"测试7（500克，20×15×1厘米）: 分段={result['size_tier']}, 费用=${result['fee']:.2f}")
+    assert result['size_tier'] == "大号标准尺寸"
+    assert result['fee'] == 4.99
     
     print()
 
+def test_us_cached_fee_calculation():
+    """测试美国站费用缓存"""
+    print("===== 测试美国站费用缓存 =====")
+    
+    # 缓存结果与逐条计算完全一致，重复规格命中缓存
+    fee_cache_clear()
+    for weight, length, width, height in [(500, 20, 15, 1), (500.0, 20.0, 15.0, 1.0), (1234.5, 45.25, 30.1, 12.75)]:
+        assert calculate_fba_fee_cached(weight, length, width, height) == calculate_fba_fee(weight, length, width, height)
+    assert (fee_cache_info().hits, fee_cache_info().misses) == (1, 2)
+    
+    # 重量分段临界点（226.796克约为8.000盎司）：输入不能被舍入到下一个重量段
+    for weight in (226.796, 226.75, 226.84):
+        assert calculate_fba_fee_cached(weight, 10, 10, 1) == calculate_fba_fee(weight, 10, 10, 1)
+    assert calculate_fba_fee_cached(226.796, 10, 10, 1)['fee'] == 3.33
+    
+    print("缓存结果与逐条计算一致\n")
+
+def test_us_batch_fee_calculation():
+    """测试美国站向量化批量计算与逐条计算结果一致"""
+    print("===== 测试美国站批量费用计算 =====")
+    
+    try:
+        import numpy as np
+    except ImportError:
+        print("未安装numpy，跳过批量计算测试\n")
+        return
+    
+    rng = np.random.default_rng(0)
+    count = 5000
+    length_cm = rng.uniform(1, 200, count)
+    width_cm = length_cm * rng.uniform(0.1, 1, count)
+    height_cm = width_cm * rng.uniform(0.01, 1, count)
+    weight_g = rng.uniform(1, 80000, count)
+    
+    batch = calculate_fba_fees(weight_g, length_cm, width_cm, height_cm)
+    for i in range(count):
+        single = calculate_fba_fee(weight_g[i], length_cm[i], width_cm[i], height_cm[i])
+        assert batch['size_tier'][i] == single['size_tier']
+        if isinstance(single['fee'], str):
+            assert np.isnan(batch['fee'][i])
+        else:
+            assert batch['fee'][i] == single['fee']
+    
+    # 批量文件按块计算：结果与逐行计算一致，无法解析的行单独报错，超出重量范围的行给出相同的说明
+    fieldnames = ["重量(g)", "最长边(cm)", "次长边(cm)", "最短边(cm)", "备注"]
+    column_map = match_columns(fieldnames)
+    rows = [dict(zip(fieldnames, values)) for values in [
+        ("500", "20", "15", "1", "A"), ("abc", "20", "15", "1", "B"), ("226.796", "10", "10", "1", "C"),
+        ("200000", "300", "200", "100", "D"), ("", "1", "1", "1", "E"), ("30000", "120", "60", "50", "F"),
+        ("28349.5", "77.5", "44.2", "5.8", "G"),
+    ]]
+    results, _, _, vectorized_rows = process_chunk(10, rows, column_map)
+    assert vectorized_rows == len(rows)
+    assert [row_number for row_number, _, _ in results] == list(range(10, 17))
+    for (row_number, result, error), row in zip(results, rows):
+        try:
+            expected = process_row(row, column_map)
+        except ValueError:
+            assert result is None and error
+        else:
+            assert error is None and result == expected
+    
+    print(f"批量计算 {count} 条与逐条计算结果一致\n")
+
+def test_us_streaming_csv():
+    """测试美国站流式CSV批量处理"""
+    print("===== 测试美国站流式CSV批量处理 =====")
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        input_path = os.path.join(tmp_dir, "input.csv")
+        output_path = os.path.join(tmp_dir, "output.csv")
+        with open(input_path, 'w', encoding='gbk', newline='') as f:
+            f.write("重量(g),最长边(cm),次长边(cm),最短边(cm),备注\n")
+            f.write("500,20,15,1,商品A\n")
+            f.write("abc,20,15,1,商品B\n")
+            f.write("100,10,8,1,商品C\n")
+        
+        # 编码检测：GBK文件、带BOM的UTF-8文件、纯ASCII开头后出现GBK内容的文件
+        assert detect_encoding(input_path) == 'gbk'
+        assert detect_encoding(input_path, sample_size=10) == 'gbk'
+        utf8_path = os.path.join(tmp_dir, "utf8.csv")
+        with open(utf8_path, 'w', encoding='utf-8-sig') as f:
+            f.write("重量(g)\n")
+        assert detect_encoding(utf8_path) == 'utf-8-sig'
+        ascii_head_path = os.path.join(tmp_dir, "ascii_head.csv")
+        with open(ascii_head_path, 'w', encoding='gbk') as f:
+            f.write("a" * 100 + "商品\n")
+        assert detect_encoding(ascii_head_path, sample_size=16) == 'gbk'
+        
+        # ASCII开头超过数MB时仍需看到非ASCII内容才选定编码；编码不符时不保留不完整的结果文件
+        long_head_path = os.path.join(tmp_dir, "long_head.csv")
+        with open(long_head_path, 'w', encoding='gbk', newline='') as f:
+            f.write("weight,length,width,height,note\n")
+            f.write("500,20,15,1,A\n" * 400000)
+            f.write("500,20,15,1,商品\n")
+        assert os.path.getsize(long_head_path) > 4 * 1024 * 1024
+        assert detect_encoding(long_head_path) == 'gbk'
+        # 非ASCII内容在跳过上限之后时不再继续读取，按UTF-8处理
+        assert detect_encoding(long_head_path, max_scan_bytes=1024 * 1024) == 'utf-8'
+        assert detect_encoding(ascii_head_path, sample_size=16, max_scan_bytes=64) == 'utf-8'
+        broken_input_path = os.path.join(tmp_dir, "broken_input.csv")
+        with open(broken_input_path, 'w', encoding='gbk', newline='') as f:
+            f.write("weight,length,width,height,note\n")
+            f.write("500,20,15,1,A\n" * 20000)
+            f.write("500,20,15,1,商品\n")
+        broken_output_path = os.path.join(tmp_dir, "broken.csv")
+        try:
+            stream_csv_fees(broken_input_path, broken_output_path, 'utf-8', chunk_size=1000)
+            assert False, "编码不符时应抛出UnicodeDecodeError"
+        except UnicodeDecodeError:
+            pass
+        assert not os.path.exists(broken_output_path)
+        
+        errors = []
+        fee_cache_clear()
+        cache_stats = CacheStats()
+        success_rows, total_rows = stream_csv_fees(
+            input_path, output_path, 'gbk', on_error=lambda row, e: errors.append(row), cache_stats=cache_stats
+        )
+        assert (success_rows, total_rows) == (2, 3)
+        assert errors == [2]
+        if lazy_imports.is_available("numpy"):
+            # 美国站整块向量化计算，不经过逐行缓存
+            assert (cache_stats.vectorized_rows, cache_stats.hits, cache_stats.misses) == (3, 0, 0)
+        else:
+            assert (cache_stats.hits, cache_stats.misses) == (0, 2)
+        
+        with open(output_path, 'r', encoding='utf-8-sig', newline='') as f:
+            rows = list(csv.DictReader(f))
+        assert [row['备注'] for row in rows] == ['商品A', '商品C']
+        assert rows[0]['尺寸分段'] == '大号标准尺寸'
+        assert float(rows[0]['配送费']) == 4.99
+        
+        # 多进程模式：小块分发，结果顺序与单进程一致
+        parallel_path = os.path.join(tmp_dir, "parallel.csv")
+        assert stream_csv_fees(input_path, parallel_path, 'gbk', workers=2, chunk_size=1) == (2, 3)
+        with open(output_path, 'rb') as f1, open(parallel_path, 'rb') as f2:
+            assert f1.read() == f2.read()
+    
+        # Excel文件以只读模式流式读取，结果与CSV一致
+        try:
+            from openpyxl import Workbook
+        except ImportError:
+            print("未安装openpyxl，跳过Excel流式处理测试")
+        else:
+            xlsx_path = os.path.join(tmp_dir, "input.xlsx")
+            xlsx_output_path = os.path.join(tmp_dir, "xlsx_output.csv")
+            workbook = Workbook()
+            sheet = workbook.active
+            sheet.append(["重量(g)", "最长边(cm)", "次长边(cm)", "最短边(cm)", "备注"])
+            sheet.append([500, 20, 15, 1, "商品A"])
+            sheet.append(["abc", 20, 15, 1, "商品B"])
+            sheet.append([100, 10, 8, 1, "商品C"])
+            workbook.save(xlsx_path)
+            
+            assert stream_xlsx_fees(xlsx_path, xlsx_output_path) == (2, 3)
+            with open(output_path, 'rb') as f1, open(xlsx_output_path, 'rb') as f2:
+                assert f1.read() == f2.read()
+            
+            # 流式写入XLSX：列宽只根据样本行估算
+            from openpyxl import load_workbook
+            widths_path = os.path.join(tmp_dir, "widths.xlsx")
+            writer = XlsxDictWriter(widths_path, ["备注", "配送费"], sample_rows=2)
+            writer.writeheader()
+            for note in ["短", "x" * 10, "y" * 100]:
+                writer.writerow({"备注": note})
+            writer.close()
+            result_sheet = load_workbook(widths_path).active
+            assert result_sheet.column_dimensions['A'].width == 12
+            assert [cell.value for cell in result_sheet['A']] == ["备注", "短", "x" * 10, "y" * 100]
+    
+    print("流式处理结果与逐条计算一致\n")
+
 def test_jp_size_segment():
     """测试日本站尺寸分段判断逻辑"""
     print("===== 测试日本站尺寸分段判断 =====")
     
-    # 测试用例1：小号（≤35厘米）
-    max_len_cm = 30
-    result = determine_size_segment_jp(max_len_cm)
-    print(f"测试1（小号，30厘米）: 结果={result}, 期望=小号")
+    cases = [
+        (30, "小号"),
+        (35, "小号"),
+        (60, "标准"),
+        (100, "大件"),
+        (150, "超大件"),
+        (201, "超大件（超出200厘米）"),
+    ]
+    for max_len_cm, expected in cases:
+        result = determine_size_segment_jp(max_len_cm)
+        print(f"测试（{max_len_cm}厘米）: 结果={result}, 期望={expected}")
+        assert result == expected
     
-    # 测试用例2：标准尺寸（>35厘米但≤80厘米）
-    max_len_cm = 60
-    result = determine_size_segment_jp(max_len_cm)
-    print(f"测试2（标准尺寸，60厘米）: 结果={result}, 期望=标准")
+    print()
+
+def test_jp_fee_calculation():
+    """测试日本站费用计算逻辑"""
+    print("===== 测试日本站费用计算 =====")
+    
+    # 测试用例1：非冷冻-小号（≤250克）
+    result = calculate_fee_jp("小号", 30, 200, price_over_1000=True, is_frozen=False)
+    print(f"测试1（非冷冻-小号）: 费用={result}日元")
+    assert result == 630
     
-    # 测试用例3：大件（>80厘米但≤120厘米）
-    max_len_cm = 100
-    result = determine_size_segment_jp(max_len_cm)
-    print(f"测试3（大件，100厘米）: 结果={result}, 期望=大件")
+    # 测试用例2：冷冻-标准尺寸，按最长边再按重量查表
+    result = calculate_fee_jp("标准", 70, 3000, price_over_1000=True, is_frozen=True)
+    print(f"测试2（冷冻-标准尺寸，70厘米，3千克）: 费用={result}日元")
+    assert result == 1027
     
-    # 测试用例4：超大件（>120厘米但≤200厘米）
-    max_len_cm = 150
-    result = determine_size_segment_jp(max_len_cm)
-    print(f"测试4（超大件，150厘米）: 结果={result}, 期望=超大件")
+    # 测试用例3：未匹配规则时按重量兜底
+    result = calculate_fee_jp("小号", 30, 3000, price_over_1000=False, is_frozen=False)
+    print(f"测试3（非冷冻-小号超重，兜底）: 费用={result}日元")
+    assert result == 933
+    
+    # 测试用例4：计算步骤与费用一致
+    fee, steps = calculate_fee_with_steps_jp("超大件", 180, 35000, True, False)
+    print(f"测试4（非冷冻-超大件，180厘米，35千克）: 费用={fee}日元")
+    assert fee == 4650
+    assert "超大件-4（≤200厘米，≤40千克）" in steps
     
     print()
 
-def test_jp_fee_demo():
-    """测试日本站费用计算逻辑（简化版）"""
-    print("===== 测试日本站费用计算（简化版）=====")
-    
-    # 测试用例1：非冷冻-小号
-    size_segment = "小号"
-    weight_kg = 0.2
-    price_over_1000 = False
-    is_frozen = False
-    result = calculate_fee_jp_demo(size_segment, weight_kg, price_over_1000, is_frozen)
-    print(f"测试1（非冷冻-小号）: 费用={result}日元")
+def test_fee_quote():
+    """测试结构化计算结果与按需生成的计算步骤"""
+    print("===== 测试结构化计算结果 =====")
     
-    # 测试用例2：冷冻-标准尺寸
-    size_segment = "标准"
-    weight_kg = 1.0
-    price_over_1000 = True
-    is_frozen = True
-    result = calculate_fee_jp_demo(size_segment, weight_kg, price_over_1000, is_frozen)
-    print(f"测试2（冷冻-标准尺寸）: 费用={result}日元")
+    quote = quote_fee("大号标准尺寸", 1.1)
+    assert (quote.rule_id, quote.fee) == ("us:大号标准尺寸:4", 4.99)
+    assert render_steps(quote) == calculate_fee_with_steps("大号标准尺寸", 1.1)[1]
+    assert quote_fee("未知分段", 1).rule_id == "us:unknown"
     
-    print()
+    quote = quote_fee_jp("标准", 30, 1500, True, True)
+    assert quote.rule_id.startswith("jp:frozen:标准:")
+    assert (quote.fee, render_steps(quote)) == calculate_fee_with_steps_jp("标准", 30, 1500, True, True)
+    
+    print("结构化结果与计算步骤一致\n")
+
+def test_jp_batch_cli():
+    """测试日本站命令行批量计算"""
+    print("===== 测试日本站命令行批量计算 =====")
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        input_path = os.path.join(tmp_dir, "input.csv")
+        output_path = os.path.join(tmp_dir, "output.csv")
+        with open(input_path, 'w', encoding='utf-8') as f:
+            f.write("重量(g),最长边(cm),次长边(cm),最短边(cm),售价(日元),冷冻商品\n")
+            f.write("500,15,20,1,800,否\n")
+            f.write("500,20,15,1,,是\n")
+        
+        assert fba_calc.main(["batch", input_path, output_path, "--site", "jp"]) == 0
+        
+        with open(output_path, 'r', encoding='utf-8-sig', newline='') as f:
+            rows = list(csv.DictReader(f))
+        assert [row['尺寸分段'] for row in rows] == ['小号', '小号']
+        assert rows[0]['配送费'] == str(calculate_fee_jp("小号", 20, 500, False, False))
+        assert rows[1]['配送费'] == str(calculate_fee_jp("小号", 20, 500, True, True))
+    
+    print("命令行批量计算结果与逐条计算一致\n")
+
+def test_calculation_history():
+    """测试计算历史记录的定长队列和数据库日志"""
+    print("===== 测试计算历史记录 =====")
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "history.db")
+        history = CalculationHistory(db_path, maxlen=2)
+        for fee in (3.06, 4.99, "无法计算配送费"):
+            history.append({'timestamp': datetime(2025, 1, 1), 'site': 'us', 'size_segment': '大号标准尺寸', 'shipping_fee': fee})
+        assert [record['shipping_fee'] for record in history] == [4.99, "无法计算配送费"]
+        history.close()
+        
+        # 重新打开后最近的记录和全部日志都还在
+        history = CalculationHistory(db_path, maxlen=2)
+        assert [record['shipping_fee'] for record in history] == [4.99, "无法计算配送费"]
+        all_records = list(history.iter_all())
+        assert [record['shipping_fee'] for record in all_records] == [3.06, 4.99, "无法计算配送费"]
+        assert all_records[0]['timestamp'] == datetime(2025, 1, 1)
+        
+        # 按条件筛选和分页查询
+        for day, site, segment, fee in ((2, 'jp', '标准尺寸', 318), (3, 'jp', '大件', 589), (4, 'us', '小号标准尺寸', 3.06)):
+            history.append({'timestamp': datetime(2025, 1, day), 'site': site, 'size_segment': segment, 'shipping_fee': fee})
+        assert history.count(site='jp') == 2
+        assert history.count(start=datetime(2025, 1, 2), end=datetime(2025, 1, 4)) == 2
+        assert history.count(min_fee=4, max_fee=400) == 2
+        assert [record['size_segment'] for _, record in history.query(site='us', size_segment='小号标准尺寸')] == ['小号标准尺寸']
+        assert history.size_segments(site='jp') == ['大件', '标准尺寸']
+        first_page = history.query(limit=4)
+        second_page = history.query(before_id=first_page[-1][0], limit=4)
+        assert [record['shipping_fee'] for _, record in first_page] == [3.06, 589, 318, "无法计算配送费"]
+        assert [record['shipping_fee'] for _, record in second_page] == [4.99, 3.06]
+        
+        # 导出全部历史记录（逐条写出，美国站和日本站合并在同一组列中）
+        csv_path = os.path.join(tmp_dir, "history.csv")
+        assert export_records(history.iter_all(), csv_path) == 6
+        with open(csv_path, encoding='utf-8-sig', newline='') as f:
+            rows = list(csv.DictReader(f))
+        assert rows[0]['时间'] == '2025-01-01 00:00:00'
+        assert [row['站点'] for row in rows] == ['us', 'us', 'us', 'jp', 'jp', 'us']
+        assert rows[3]['配送费'] == '318'
+        
+        jsonl_path = os.path.join(tmp_dir, "history.jsonl")
+        assert export_records(history.iter_all(), jsonl_path) == 6
+        with open(jsonl_path, encoding='utf-8') as f:
+            lines = [json.loads(line) for line in f]
+        assert lines[-1]['尺寸分段'] == '小号标准尺寸' and lines[-1]['配送费'] == 3.06
+        
+        xlsx_path = os.path.join(tmp_dir, "current.xlsx")
+        assert export_records([history.query(limit=1)[0][1]], xlsx_path) == 1
+        history.clear()
+        assert history.count_all() == 0
+        history.close()
+    
+    print("历史记录重启后保留，内存中只保留最近的记录，可按条件分页查询\n")
+
+def test_connectivity_cache():
+    """测试网络连接检测结果在多次调用间共用"""
+    print("===== 测试网络连接检测缓存 =====")
+    
+    probes = []
+    def fake_probe(urls=connectivity.CONNECTIVITY_TEST_URLS):
+        probes.append(urls)
+        return len(probes) > 1
+    
+    original_probe = connectivity.probe_internet_connection
+    connectivity.probe_internet_connection = fake_probe
+    connectivity._connected = None
+    try:
+        # 检测失败的结果在短时间内复用，refresh时重新检测
+        assert connectivity.ensure_internet_connection() is False
+        assert connectivity.ensure_internet_connection() is False
+        assert len(probes) == 1
+        assert connectivity.ensure_internet_connection(refresh=True) is True
+        
+        # 检测成功后后台检测和后续调用都直接使用缓存结果
+        results = []
+        connectivity.check_connection_async(results.append).join()
+        assert results == [True] and connectivity.connection_status() is True
+        assert len(probes) == 2
+        
+        # 检测期间不持有锁：读取状态不等待；同时发起的检测只进行一次，共用结果
+        import threading
+        release = threading.Event()
+        started = threading.Event()
+        def slow_probe(urls=connectivity.CONNECTIVITY_TEST_URLS):
+            probes.append(urls)
+            started.set()
+            release.wait(5)
+            return False
+        connectivity.probe_internet_connection = slow_probe
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(connectivity.ensure_internet_connection(refresh=True)))
+                   for _ in range(3)]
+        threads[0].start()
+        assert started.wait(5)
+        for thread in threads[1:]:
+            thread.start()
+        assert connectivity.connection_status() is True
+        time.sleep(0.2)  # 等待其余线程进入等待
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        assert results == [False] * 3 and len(probes) == 3
+        assert connectivity.connection_status() is False
+    finally:
+        connectivity.probe_internet_connection = original_probe
+        connectivity._connected = None
+    
+    print("网络连接检测结果已缓存，后台检测不重复请求\n")
+
+def test_startup_profiler():
+    """测试启动耗时分析报告"""
+    print("===== 测试启动耗时分析 =====")
+    
+    class FakeWindow:
+        def create_title(self):
+            return "title"
+        def load_settings(self):
+            return {}
+    
+    window = FakeWindow()
+    
+    # 未启用时不替换方法，也不生成报告
+    startup_profiler.instrument(window, ("load_settings",))
+    assert 'create_title' not in vars(window)
+    assert startup_profiler.report() == ""
+    
+    startup_profiler.ENABLED = True
+    try:
+        startup_profiler.checkpoint("导入模块")
+        startup_profiler.instrument(window, ("load_settings",))
+        assert window.create_title() == "title" and window.create_title() == "title"
+        window.load_settings()
+        with startup_profiler.phase("网络检测"):
+            pass
+        text = startup_profiler.report()
+        lines = text.splitlines()
+        assert [line.split()[-1] for line in lines[2:-1]] == ["导入模块", "create_title", "load_settings", "网络检测"]
+        assert lines[3].split()[2] == "2"
+    finally:
+        startup_profiler.ENABLED = False
+        startup_profiler._entries.clear()
+        startup_profiler._reported = False
+    
+    print(text + "\n")
+
+def test_lazy_imports():
+    """测试可选依赖的延迟导入"""
+    print("===== 测试可选依赖延迟导入 =====")
+    
+    assert not lazy_imports.is_available("fba_missing_module")
+    assert lazy_imports.load("fba_missing_module") is None
+    
+    # 后台预加载只启动一个线程，未安装的模块直接跳过
+    thread = lazy_imports.preload_in_background(("fba_missing_module",) + lazy_imports.EXCEL_MODULES)
+    assert lazy_imports.preload_in_background() is thread
+    thread.join()
+    if lazy_imports.is_available("openpyxl"):
+        assert "openpyxl" in sys.modules
+    
+    print("可选依赖按需导入，后台预加载完成\n")
+
+def test_ui_scheduler():
+    """测试界面周期任务的合并调度和最小化暂停"""
+    print("===== 测试界面定时任务调度 =====")
+    
+    class FakeRoot:
+        """模拟tkinter主窗口的after/bind接口"""
+        def __init__(self):
+            self.jobs = {}
+            self.bindings = {}
+            self.window_state = 'normal'
+        def after(self, delay_ms, callback):
+            job = len(self.jobs) + 1
+            self.jobs[job] = (delay_ms, callback)
+            return job
+        def after_cancel(self, job):
+            del self.jobs[job]
+        def bind(self, sequence, callback, add=None):
+            self.bindings[sequence] = callback
+        def state(self):
+            return self.window_state
+    
+    class FakeEvent:
+        def __init__(self, widget):
+            self.widget = widget
+    
+    clock = [0.0]
+    original_time = ui_scheduler.time
+    ui_scheduler.time = type('FakeTime', (), {'monotonic': staticmethod(lambda: clock[0])})
+    try:
+        root = FakeRoot()
+        scheduler = ui_scheduler.UIScheduler(root, granularity_ms=1000)
+        calls = []
+        scheduler.add("clock", lambda: calls.append("clock"), 60000, first_delay_ms=0)
+        scheduler.add("update_check", lambda: calls.append("update_check"), 60000, first_delay_ms=500)
+        
+        # 任何时候只有一个定时器，粒度内到期的任务合并在一次唤醒中执行
+        assert len(root.jobs) == 1
+        (delay, tick), = root.jobs.values()
+        assert delay == 0
+        root.jobs.clear()
+        tick()
+        assert calls == ["clock", "update_check"]
+        (delay, tick), = root.jobs.values()
+        assert delay == 60000
+        
+        # 最小化时取消定时器，恢复后立即补执行到期的任务
+        root.window_state = 'iconic'
+        root.bindings["<Unmap>"](FakeEvent(root))
+        assert scheduler.paused and not root.jobs
+        clock[0] = 600.0
+        root.window_state = 'normal'
+        root.bindings["<Map>"](FakeEvent(root))
+        (delay, tick), = root.jobs.values()
+        assert delay == 0
+        root.jobs.clear()
+        tick()
+        assert calls == ["clock", "update_check"] * 2
+        
+        scheduler.stop()
+        assert not root.jobs
+    finally:
+        ui_scheduler.time = original_time
+    
+    print("周期任务共用一个定时器，窗口最小化时暂停\n")
+
+def test_resumable_download():
+    """测试更新服务器的Range/If-Range支持和客户端断点续传"""
+    print("===== 测试断点续传下载 =====")
+    
+    import threading
+    import urllib.request
+    import start_update_server
+    import resumable_download
+    
+    # Range请求头解析
+    assert start_update_server.parse_byte_range("bytes=100-", 1000) == (100, 999)
+    assert start_update_server.parse_byte_range("bytes=100-199", 1000) == (100, 199)
+    assert start_update_server.parse_byte_range("bytes=-100", 1000) == (900, 999)
+    assert start_update_server.parse_byte_range("bytes=0-5000", 1000) == (0, 999)
+    assert start_update_server.parse_byte_range("bytes=0-1,5-6", 1000) is None
+    assert start_update_server.parse_byte_range(None, 1000) is None
+    # 非ASCII数字（如上标²）视为格式不支持，按完整文件响应
+    assert start_update_server.parse_byte_range("bytes=²-", 1000) is None
+    assert start_update_server.parse_byte_range("bytes=-²", 1000) is None
+    assert start_update_server.parse_byte_range("bytes=１-2", 1000) is None
+    try:
+        start_update_server.parse_byte_range("bytes=1000-", 1000)
+        assert False, "超出文件大小的范围应返回416"
+    except ValueError:
+        pass
+    
+    original_cwd = os.getcwd()
+    original_delay = resumable_download.RETRY_DELAY
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.chdir(tmp_dir)
+        os.makedirs("downloads")
+        content = os.urandom(3 * 1024 * 1024)
+        with open(os.path.join("downloads", "setup.exe"), "wb") as f:
+            f.write(content)
+        
+        server = start_update_server.BoundedThreadingHTTPServer(
+            ("127.0.0.1", 0), start_update_server.CustomHTTPRequestHandler, max_workers=4)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_address[1]}/downloads/setup.exe"
+        resumable_download.RETRY_DELAY = 0
+        try:
+            # 下载到一半时连接中断，重试时从断点继续
+            progress = []
+            def interrupt_once(downloaded, total):
+                progress.append(downloaded)
+                if len(progress) == 20:
+                    raise ConnectionResetError("模拟连接中断")
+            dest = os.path.join(tmp_dir, "setup.exe")
+            resumable_download.download_file(url, dest, progress_callback=interrupt_once)
+            with open(dest, "rb") as f:
+                assert f.read() == content
+            assert progress[20] > progress[19], "重试后应从断点继续，而不是从头下载"
+            assert not os.path.exists(dest + ".part") and not os.path.exists(dest + ".part.json")
+            
+            # 服务器上的文件已变化（If-Range不匹配）时，丢弃旧的部分重新下载
+            with open(dest + ".part", "wb") as f:
+                f.write(b"x" * 1024)
+            with open(dest + ".part.json", "w", encoding="utf-8") as f:
+                json.dump({"url": url, "etag": '"old-version"', "last_modified": None}, f)
+            resumable_download.download_file(url, dest)
+            with open(dest, "rb") as f:
+                assert f.read() == content
+            
+            # 小文件和非安装包文件同样支持Range请求
+            with open(os.path.join("downloads", "notes.txt"), "wb") as f:
+                f.write(b"0123456789")
+            request = urllib.request.Request(url.replace("setup.exe", "notes.txt"), headers={"Range": "bytes=2-4"})
+            with urllib.request.urlopen(request, timeout=5) as response:
+                assert response.status == 206 and response.read() == b"234"
+                assert response.headers["Content-Range"] == "bytes 2-4/10" and response.headers["ETag"]
+            
+            # 空文件返回200和空内容，请求处理过程中不应出错
+            errors = []
+            server.handle_error = lambda request, client_address: errors.append(sys.exc_info()[1])
+            open(os.path.join("downloads", "empty.exe"), "wb").close()
+            with urllib.request.urlopen(url.replace("setup.exe", "empty.exe"), timeout=5) as response:
+                assert response.status == 200 and response.read() == b""
+                assert response.headers["Content-Length"] == "0"
+            server.shutdown()
+            server.executor.shutdown(wait=True)
+            assert not errors, errors
+        finally:
+            resumable_download.RETRY_DELAY = original_delay
+            server.shutdown()
+            server.server_close()
+            os.chdir(original_cwd)
+    
+    print("中断后从断点继续下载，文件变化时重新下载\n")
+
+def test_update_manifest():
+    """测试更新服务器缓存的update_info.json和304响应"""
+    print("===== 测试更新信息缓存 =====")
+    
+    import socket
+    import threading
+    import urllib.request
+    import urllib.error
+    import start_update_server
+    
+    def fetch(url, etag=None):
+        request = urllib.request.Request(url)
+        if etag:
+            request.add_header('If-None-Match', etag)
+        try:
+            with urllib.request.urlopen(request, timeout=5) as response:
+                return response.status, response.headers['ETag'], response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.headers['ETag'], e.read()
+    
+    original_cwd = os.getcwd()
+    original_interval = start_update_server.MANIFEST_CHECK_INTERVAL
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.chdir(tmp_dir)
+        server = start_update_server.BoundedThreadingHTTPServer(
+            ("127.0.0.1", 0), start_update_server.CustomHTTPRequestHandler, max_workers=4)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_address[1]}/update_info.json"
+        try:
+            # 没有更新信息文件时使用启动时生成的内容，重复请求返回相同的ETag
+            status, etag, body = fetch(url)
+            assert status == 200 and etag
+            assert json.loads(body.decode('utf-8'))["version"] == "1.1.0"
+            assert fetch(url) == (200, etag, body)
+            
+            # 客户端携带ETag时返回304，不发送内容
+            status, etag_304, body_304 = fetch(url, etag)
+            assert status == 304 and etag_304 == etag and body_304 == b""
+            
+            # 更新信息文件出现后重新生成，ETag随之变化
+            start_update_server.MANIFEST_CHECK_INTERVAL = 0
+            with open("update_info.json", "w", encoding="utf-8") as f:
+                json.dump({"version": "9.9.9"}, f)
+            status, new_etag, body = fetch(url, etag)
+            assert status == 200 and new_etag != etag
+            assert json.loads(body.decode('utf-8'))["version"] == "9.9.9"
+            
+            # 关闭服务器时仍在处理的请求完成后才停止访问日志
+            slow = socket.create_connection(server.server_address, timeout=5)
+            slow.sendall(b"GET /update_info.json HTTP/1.0\r\n")
+            time.sleep(0.2)
+            server.shutdown()
+            threading.Timer(0.2, slow.sendall, args=(b"\r\n",)).start()
+            server.server_close()
+            assert slow.recv(5) == b"HTTP/"
+            slow.close()
+        finally:
+            start_update_server.MANIFEST_CHECK_INTERVAL = original_interval
+            server.shutdown()
+            server.server_close()
+            os.chdir(original_cwd)
+        
+        # 访问日志随服务器启动和关闭，关闭时已写出全部请求记录
+        with open(os.path.join(tmp_dir, "update_server.log"), encoding="utf-8") as f:
+            access_lines = [line for line in f if "GET /update_info.json" in line]
+        assert len(access_lines) == 5
+        assert not start_update_server.access_logger.handlers
+    
+    print("更新信息只在文件变化时重新生成，未变化时返回304\n")
+
+def test_access_log():
+    """测试更新服务器的异步访问日志（JSON格式和按大小轮转）"""
+    print("===== 测试异步访问日志 =====")
+    
+    import start_update_server
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        log_path = os.path.join(tmp_dir, "access.log")
+        listener = start_update_server.start_access_log(log_path, json_format=True, console=False, max_bytes=4096)
+        try:
+            for i in range(100):
+                start_update_server.access_logger.info(
+                    '"%s" %s %s', f"GET /update_info.json?n={i} HTTP/1.1", 200, 128,
+                    extra={'client_ip': '127.0.0.1', 'request': f"GET /update_info.json?n={i} HTTP/1.1",
+                           'status': 200, 'size': 128})
+        finally:
+            # stop()写出队列中剩余的记录、关闭文件并从记录器上移除队列
+            listener.stop()
+        assert not start_update_server.access_logger.handlers
+        
+        # 超过大小后轮转，所有记录都保留在当前文件和备份文件中，每行是一条完整的JSON
+        assert os.path.exists(log_path + ".1")
+        entries = []
+        for path in sorted(p for p in os.listdir(tmp_dir) if p.startswith("access.log")):
+            with open(os.path.join(tmp_dir, path), encoding="utf-8") as f:
+                entries.extend(json.loads(line) for line in f)
+            assert os.path.getsize(os.path.join(tmp_dir, path)) <= 4096
+        assert len(entries) == 100
+        assert all(entry["status"] == 200 and entry["client_ip"] == "127.0.0.1" for entry in entries)
+        assert any(entry["request"].endswith("n=99 HTTP/1.1") for entry in entries)
+    
+    print("访问日志在后台线程中批量写入，超过大小后轮转\n")
 
 def run_all_tests():
     """运行所有测试"""
@@ -262,8 +820,21 @@ def run_all_tests():
     try:
         test_us_size_segment()
         test_us_fee_calculation()
+        test_us_cached_fee_calculation()
+        test_us_batch_fee_calculation()
+        test_us_streaming_csv()
         test_jp_size_segment()
-        test_jp_fee_demo()
+        test_jp_fee_calculation()
+        test_fee_quote()
+        test_jp_batch_cli()
+        test_calculation_history()
+        test_connectivity_cache()
+        test_startup_profiler()
+        test_lazy_imports()
+        test_ui_scheduler()
+        test_resumable_download()
+        test_update_manifest()
+        test_access_log()
         
         print("===== 测试完成 =====")
         print("所有测试用例已执行，请检查计算结果是否符合预期。")
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+界面定时任务调度
+时钟、定期检查更新等周期任务共用一个root.after定时器：每次只在最早到期的任务时间唤醒，
+间隔在调度粒度内的任务合并在同一次唤醒中执行；窗口最小化时暂停，恢复时补执行已到期的任务
+"""
+
+import logging
+import time
+from datetime import datetime
+
+# 默认调度粒度（毫秒）：到期时间相差不超过该值的任务在同一次唤醒中执行
+DEFAULT_GRANULARITY_MS = 1000
+
+
+def ms_until_next_minute():
+    """距下一个整分钟的毫秒数（用于让按分钟显示的时钟在整分时刷新）"""
+    now = datetime.now()
+    return 60000 - now.second * 1000 - now.microsecond // 1000
+
+
+class UIScheduler:
+    """
+    合并界面周期任务的调度器
+
+    参数:
+        root: tkinter主窗口
+        granularity_ms: 调度粒度（毫秒）
+    """
+
+    def __init__(self, root, granularity_ms=DEFAULT_GRANULARITY_MS):
+        self.root = root
+        self.granularity = max(granularity_ms, 1) / 1000
+        self._tasks = {}  # 任务名 -> [回调, 间隔(秒), 下次执行时间]
+        self._job = None
+        self._paused = False
+
+        # 窗口最小化时暂停，恢复时继续
+        root.bind("<Unmap>", self._on_unmap, add="+")
+        root.bind("<Map>", self._on_map, add="+")
+
+    def add(self, name, callback, interval_ms, first_delay_ms=None):
+        """
+        添加或替换周期任务
+
+        参数:
+            name: 任务名
+            callback: 任务函数（在主线程中调用，不带参数）
+            interval_ms: 执行间隔（毫秒）
+            first_delay_ms: 第一次执行前的等待时间（毫秒），默认等于执行间隔
+        """
+        interval = interval_ms / 1000
+        first_delay = interval if first_delay_ms is None else first_delay_ms / 1000
+        self._tasks[name] = [callback, interval, time.monotonic() + first_delay]
+        self._reschedule()
+
+    def remove(self, name):
+        """移除周期任务"""
+        if self._tasks.pop(name, None) is not None:
+            self._reschedule()
+
+    def stop(self):
+        """停止调度（程序退出时调用）"""
+        self._tasks.clear()
+        self._cancel()
+
+    @property
+    def paused(self):
+        return self._paused
+
+    def _cancel(self):
+        if self._job is not None:
+            self.root.after_cancel(self._job)
+            self._job = None
+
+    def _reschedule(self):
+        """取消当前定时器，按最早到期的任务重新设置"""
+        self._cancel()
+        if self._paused or not self._tasks:
+            return
+        next_due = min(task[2] for task in self._tasks.values())
+        delay = max(next_due - time.monotonic(), 0)
+        self._job = self.root.after(int(delay * 1000), self._tick)
+
+    def _tick(self):
+        """执行所有在本次调度粒度内到期的任务"""
+        self._job = None
+        now = time.monotonic()
+        for name, task in list(self._tasks.items()):
+            callback, interval, due = task
+            if due > now + self.granularity:
+                continue
+            try:
+                callback()
+            except Exception as e:
+                logging.error(f"定时任务 {name} 执行出错: {str(e)}")
+            # 按原定时间推进，保持对齐；错过多个周期时（如睡眠唤醒后）只执行一次
+            task[2] = due + interval if due + interval > now else now + interval
+        self._reschedule()
+
+    def _on_unmap(self, event):
+        # 子控件的事件也会传到主窗口绑定上，只处理主窗口自身的最小化
+        if event.widget is not self.root or self.root.state() != 'iconic':
+            return
+        self._paused = True
+        self._cancel()
+
+    def _on_map(self, event):
+        if event.widget is not self.root or not self._paused:
+            return
+        self._paused = False
+        # 恢复后立即执行已到期的任务（如刷新时钟）
+        self._cancel()
+        self._job = self.root.after(0, self._tick)